@@ -0,0 +1,277 @@
+-- Grade aggregates
+--
+-- Running sums and counts of the avaliacoes, kept up to date by a trigger so
+-- that no write has to re-read the other avaliacoes of the problem:
+--
+--   problema_aggregates        per problem: number of avaliacoes and the sum of
+--                              MediaCalculator.calculateRawSum(notas);
+--                              problemas.media_geral = raw_sum / avaliacoes_count
+--   aluno_problema_aggregates  per (problem, student evaluated): count and sum of
+--                              the professor, self and peer scores used by
+--                              MediaCalculator.calculateFinalMedia
+--
+-- Each INSERT, UPDATE or DELETE on avaliacoes subtracts the old row and adds
+-- the new one (O(1) per write) and updates problemas.media_geral in the same
+-- transaction. AvaliacaoController relies on this and no longer recomputes
+-- media_geral itself, so apply this migration before deploying it.
+--
+-- Bulk loads (backend/scripts/bulk_import_notas.py) turn the trigger off for
+-- their own session with SET grade_aggregates.skip = 'on' and call
+-- grade_aggregates_rebuild(ARRAY[...]) once for the problems they loaded;
+-- other sessions keep updating the aggregates as usual.
+--
+-- Run in the Supabase SQL Editor (or psql). It is idempotent, and it ends with
+-- a full rebuild from the existing avaliacoes. SELECT grade_aggregates_rebuild();
+-- can be run again at any time. backend/scripts/grade_aggregates.py verify --dsn
+-- checks these tables and media_geral against a recompute from the avaliacoes;
+-- with --db it checks the same logic on the local SQLite stand-in.
+
+CREATE TABLE IF NOT EXISTS problema_aggregates (
+    id_problema BIGINT PRIMARY KEY REFERENCES problemas(id_problema) ON DELETE CASCADE,
+    avaliacoes_count INTEGER NOT NULL DEFAULT 0,
+    raw_sum NUMERIC NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS aluno_problema_aggregates (
+    id_problema BIGINT NOT NULL REFERENCES problemas(id_problema) ON DELETE CASCADE,
+    id_aluno BIGINT NOT NULL,
+    professor_count INTEGER NOT NULL DEFAULT 0,
+    professor_sum NUMERIC NOT NULL DEFAULT 0,
+    auto_count INTEGER NOT NULL DEFAULT 0,
+    auto_sum NUMERIC NOT NULL DEFAULT 0,
+    peer_count INTEGER NOT NULL DEFAULT 0,
+    peer_sum NUMERIC NOT NULL DEFAULT 0,
+    PRIMARY KEY (id_problema, id_aluno)
+);
+
+CREATE INDEX IF NOT EXISTS aluno_problema_aggregates_id_aluno_idx ON aluno_problema_aggregates (id_aluno);
+
+-- Only the backend (service role) reads these tables
+ALTER TABLE problema_aggregates ENABLE ROW LEVEL SECURITY;
+ALTER TABLE aluno_problema_aggregates ENABLE ROW LEVEL SECURITY;
+
+
+-- notas / notas_por_arquivo as a JSON object, whether the column holds JSON text or jsonb.
+-- Anything that does not parse to an object counts as {} (calculateRawSum returns 0 for it).
+CREATE OR REPLACE FUNCTION grade_json_object(value JSONB) RETURNS JSONB
+LANGUAGE plpgsql IMMUTABLE AS $$
+BEGIN
+    IF jsonb_typeof(value) = 'string' THEN
+        BEGIN
+            value := (value #>> '{}')::JSONB;
+        EXCEPTION WHEN others THEN
+            RETURN '{}'::JSONB;
+        END;
+    END IF;
+    IF jsonb_typeof(value) = 'object' THEN
+        RETURN value;
+    END IF;
+    RETURN '{}'::JSONB;
+END;
+$$;
+
+-- MediaCalculator.calculateRawSum: top-level numbers, rounded to 2 decimals.
+-- ROUND works on the exact NUMERIC value and rounds a tie half away from zero, while toFixed
+-- rounds the nearest double: for a sum such as 1.005 (1.00499999... as a double) the TS gives
+-- 1.00 and this gives 1.01. Only such exact x.xx5 sums differ; verify --dsn reports the
+-- problems where media_geral moved because of one.
+CREATE OR REPLACE FUNCTION grade_raw_sum(notas JSONB) RETURNS NUMERIC
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT ROUND(COALESCE(SUM(value::TEXT::NUMERIC), 0), 2)
+    FROM jsonb_each(notas)
+    WHERE jsonb_typeof(value) = 'number'
+$$;
+
+-- sumNotas in calculateFinalMedia: the numbers inside each tag object
+CREATE OR REPLACE FUNCTION grade_criterios_sum(notas JSONB) RETURNS NUMERIC
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT COALESCE(SUM(criterio.value::TEXT::NUMERIC), 0)
+    FROM jsonb_each(notas) AS tag,
+         jsonb_each(CASE WHEN jsonb_typeof(tag.value) = 'object' THEN tag.value ELSE '{}'::JSONB END) AS criterio
+    WHERE jsonb_typeof(criterio.value) = 'number'
+$$;
+
+-- sumFileGrades in calculateFinalMedia: plain numbers (old format) or {nota, observacao}
+CREATE OR REPLACE FUNCTION grade_file_sum(notas_por_arquivo JSONB) RETURNS NUMERIC
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT COALESCE(SUM(CASE
+        WHEN jsonb_typeof(value) = 'number' THEN value::TEXT::NUMERIC
+        WHEN jsonb_typeof(value) = 'object' AND jsonb_typeof(value -> 'nota') = 'number'
+            THEN (value ->> 'nota')::NUMERIC
+    END), 0)
+    FROM jsonb_each(notas_por_arquivo)
+$$;
+
+
+-- Add (sign = 1) or remove (sign = -1) one avaliacao from the aggregates.
+-- Only called from the trigger, which already runs as the owner.
+CREATE OR REPLACE FUNCTION grade_aggregates_apply(av avaliacoes, sign INTEGER) RETURNS VOID
+LANGUAGE plpgsql SECURITY INVOKER SET search_path = public AS $$
+DECLARE
+    notas JSONB;
+    score NUMERIC;
+    new_count INTEGER;
+    new_sum NUMERIC;
+BEGIN
+    IF av.id_problema IS NULL THEN
+        RETURN;
+    END IF;
+    notas := grade_json_object(to_jsonb(av.notas));
+
+    INSERT INTO problema_aggregates AS agg (id_problema, avaliacoes_count, raw_sum)
+    VALUES (av.id_problema, sign, sign * grade_raw_sum(notas))
+    ON CONFLICT (id_problema) DO UPDATE SET
+        avaliacoes_count = agg.avaliacoes_count + EXCLUDED.avaliacoes_count,
+        raw_sum = agg.raw_sum + EXCLUDED.raw_sum
+    RETURNING avaliacoes_count, raw_sum INTO new_count, new_sum;
+
+    UPDATE problemas
+    SET media_geral = CASE WHEN new_count > 0 THEN new_sum / new_count ELSE 0 END
+    WHERE id_problema = av.id_problema;
+
+    IF av.id_aluno_avaliado IS NULL THEN
+        RETURN;
+    END IF;
+    score := grade_criterios_sum(notas);
+
+    IF av.id_professor IS NOT NULL THEN
+        score := score + grade_file_sum(grade_json_object(to_jsonb(av.notas_por_arquivo)));
+        INSERT INTO aluno_problema_aggregates AS agg (id_problema, id_aluno, professor_count, professor_sum)
+        VALUES (av.id_problema, av.id_aluno_avaliado, sign, sign * score)
+        ON CONFLICT (id_problema, id_aluno) DO UPDATE SET
+            professor_count = agg.professor_count + EXCLUDED.professor_count,
+            professor_sum = agg.professor_sum + EXCLUDED.professor_sum;
+    ELSIF av.id_aluno_avaliador = av.id_aluno_avaliado THEN
+        INSERT INTO aluno_problema_aggregates AS agg (id_problema, id_aluno, auto_count, auto_sum)
+        VALUES (av.id_problema, av.id_aluno_avaliado, sign, sign * score)
+        ON CONFLICT (id_problema, id_aluno) DO UPDATE SET
+            auto_count = agg.auto_count + EXCLUDED.auto_count,
+            auto_sum = agg.auto_sum + EXCLUDED.auto_sum;
+    ELSE
+        INSERT INTO aluno_problema_aggregates AS agg (id_problema, id_aluno, peer_count, peer_sum)
+        VALUES (av.id_problema, av.id_aluno_avaliado, sign, sign * score)
+        ON CONFLICT (id_problema, id_aluno) DO UPDATE SET
+            peer_count = agg.peer_count + EXCLUDED.peer_count,
+            peer_sum = agg.peer_sum + EXCLUDED.peer_sum;
+    END IF;
+END;
+$$;
+
+-- SECURITY DEFINER so that any role allowed to write avaliacoes also updates the aggregates
+-- tables (RLS enabled, no policies) and problemas.media_geral
+CREATE OR REPLACE FUNCTION grade_aggregates_trigger() RETURNS TRIGGER
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+BEGIN
+    IF current_setting('grade_aggregates.skip', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'UPDATE'
+        AND NEW.id_problema IS NOT DISTINCT FROM OLD.id_problema
+        AND NEW.id_aluno_avaliado IS NOT DISTINCT FROM OLD.id_aluno_avaliado
+        AND NEW.id_aluno_avaliador IS NOT DISTINCT FROM OLD.id_aluno_avaliador
+        AND NEW.id_professor IS NOT DISTINCT FROM OLD.id_professor
+        AND NEW.notas IS NOT DISTINCT FROM OLD.notas
+        AND NEW.notas_por_arquivo IS NOT DISTINCT FROM OLD.notas_por_arquivo THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM grade_aggregates_apply(OLD, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM grade_aggregates_apply(NEW, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS avaliacoes_grade_aggregates ON avaliacoes;
+CREATE TRIGGER avaliacoes_grade_aggregates
+AFTER INSERT OR UPDATE OR DELETE ON avaliacoes
+FOR EACH ROW EXECUTE FUNCTION grade_aggregates_trigger();
+
+
+-- Recompute the aggregates (and media_geral) of the given problems, or of every problem, from the avaliacoes.
+-- Runs with the caller's rights: the SQL Editor, psql or a service role connection.
+DROP FUNCTION IF EXISTS grade_aggregates_rebuild();
+CREATE OR REPLACE FUNCTION grade_aggregates_rebuild(only_problemas BIGINT[] DEFAULT NULL) RETURNS VOID
+LANGUAGE plpgsql SECURITY INVOKER SET search_path = public AS $$
+BEGIN
+    -- Keep concurrent writes out while the rows are replaced
+    LOCK TABLE avaliacoes IN SHARE MODE;
+    DELETE FROM problema_aggregates
+    WHERE only_problemas IS NULL OR id_problema = ANY(only_problemas);
+    DELETE FROM aluno_problema_aggregates
+    WHERE only_problemas IS NULL OR id_problema = ANY(only_problemas);
+
+    INSERT INTO problema_aggregates (id_problema, avaliacoes_count, raw_sum)
+    SELECT id_problema, COUNT(*), SUM(grade_raw_sum(grade_json_object(to_jsonb(notas))))
+    FROM avaliacoes
+    WHERE id_problema IS NOT NULL AND (only_problemas IS NULL OR id_problema = ANY(only_problemas))
+    GROUP BY id_problema;
+
+    WITH parsed AS (
+        SELECT id_problema, id_aluno_avaliado, id_aluno_avaliador, id_professor,
+               grade_criterios_sum(grade_json_object(to_jsonb(notas))) AS criterios,
+               grade_file_sum(grade_json_object(to_jsonb(notas_por_arquivo))) AS arquivos
+        FROM avaliacoes
+        WHERE id_problema IS NOT NULL AND id_aluno_avaliado IS NOT NULL
+          AND (only_problemas IS NULL OR id_problema = ANY(only_problemas))
+    )
+    INSERT INTO aluno_problema_aggregates
+        (id_problema, id_aluno, professor_count, professor_sum, auto_count, auto_sum, peer_count, peer_sum)
+    SELECT id_problema, id_aluno_avaliado,
+           COUNT(*) FILTER (WHERE id_professor IS NOT NULL),
+           COALESCE(SUM(criterios + arquivos) FILTER (WHERE id_professor IS NOT NULL), 0),
+           COUNT(*) FILTER (WHERE id_professor IS NULL AND id_aluno_avaliador = id_aluno_avaliado),
+           COALESCE(SUM(criterios) FILTER (WHERE id_professor IS NULL AND id_aluno_avaliador = id_aluno_avaliado), 0),
+           COUNT(*) FILTER (WHERE id_professor IS NULL AND id_aluno_avaliador IS DISTINCT FROM id_aluno_avaliado),
+           COALESCE(SUM(criterios) FILTER (WHERE id_professor IS NULL
+                                           AND id_aluno_avaliador IS DISTINCT FROM id_aluno_avaliado), 0)
+    FROM parsed
+    GROUP BY id_problema, id_aluno_avaliado;
+
+    UPDATE problemas p
+    SET media_geral = agg.raw_sum / agg.avaliacoes_count
+    FROM problema_aggregates agg
+    WHERE agg.id_problema = p.id_problema AND agg.avaliacoes_count > 0
+      AND (only_problemas IS NULL OR p.id_problema = ANY(only_problemas));
+
+    -- Same as the trigger once the last avaliacao of a problem is deleted
+    UPDATE problemas p
+    SET media_geral = 0
+    WHERE (only_problemas IS NULL OR p.id_problema = ANY(only_problemas))
+      AND p.media_geral <> 0
+      AND NOT EXISTS (SELECT 1 FROM problema_aggregates agg
+                      WHERE agg.id_problema = p.id_problema AND agg.avaliacoes_count > 0);
+END;
+$$;
+
+
+-- Functions in public are exposed by PostgREST as /rpc/..., and EXECUTE is granted to PUBLIC
+-- (and on Supabase to anon, authenticated and service_role) by default. Clients must not call
+-- any of these: only the owner keeps EXECUTE, plus service_role on grade_aggregates_rebuild for
+-- backend scripts. The trigger still fires for everyone, as EXECUTE on a trigger function is only
+-- checked by CREATE TRIGGER.
+REVOKE EXECUTE ON FUNCTION grade_aggregates_apply(avaliacoes, INTEGER) FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION grade_aggregates_trigger() FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION grade_aggregates_rebuild(BIGINT[]) FROM PUBLIC;
+
+DO $$
+DECLARE
+    role_name TEXT;
+BEGIN
+    -- Supabase roles; a plain Postgres database has none of them
+    FOREACH role_name IN ARRAY ARRAY['anon', 'authenticated', 'service_role'] LOOP
+        IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = role_name) THEN
+            EXECUTE format('REVOKE EXECUTE ON FUNCTION grade_aggregates_apply(avaliacoes, INTEGER) FROM %I', role_name);
+            EXECUTE format('REVOKE EXECUTE ON FUNCTION grade_aggregates_trigger() FROM %I', role_name);
+            EXECUTE format('REVOKE EXECUTE ON FUNCTION grade_aggregates_rebuild(BIGINT[]) FROM %I', role_name);
+        END IF;
+    END LOOP;
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'service_role') THEN
+        GRANT EXECUTE ON FUNCTION grade_aggregates_rebuild(BIGINT[]) TO service_role;
+    END IF;
+END;
+$$;
+
+SELECT grade_aggregates_rebuild();
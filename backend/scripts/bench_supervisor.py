@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Supervisor Benchmarks
+Measures the hot paths of start_and_monitor.py with a synthetic child process.
+
+The benchmarks call the real supervisor functions (start_process and its
+log forwarding threads, stop_process, restart_process_if_crashed and
+check_for_updates) and replace `npm run start-prod` with this script's
+`child` command, which prints timestamped lines at a configurable rate and
+size, can crash on demand and can ignore SIGTERM.
+
+Metrics:
+    forward_lines_per_s        lines forwarded by the log threads, child writing flat out
+    log_latency_p50_ms/p99_ms  child write -> log record emitted, at a fixed line rate
+    crash_to_restart_p50_ms    child exit -> restarted child running, polling every --poll-interval
+    shutdown_ms                stop_process on a child that exits on SIGTERM
+    shutdown_sigterm_ignored_ms  stop_process on a child that ignores SIGTERM (--skip-slow to skip)
+    git_check_p50_ms           one check_for_updates call against a local bare repository
+
+Results are compared with a baseline file; a metric worse than its baseline
+by more than the relative tolerance and by more than its absolute floor
+fails the run (exit status 1). Baselines are machine-specific: record one
+with --save-baseline on the machine that runs the comparison.
+
+Supervisor output is sent to /dev/null and its log file to a temporary
+directory while the benchmarks run, so the numbers include formatting and
+writing the log without flooding the terminal.
+
+Examples:
+    python bench_supervisor.py
+    python bench_supervisor.py --skip-slow --output results.json
+    python bench_supervisor.py --save-baseline
+
+    # The synthetic child on its own
+    python bench_supervisor.py child --rate 1000 --size 200 --crash-after 5
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import shlex
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "bench_supervisor_baseline.json"
+DEFAULT_TOLERANCE = 0.5
+
+# Metric -> (higher is better, smallest absolute change that can count as a regression).
+# The absolute floor keeps scheduler noise on sub-millisecond numbers from failing runs.
+METRICS = {
+    "forward_lines_per_s": (True, 0),
+    "log_latency_p50_ms": (False, 2),
+    "log_latency_p99_ms": (False, 10),
+    "crash_to_restart_p50_ms": (False, 50),
+    "shutdown_ms": (False, 50),
+    "shutdown_sigterm_ignored_ms": (False, 500),
+    "git_check_p50_ms": (False, 20),
+}
+
+
+# --- Synthetic child ---------------------------------------------------------
+
+def run_child(args):
+    """Print `seq=<n> t=<monotonic ns> <padding>` lines, then idle like a server."""
+    if args.ignore_sigterm:
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    started = time.monotonic()
+    print(f"ready t={time.monotonic_ns()}", flush=True)
+    padding = "x" * args.size
+    seq = 0
+    while args.lines is None or seq < args.lines:
+        if args.crash_after is not None and time.monotonic() - started >= args.crash_after:
+            break
+        if args.rate:
+            delay = started + seq / args.rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        stream = sys.stderr if args.stderr_every and seq % args.stderr_every == 0 else sys.stdout
+        # One write per line like console.log, so each line reaches the pipe immediately
+        stream.write(f"seq={seq} t={time.monotonic_ns()} {padding}\n")
+        stream.flush()
+        seq += 1
+    if args.crash_after is not None:
+        while time.monotonic() - started < args.crash_after:
+            time.sleep(0.001)
+        print(f"crash t={time.monotonic_ns()}", flush=True)
+        os._exit(args.exit_code)
+    while True:
+        time.sleep(3600)
+
+
+def child_command(**options):
+    """Shell command that runs the synthetic child with the given options.
+
+    The shell execs the child so SIGTERM reaches it directly; behind a shell
+    that stays alive, the shell dies on SIGTERM, stop_process stops waiting
+    and a child that ignores SIGTERM is left holding the output pipes.
+    """
+    parts = [sys.executable, str(Path(__file__).resolve()), "child"]
+    for name, value in options.items():
+        flag = "--" + name.replace("_", "-")
+        if value is True:
+            parts.append(flag)
+        elif value is not None and value is not False:
+            parts += [flag, str(value)]
+    return "exec " + " ".join(shlex.quote(p) for p in parts)
+
+
+# --- Supervisor harness ------------------------------------------------------
+
+def import_supervisor(log_dir):
+    """Import start_and_monitor with its log file in log_dir; the import sets up logging."""
+    os.environ["SUPERVISOR_LOG_DIR"] = str(log_dir)
+    sys.path.insert(0, str(BACKEND_DIR))
+    import start_and_monitor
+    return start_and_monitor
+
+
+class ForwardedLines(logging.Handler):
+    """Watches the records log_message emits: counts lines, latencies and markers."""
+
+    def __init__(self):
+        super().__init__()
+        self.condition = threading.Condition()
+        self.reset()
+
+    def reset(self):
+        with self.condition:
+            self.count = 0
+            self.latencies = []
+            self.markers = {"ready": [], "crash": []}
+
+    def emit(self, record):
+        now = time.monotonic_ns()
+        message = record.getMessage()
+        # Forwarded lines look like "STDOUT: seq=12 t=123456 xxx"
+        prefix, _, line = message.partition(": ")
+        if prefix not in ("STDOUT", "STDERR"):
+            return
+        with self.condition:
+            if line.startswith("seq="):
+                start = line.index(" t=") + 3
+                end = line.find(" ", start)
+                sent = int(line[start:end if end != -1 else None])
+                self.count += 1
+                self.latencies.append((now - sent) / 1e6)
+            else:
+                kind, _, stamp = line.partition(" t=")
+                if kind in self.markers:
+                    self.markers[kind].append(int(stamp))
+            self.condition.notify_all()
+
+    def wait_for(self, predicate, timeout):
+        with self.condition:
+            return self.condition.wait_for(predicate, timeout)
+
+
+@contextlib.contextmanager
+def quiet_supervisor(supervisor):
+    """Send the supervisor's prints and console log to /dev/null (its log file is already in the temp dir)."""
+    root = logging.getLogger()
+    watcher = ForwardedLines()
+    with open(os.devnull, "w") as devnull:
+        console_stream = supervisor.console_handler.setStream(devnull)
+        root.addHandler(watcher)
+        try:
+            with contextlib.redirect_stdout(devnull):
+                yield watcher
+        finally:
+            root.removeHandler(watcher)
+            supervisor.console_handler.setStream(console_stream)
+            supervisor.file_handler.close()
+
+
+def stop(supervisor, process, timeout=60):
+    """Call stop_process, but never hang the benchmark run if it does not return."""
+    thread = threading.Thread(target=supervisor.stop_process, args=(process,), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(process.pid, signal.SIGKILL)
+        thread.join(5)
+        raise RuntimeError(f"stop_process did not return within {timeout}s")
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))]
+
+
+# --- Benchmarks --------------------------------------------------------------
+
+def bench_forwarding(supervisor, watcher, args):
+    """Lines/s forwarded while the child writes as fast as it can."""
+    watcher.reset()
+    command = child_command(lines=args.lines, size=args.line_size, stderr_every=args.stderr_every)
+    started = time.perf_counter()
+    process = supervisor.start_process(command)
+    done = watcher.wait_for(lambda: watcher.count >= args.lines, timeout=120)
+    elapsed = time.perf_counter() - started
+    stop_started = time.perf_counter()
+    stop(supervisor, process)
+    shutdown = time.perf_counter() - stop_started
+    if not done:
+        raise RuntimeError(f"only {watcher.count} of {args.lines} lines were forwarded")
+    return {"forward_lines_per_s": args.lines / elapsed, "shutdown_ms": shutdown * 1000}
+
+
+def bench_latency(supervisor, watcher, args):
+    """Write-to-log latency at a fixed line rate."""
+    watcher.reset()
+    lines = int(args.latency_rate * args.latency_seconds)
+    command = child_command(lines=lines, rate=args.latency_rate, size=args.line_size,
+                            stderr_every=args.stderr_every)
+    process = supervisor.start_process(command)
+    done = watcher.wait_for(lambda: watcher.count >= lines, timeout=args.latency_seconds + 60)
+    stop(supervisor, process)
+    if not done:
+        raise RuntimeError(f"only {watcher.count} of {lines} lines were forwarded")
+    return {
+        "log_latency_p50_ms": percentile(watcher.latencies, 50),
+        "log_latency_p99_ms": percentile(watcher.latencies, 99),
+    }
+
+
+def bench_restart(supervisor, watcher, args):
+    """Child exit -> replacement running, with restart_process_if_crashed polled like the main loop."""
+    watcher.reset()
+    command = child_command(crash_after=args.crash_after, lines=0)
+    process = supervisor.start_process(command)
+    deadline = time.monotonic() + 60 + args.restarts * (args.crash_after + 5)
+    while len(watcher.markers["ready"]) <= args.restarts and time.monotonic() < deadline:
+        time.sleep(args.poll_interval)
+        process = supervisor.restart_process_if_crashed(process, command) or process
+    stop(supervisor, process)
+    ready, crashes = watcher.markers["ready"], watcher.markers["crash"]
+    gaps = [(start - crash) / 1e6 for crash, start in zip(crashes, ready[1:])]
+    if len(gaps) < args.restarts:
+        raise RuntimeError(f"only {len(gaps)} of {args.restarts} restarts were observed")
+    return {"crash_to_restart_p50_ms": statistics.median(gaps)}
+
+
+def bench_sigterm_ignored(supervisor, watcher, args):
+    """stop_process on a child that ignores SIGTERM (waits for the SIGKILL fallback)."""
+    watcher.reset()
+    process = supervisor.start_process(child_command(lines=0, ignore_sigterm=True))
+    watcher.wait_for(lambda: watcher.markers["ready"], timeout=30)
+    started = time.perf_counter()
+    stop(supervisor, process)
+    return {"shutdown_sigterm_ignored_ms": (time.perf_counter() - started) * 1000}
+
+
+def git(*command, cwd):
+    subprocess.run(["git", "-c", "user.name=bench", "-c", "user.email=bench@example.com", *command],
+                   cwd=cwd, check=True, capture_output=True)
+
+
+def bench_git(supervisor, args, workdir):
+    """check_for_updates against a local bare repository, per call."""
+    origin = Path(workdir) / "origin.git"
+    clone = Path(workdir) / "clone"
+    publisher = Path(workdir) / "publisher"
+    git("init", "--bare", "--initial-branch=main", str(origin), cwd=workdir)
+    git("clone", str(origin), str(publisher), cwd=workdir)
+    git("commit", "--allow-empty", "-m", "initial", cwd=publisher)
+    git("push", "origin", "HEAD:main", cwd=publisher)
+    git("clone", str(origin), str(clone), cwd=workdir)
+
+    timings = []
+    for _ in range(args.git_checks):
+        started = time.perf_counter()
+        changed = supervisor.check_for_updates(str(clone), "main")
+        timings.append((time.perf_counter() - started) * 1000)
+        if changed:
+            raise RuntimeError("check_for_updates reported changes on an up-to-date clone")
+
+    # Sanity check: a new commit on the remote must be detected
+    git("commit", "--allow-empty", "-m", "update", cwd=publisher)
+    git("push", "origin", "HEAD:main", cwd=publisher)
+    if not supervisor.check_for_updates(str(clone), "main"):
+        raise RuntimeError("check_for_updates missed a new remote commit")
+    return {"git_check_p50_ms": statistics.median(timings)}
+
+
+def run_benchmarks(args):
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        supervisor = import_supervisor(Path(workdir) / "logs")
+        with quiet_supervisor(supervisor) as watcher:
+            steps = [
+                ("forwarding", lambda: bench_forwarding(supervisor, watcher, args)),
+                ("latency", lambda: bench_latency(supervisor, watcher, args)),
+                ("restart", lambda: bench_restart(supervisor, watcher, args)),
+                ("git", lambda: bench_git(supervisor, args, workdir)),
+            ]
+            if not args.skip_slow:
+                steps.append(("sigterm-ignored", lambda: bench_sigterm_ignored(supervisor, watcher, args)))
+            for name, step in steps:
+                if args.only and name not in args.only:
+                    continue
+                print(f"Running {name}...", file=sys.stderr, flush=True)
+                results.update(step())
+    return results
+
+
+# --- Baseline ----------------------------------------------------------------
+
+def compare(results, baseline, tolerance):
+    """Return (lines to print, regressions) comparing results with a baseline file."""
+    lines, regressions = [], []
+    for name, value in results.items():
+        entry = baseline.get("metrics", {}).get(name)
+        if entry is None:
+            lines.append(f"  {name:<30} {value:>12.3f}")
+            continue
+        base = entry["value"]
+        allowed = entry.get("tolerance", tolerance)
+        higher_is_better, min_delta = METRICS[name]
+        min_delta = entry.get("min_delta", min_delta)
+        change = (value - base) / base if base else 0.0
+        if higher_is_better:
+            worse = change < -allowed and base - value > min_delta
+        else:
+            worse = change > allowed and value - base > min_delta
+        status = "REGRESSION" if worse else "ok"
+        lines.append(f"  {name:<30} {value:>12.3f}  baseline {base:>12.3f}  {change:+7.1%}  {status}")
+        if worse:
+            regressions.append(name)
+    return lines, regressions
+
+
+def save_baseline(path, results, tolerance):
+    data = {
+        "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "machine": f"{os.uname().sysname} {os.uname().machine}, {os.cpu_count()} CPUs",
+        "metrics": {name: {"value": round(value, 4), "tolerance": tolerance, "min_delta": METRICS[name][1],
+                           "higher_is_better": METRICS[name][0]} for name, value in results.items()},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv[:1] == ["child"]:
+        child = argparse.ArgumentParser(prog="bench_supervisor.py child", description="Synthetic supervised process.")
+        child.add_argument("--lines", type=int, help="Lines to print before idling (default: unlimited)")
+        child.add_argument("--rate", type=float, help="Lines per second (default: as fast as possible)")
+        child.add_argument("--size", type=int, default=100, help="Padding characters per line (default: 100)")
+        child.add_argument("--stderr-every", type=int, default=0, help="Send every Nth line to stderr")
+        child.add_argument("--crash-after", type=float, help="Exit after this many seconds")
+        child.add_argument("--exit-code", type=int, default=1)
+        child.add_argument("--ignore-sigterm", action="store_true")
+        run_child(child.parse_args(argv[1:]))
+        return 0
+
+    parser = argparse.ArgumentParser(description="Benchmark start_and_monitor.py with a synthetic child.")
+    parser.add_argument("--lines", type=int, default=100_000, help="Lines for the throughput run (default: 100000)")
+    parser.add_argument("--line-size", type=int, default=120, help="Padding characters per line (default: 120)")
+    parser.add_argument("--stderr-every", type=int, default=10, help="Every Nth line goes to stderr (default: 10)")
+    parser.add_argument("--latency-rate", type=float, default=2_000, help="Lines/s for the latency run (default: 2000)")
+    parser.add_argument("--latency-seconds", type=float, default=3.0)
+    parser.add_argument("--restarts", type=int, default=5)
+    parser.add_argument("--crash-after", type=float, default=0.2, help="Child lifetime in the restart run")
+    parser.add_argument("--poll-interval", type=float, default=0.01,
+                        help="How often restart_process_if_crashed is called (default: 0.01s)")
+    parser.add_argument("--git-checks", type=int, default=20)
+    parser.add_argument("--only", nargs="+", choices=["forwarding", "latency", "restart", "git", "sigterm-ignored"])
+    parser.add_argument("--skip-slow", action="store_true", help="Skip the SIGTERM-ignored shutdown (~10s)")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed relative change for metrics without their own (default: 0.5)")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results, args.tolerance)
+        print(f"Done! Baseline saved to {args.baseline}")
+        return 0
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    lines, regressions = compare(results, baseline, args.tolerance)
+    print("\n".join(lines))
+    if regressions:
+        print(f"Regressed: {', '.join(regressions)}")
+        return 1
+    print("Done! No regressions" if baseline else "Done! (no baseline to compare with)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Bulk Grade Report Exporter
+Writes the per-student grade report of every turma in one batch, offline.
+
+The relatorios page (ExportControls) fetches every avaliacao of a turma and
+runs MediaCalculator.calculateFinalMedia per student on each export. This
+script computes the same professor/auto/peers/total breakdown with
+grade_engine.compute_final_medias for all turmas at once, one turma per task
+in a process pool, and writes:
+
+    turma_<id>.csv     one row per (problema, aluno), students without
+                       evaluations included with zeros, then (for turmas
+                       with more than one problema) one "Média de Todos os
+                       Problemas" row per aluno
+    turma_<id>.xlsx    the same table (--formats csv,xlsx, needs openpyxl)
+    manifest.json      per turma: input hash, files, counts and status
+
+Each turma's input hash covers its alunos, problemas (names, criterios, file
+definitions) and avaliacoes in order. A turma whose hash matches the previous
+manifest and whose files are still there is skipped, so re-running after a
+few changes only rewrites the turmas that changed. The manifest lists the
+turmas of the current source; entries of turmas that are gone are dropped,
+unless --turmas restricted the run to a few of them.
+
+The "Média de Todos os Problemas" rows (id_problema -1) average each column
+like the relatorios page does with several problemas selected: over the
+turma's problemas that have any avaliacao, rounded like toFixed(2);
+peer_count is the sum over those problemas.
+
+Sources: the local SQLite stand-in (local_db.py), where each worker reads
+its own turma, or a CSV export with its problemas JSON (generate_all_notas.py
+sidecar), which is read once and split by turma.
+
+Examples:
+    python bulk_export_notas.py --db local.sqlite3 --output relatorios
+    python bulk_export_notas.py --csv notas.csv --problemas notas.csv.problemas.json --formats csv,xlsx
+    python bulk_export_notas.py --db local.sqlite3 --turmas 3,7 --force
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import local_db
+from grade_engine import compute_final_medias, js_to_fixed
+from notas_columnar import ColumnarNotas, iter_csv_rows
+
+# Bump when the report layout changes, so every cached turma is written again
+REPORT_VERSION = 2
+REPORT_COLUMNS = ["id_problema", "nome_problema", "id_aluno", "nome_completo",
+                  "professor", "auto", "peers", "total", "peer_count"]
+FORMATS = ("csv", "xlsx")
+# The "average" option of the relatorios page
+MEDIA_GERAL_ID = -1
+MEDIA_GERAL_NOME = "Média de Todos os Problemas"
+MANIFEST = "manifest.json"
+
+
+# Inputs: {"turma": {...}, "alunos": [[id, nome], ...], "problemas": [{...}], "rows": [parsed avaliacoes]}
+
+def turma_info(id_turma, nome_turma=None):
+    return {"id_turma": id_turma, "nome_turma": nome_turma or f"Turma {id_turma}"}
+
+
+def problema_info(problema):
+    """The problema fields a report depends on (media_geral is derived, so it is left out)."""
+    return {
+        "id_problema": problema["id_problema"],
+        "nome_problema": problema.get("nome_problema") or f"Problema {problema['id_problema']}",
+        "criterios": problema.get("criterios") or {},
+        "definicao_arquivos_de_avaliacao": problema.get("definicao_arquivos_de_avaliacao") or [],
+    }
+
+
+def load_turma_db(db_path, id_turma, parse=True):
+    """Read one turma's alunos, problemas and avaliacoes from the local database.
+
+    With parse=False the notas are kept as stored text, which is all input_hash needs.
+    """
+    conn = local_db.connect(db_path)
+    try:
+        row = conn.execute("SELECT nome_turma FROM turmas WHERE id_turma = ?", (id_turma,)).fetchone()
+        alunos = [[id_aluno, nome or f"Aluno {id_aluno}"] for id_aluno, nome in conn.execute(
+            "SELECT id_aluno, nome_completo FROM alunos WHERE id_turma = ? ORDER BY id_aluno", (id_turma,))]
+        ids = [r[0] for r in conn.execute("SELECT id_problema FROM problemas WHERE id_turma = ?", (id_turma,))]
+        problemas = sorted((problema_info(p) for p in local_db.fetch_problemas(conn, ids)),
+                           key=lambda p: p["id_problema"])
+        rows = list(local_db.iter_avaliacoes(conn, id_turma=id_turma, parse=parse))
+    finally:
+        conn.close()
+    return {"turma": turma_info(id_turma, row[0] if row else None), "alunos": alunos,
+            "problemas": problemas, "rows": rows}
+
+
+def list_turmas_db(db_path):
+    conn = local_db.connect(db_path)
+    try:
+        query = ("SELECT id_turma FROM turmas UNION "
+                 "SELECT DISTINCT id_turma FROM problemas WHERE id_turma IS NOT NULL ORDER BY id_turma")
+        return [r[0] for r in conn.execute(query)]
+    finally:
+        conn.close()
+
+
+def load_turmas_csv(csv_path, problemas_path):
+    """Read a CSV export once and split it by turma. Returns (inputs by id_turma, unassigned row count)."""
+    turmas, problemas = local_db.read_layout(problemas_path)
+    inputs = {}
+    for turma in turmas:
+        inputs[turma["id_turma"]] = {
+            "turma": turma_info(turma["id_turma"], turma.get("nome_turma")),
+            "alunos": [[id_aluno, f"Aluno {id_aluno}"] for id_aluno in sorted(turma.get("alunos", []))],
+            "problemas": [],
+            "rows": [],
+        }
+    turma_of = {}
+    for problema in sorted(problemas, key=lambda p: p["id_problema"]):
+        id_turma = problema.get("id_turma")
+        if id_turma is None:
+            continue
+        if id_turma not in inputs:
+            inputs[id_turma] = {"turma": turma_info(id_turma), "alunos": [], "problemas": [], "rows": []}
+        inputs[id_turma]["problemas"].append(problema_info(problema))
+        turma_of[problema["id_problema"]] = id_turma
+
+    unassigned = 0
+    for row in iter_csv_rows(csv_path):
+        id_turma = turma_of.get(row["id_problema"])
+        if id_turma is None:
+            unassigned += 1
+            continue
+        inputs[id_turma]["rows"].append(row)
+    return inputs, unassigned
+
+
+def input_hash(data):
+    """sha256 of everything a turma's report is computed from, in evaluation order.
+
+    Rows may carry notas as parsed dicts (CSV) or as the stored JSON text (local database); the
+    two give different hashes, so switching sources re-exports every turma once.
+    """
+    digest = hashlib.sha256()
+    header = {"version": REPORT_VERSION, "turma": data["turma"], "alunos": data["alunos"],
+              "problemas": data["problemas"]}
+    digest.update(_canonical(header))
+    for row in data["rows"]:
+        digest.update(_canonical([row["id_problema"], row["id_aluno_avaliado"], row["id_aluno_avaliador"],
+                                  row["id_professor"], row["notas"], row["notas_por_arquivo"]]))
+    return digest.hexdigest()
+
+
+def _canonical(value):
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+# Report
+
+def build_report(data):
+    """Report rows for one turma, ordered by problema and student name."""
+    problemas = {p["id_problema"]: p["nome_problema"] for p in data["problemas"]}
+    nomes = {id_aluno: nome for id_aluno, nome in data["alunos"]}
+    alunos = [id_aluno for id_aluno, _ in data["alunos"]]
+    roster = {id_problema: alunos for id_problema in problemas}
+    result = compute_final_medias(ColumnarNotas.from_rows(data["rows"]), roster)
+
+    report = []
+    for i, (id_problema, id_aluno) in enumerate(zip(result["id_problema"].tolist(), result["id_aluno"].tolist())):
+        report.append([
+            id_problema,
+            problemas.get(id_problema, f"Problema {id_problema}"),
+            id_aluno,
+            nomes.get(id_aluno, f"Aluno {id_aluno}"),
+            float(result["professor"][i]),
+            float(result["auto"][i]),
+            float(result["peers"][i]),
+            float(result["total"][i]),
+            int(result["peer_count"][i]),
+        ])
+    if len(problemas) > 1:
+        evaluated = {row["id_problema"] for row in data["rows"]}
+        report.extend(average_rows(report, evaluated))
+    report.sort(key=lambda r: (r[0], r[3], r[2]))
+    return report
+
+
+def average_rows(report, evaluated):
+    """One "Média de Todos os Problemas" row per aluno: each column averaged over the evaluated problemas.
+
+    Problemas without any avaliacao are skipped, as getAverageFinalMediaAcrossSelectedProblems
+    does; an aluno with none left gets zeros.
+    """
+    nomes = {}
+    by_aluno = {}
+    for row in report:
+        nomes[row[2]] = row[3]
+        if row[0] in evaluated:
+            by_aluno.setdefault(row[2], []).append(row)
+    averages = []
+    for id_aluno, nome in nomes.items():
+        rows = by_aluno.get(id_aluno)
+        if rows:
+            means = js_to_fixed([sum(r[i] for r in rows) / len(rows) for i in range(4, 8)]).tolist()
+            peer_count = sum(r[8] for r in rows)
+        else:
+            means, peer_count = [0.0] * 4, 0
+        averages.append([MEDIA_GERAL_ID, MEDIA_GERAL_NOME, id_aluno, nome, *means, peer_count])
+    return averages
+
+
+def write_csv(report, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(REPORT_COLUMNS)
+        writer.writerows(report)
+
+
+def write_xlsx(report, path, title):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title="Notas")
+    sheet.freeze_panes = "A2"
+    sheet.append(REPORT_COLUMNS)
+    for row in report:
+        sheet.append(row)
+    workbook.properties.title = title
+    workbook.save(path)
+
+
+def export_turma(task):
+    """Export one turma (runs in a worker process). Returns its manifest entry."""
+    started = time.perf_counter()
+    from_db = task["data"] is None
+    data = load_turma_db(task["db"], task["id_turma"], parse=False) if from_db else task["data"]
+    digest = input_hash(data)
+    files = {fmt: f"turma_{task['id_turma']}.{fmt}" for fmt in task["formats"]}
+    entry = {
+        "id_turma": task["id_turma"],
+        "nome_turma": data["turma"]["nome_turma"],
+        "input_hash": digest,
+        "files": files,
+        "alunos": len(data["alunos"]),
+        "problemas": len(data["problemas"]),
+        "avaliacoes": len(data["rows"]),
+    }
+
+    previous = task["previous"]
+    if (previous and not task["force"] and previous.get("input_hash") == digest
+            and all(previous.get("files", {}).get(fmt) == name for fmt, name in files.items())
+            and all(os.path.exists(os.path.join(task["output"], name)) for name in files.values())):
+        entry.update(results=previous.get("results"), status="cached",
+                     seconds=round(time.perf_counter() - started, 4))
+        return entry
+
+    if from_db:
+        data = load_turma_db(task["db"], task["id_turma"])
+    report = build_report(data)
+    # Write to a temporary file and rename, so an interrupted run never leaves half a report
+    for fmt, name in files.items():
+        path = os.path.join(task["output"], name)
+        tmp = f"{path}.tmp"
+        if fmt == "csv":
+            write_csv(report, tmp)
+        else:
+            write_xlsx(report, tmp, data["turma"]["nome_turma"])
+        os.replace(tmp, path)
+    entry.update(results=len(report), status="exported", seconds=round(time.perf_counter() - started, 4))
+    return entry
+
+
+# Manifest
+
+def read_manifest(output_dir):
+    """Previous manifest entries by id_turma, or {} when there is none."""
+    path = os.path.join(output_dir, MANIFEST)
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    return {entry["id_turma"]: entry for entry in manifest.get("turmas", []) if "id_turma" in entry}
+
+
+def write_manifest(output_dir, entries, source, formats):
+    path = os.path.join(output_dir, MANIFEST)
+    manifest = {
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "report_version": REPORT_VERSION,
+        "source": source,
+        "formats": list(formats),
+        "columns": REPORT_COLUMNS,
+        "turmas": [entries[id_turma] for id_turma in sorted(entries)],
+    }
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(f"{path}.tmp", path)
+    return path
+
+
+def parse_formats(text):
+    formats = [fmt.strip().lower() for fmt in text.split(",") if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in FORMATS]
+    if unknown or not formats:
+        raise argparse.ArgumentTypeError(f"formats must be a comma-separated subset of {', '.join(FORMATS)}")
+    return list(dict.fromkeys(formats))
+
+
+def parse_ids(text):
+    try:
+        return {int(value) for value in text.split(",") if value.strip()}
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected comma-separated ids")
+
+
+def run(args):
+    if "xlsx" in args.formats:
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError:
+            sys.exit("openpyxl is required for xlsx output: pip install openpyxl")
+
+    started = time.perf_counter()
+    os.makedirs(args.output, exist_ok=True)
+    previous = read_manifest(args.output)
+
+    if args.db:
+        source = args.db
+        inputs = {id_turma: None for id_turma in list_turmas_db(args.db)}
+        unassigned = 0
+    else:
+        source = args.csv
+        inputs, unassigned = load_turmas_csv(args.csv, args.problemas)
+    if args.turmas:
+        inputs = {id_turma: data for id_turma, data in inputs.items() if id_turma in args.turmas}
+
+    tasks = [{
+        "id_turma": id_turma,
+        "data": data,
+        "db": args.db,
+        "output": args.output,
+        "formats": args.formats,
+        "previous": previous.get(id_turma),
+        "force": args.force,
+    } for id_turma, data in sorted(inputs.items())]
+
+    # Turmas no longer in the source leave the manifest, unless only some turmas were exported
+    entries = dict(previous) if args.turmas else {}
+    failed = 0
+
+    def record(task, future_result):
+        nonlocal failed
+        try:
+            entry = future_result()
+        except Exception as e:
+            failed += 1
+            print(f"Turma {task['id_turma']}: FAILED: {e}")
+            # Keep the last good entry so its files stay cached, but flag the failure
+            entry = dict(previous.get(task["id_turma"], {"id_turma": task["id_turma"]}))
+            entry.update(status="error", error=str(e))
+        entries[task["id_turma"]] = entry
+
+    if args.workers <= 1:
+        for task in tasks:
+            record(task, lambda: export_turma(task))
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = {pool.submit(export_turma, task): task for task in tasks}
+            for future in as_completed(futures):
+                record(futures[future], future.result)
+
+    manifest_path = write_manifest(args.output, entries, source, args.formats)
+    elapsed = time.perf_counter() - started
+    statuses = [entries[task["id_turma"]].get("status") for task in tasks]
+    results = sum(entries[task["id_turma"]].get("results") or 0 for task in tasks)
+    print(f"Done! {len(tasks)} turmas in {elapsed:.2f}s: {statuses.count('exported')} exported, "
+          f"{statuses.count('cached')} unchanged, {failed} failed; {results} results. Manifest: {manifest_path}")
+    if unassigned:
+        print(f"  {unassigned} avaliacoes belong to problemas without a turma and were left out")
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export per-turma grade reports in bulk.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--db", help="Local SQLite database (local_db.py)")
+    source.add_argument("--csv", help="CSV export of avaliacoes (needs --problemas)")
+    parser.add_argument("--problemas", help="Problemas JSON with turmas and alunos (generate_all_notas.py sidecar)")
+    parser.add_argument("--output", default="relatorios", help="Output directory (default: relatorios)")
+    parser.add_argument("--formats", type=parse_formats, default=["csv"],
+                        help="Comma-separated output formats: csv, xlsx (default: csv)")
+    parser.add_argument("--turmas", type=parse_ids, help="Only export these turmas (comma-separated ids)")
+    parser.add_argument("--force", action="store_true", help="Rewrite every turma, even when its inputs are unchanged")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPUs)")
+    args = parser.parse_args(argv)
+    if args.csv and not args.problemas:
+        parser.error("--csv needs --problemas to know which turma each problema belongs to")
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
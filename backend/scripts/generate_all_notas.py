@@ -1,42 +1,386 @@
-import csv
+#!/usr/bin/env python3
+"""
+Synthetic Notas Generator
+Generates seeded, reproducible avaliacoes datasets for load and capacity testing.
+
+The output CSV keeps the format of the original all-pairs sample
+(id_aluno_avaliado, id_aluno_avaliador, id_problema, notas). When professor
+evaluations are requested, id_professor and notas_por_arquivo columns are
+appended. A sidecar <output>.problemas.json describes the generated turmas,
+problemas, criterios and file definitions.
+
+Examples:
+    # Same shape as the old hardcoded script (47 alunos, one problem, all pairs)
+    python generate_all_notas.py --seed 42
+
+    # 200 turmas of 40 alunos in groups of 8, 6 problems each, every evaluation kind
+    python generate_all_notas.py --turmas 200 --alunos-por-turma 40 --tamanho-grupo 8 \\
+        --problemas-por-turma 6 --avaliacoes peer,self,professor --output big.csv
+
+    # Columnar output (.npy matrices) instead of CSV
+    python generate_all_notas.py --turmas 50 --formato npy --output notas_npy
+"""
+
+import argparse
 import json
-import random
-
-# List of alunos (edit as needed)
-alunos = [16,18,19,20,21,22,23,24,25,26,27,28,29,30,31,32,33,34,35,36,37,38,39,40,41,42,43,44,45,46,47,48,49,50,51,52,53,54,55,56,57,58,59,61,62,64,71]
-# The problem ID to use for all rows
-id_problema = 28
-
-# Function to generate random notas
-def generate_notas():
-    return {
-        "Análise do Problema": {
-            "conhecimento": round(random.uniform(0.6, 1.0), 1),
-            "habilidades": round(random.uniform(1.1, 1.5), 1),
-            "atitudes": round(random.uniform(1.1, 1.5), 1)
-        },
-        "Resolução do Problema": {
-            "conhecimento": round(random.uniform(0.7, 1.0), 1),
-            "habilidades": round(random.uniform(1.1, 1.5), 1),
-            "atitudes": round(random.uniform(1.1, 1.5), 1)
-        },
-        "media": round(random.uniform(1.0, 1.5), 2)
-    }
-
-output_file = 'notas_sample_clean_all_pairs.csv'
-
-with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-    writer = csv.writer(csvfile)
-    writer.writerow(['id_aluno_avaliado', 'id_aluno_avaliador', 'id_problema', 'notas'])
-    for id_aluno_avaliado in alunos:
-        for id_aluno_avaliador in alunos:
-            if id_aluno_avaliado != id_aluno_avaliador:
-                notas = generate_notas()
-                writer.writerow([
-                    id_aluno_avaliado,
-                    id_aluno_avaliador,
-                    id_problema,
-                    json.dumps(notas, ensure_ascii=False)
-                ])
-
-print(f"Done! Output written to {output_file}") 
\ No newline at end of file
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from notas_columnar import ColumnarNotasWriter, NotasSchema, js_number
+
+DEFAULT_TAGS = ["Análise do Problema", "Resolução do Problema"]
+DEFAULT_CRITERIOS = ["conhecimento", "habilidades", "atitudes"]
+# Student max grade per criterio; criterios not listed here use 1.5
+DEFAULT_NOTAS_MAXIMAS = {"conhecimento": 1.0, "habilidades": 1.5, "atitudes": 1.5}
+EVALUATION_KINDS = ("peer", "self", "professor")
+
+LEGACY_COLUMNS = ["id_aluno_avaliado", "id_aluno_avaliador", "id_problema", "notas"]
+PROFESSOR_COLUMNS = ["id_professor", "notas_por_arquivo"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic avaliacoes dataset.")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed (default: unseeded)")
+    parser.add_argument("--turmas", type=int, default=1, help="Number of turmas (default: 1)")
+    parser.add_argument("--alunos-por-turma", type=int, default=47, help="Alunos per turma (default: 47)")
+    parser.add_argument("--tamanho-grupo", type=int, default=0,
+                        help="Group size for peer evaluations; 0 means the whole turma (default: 0)")
+    parser.add_argument("--problemas-por-turma", type=int, default=1, help="Problems per turma (default: 1)")
+    parser.add_argument("--tags", default=",".join(DEFAULT_TAGS),
+                        help="Comma-separated criterio tags, or a number to generate 'Tag N' names")
+    parser.add_argument("--criterios", default=",".join(DEFAULT_CRITERIOS),
+                        help="Comma-separated criterio names, or a number to generate 'criterio_N' names")
+    parser.add_argument("--arquivos", type=int, default=1,
+                        help="File definitions per problem, graded by the professor (default: 1)")
+    parser.add_argument("--avaliacoes", default="peer",
+                        help="Comma-separated evaluation kinds: peer, self, professor (default: peer)")
+    parser.add_argument("--min-fraction", type=float, default=0.6,
+                        help="Lowest sampled grade as a fraction of the criterio max (default: 0.6)")
+    parser.add_argument("--primeiro-aluno", type=int, default=16, help="First id_aluno (default: 16)")
+    parser.add_argument("--primeiro-problema", type=int, default=28, help="First id_problema (default: 28)")
+    parser.add_argument("--formato", choices=["csv", "npy"], default="csv", help="Output format (default: csv)")
+    parser.add_argument("--chunk-size", type=int, default=200_000, help="Rows generated per chunk (default: 200000)")
+    parser.add_argument("--output", default="notas_sample_clean_all_pairs.csv", help="Output file or directory")
+    args = parser.parse_args(argv)
+
+    kinds = [k.strip() for k in args.avaliacoes.split(",") if k.strip()]
+    unknown = [k for k in kinds if k not in EVALUATION_KINDS]
+    if unknown or not kinds:
+        parser.error(f"--avaliacoes must be a subset of {', '.join(EVALUATION_KINDS)}")
+    args.avaliacoes = kinds
+    args.tags = _parse_names(args.tags, "Tag")
+    args.criterios = _parse_names(args.criterios, "criterio")
+    if args.turmas < 1 or args.alunos_por_turma < 1 or args.problemas_por_turma < 1:
+        parser.error("--turmas, --alunos-por-turma and --problemas-por-turma must be positive")
+    if args.tamanho_grupo < 0 or args.chunk_size < 1:
+        parser.error("--tamanho-grupo must be >= 0 and --chunk-size must be positive")
+    if not 0.0 <= args.min_fraction <= 1.0:
+        parser.error("--min-fraction must be between 0 and 1")
+    return args
+
+
+def _parse_names(value, prefix):
+    """Accept either a comma-separated list of names or a count."""
+    value = value.strip()
+    if value.isdigit():
+        return [f"{prefix} {i + 1}" if prefix[0].isupper() else f"{prefix}_{i + 1}" for i in range(int(value))]
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def build_criterios_group(tags, criterios):
+    """Build a CriteriosGroup ({tag: [Criterio]}) shared by every generated problem."""
+    group = {}
+    for tag in tags:
+        group[tag] = [
+            {
+                "nome_criterio": nome,
+                "descricao_criterio": "",
+                "nota_maxima_aluno": DEFAULT_NOTAS_MAXIMAS.get(nome.lower(), 1.5),
+                "nota_maxima_professor": DEFAULT_NOTAS_MAXIMAS.get(nome.lower(), 1.5),
+            }
+            for nome in criterios
+        ]
+    return group
+
+
+def build_file_defs(count):
+    return [
+        {
+            "nome_tipo": f"Relatório {i + 1}",
+            "descricao_tipo": "",
+            "tipos_de_arquivos_aceitos": ["pdf"],
+            "nota_maxima": 2.0,
+        }
+        for i in range(count)
+    ]
+
+
+def build_layout(args):
+    """Describe turmas, alunos and problemas. Ids are assigned sequentially."""
+    turmas = []
+    next_aluno = args.primeiro_aluno
+    next_problema = args.primeiro_problema
+    for t in range(args.turmas):
+        alunos = list(range(next_aluno, next_aluno + args.alunos_por_turma))
+        next_aluno += args.alunos_por_turma
+        problemas = list(range(next_problema, next_problema + args.problemas_por_turma))
+        next_problema += args.problemas_por_turma
+        turmas.append({
+            "id_turma": t + 1,
+            "id_professor": t + 1,
+            "alunos": alunos,
+            "problemas": problemas,
+        })
+    return turmas
+
+
+def count_rows(args):
+    """Number of rows the generator will produce, known before sampling."""
+    n = args.alunos_por_turma
+    g = args.tamanho_grupo if 0 < args.tamanho_grupo < n else n
+    full_groups, remainder = divmod(n, g)
+    per_problem = 0
+    if "peer" in args.avaliacoes:
+        per_problem += full_groups * g * (g - 1) + remainder * (remainder - 1)
+    if "self" in args.avaliacoes:
+        per_problem += n
+    if "professor" in args.avaliacoes:
+        per_problem += n
+    return per_problem * args.turmas * args.problemas_por_turma
+
+
+def _off_diagonal(g):
+    """Row/column indices of every ordered pair (i, j), i != j, in a group of size g."""
+    i, j = np.nonzero(~np.eye(g, dtype=bool))
+    return i, j
+
+
+def iter_peer_pairs(alunos, group_size, block_rows):
+    """Yield (avaliado, avaliador) arrays for every ordered pair inside each group.
+
+    Groups of equal size are expanded together with broadcasting; a single
+    large group is split by avaliado so no block exceeds ``block_rows`` pairs.
+    """
+    alunos = np.asarray(alunos, dtype=np.int64)
+    n = len(alunos)
+    g = group_size if 0 < group_size < n else n
+    full_groups = n // g
+    sized = [(alunos[: full_groups * g].reshape(full_groups, g), g)]
+    if n % g > 1:
+        sized.append((alunos[full_groups * g:].reshape(1, n % g), n % g))
+
+    for members, size in sized:
+        pairs_per_group = size * (size - 1)
+        if pairs_per_group == 0:
+            continue
+        if pairs_per_group <= block_rows:
+            rows, cols = _off_diagonal(size)
+            step = max(1, block_rows // pairs_per_group)
+            for start in range(0, len(members), step):
+                batch = members[start:start + step]
+                yield batch[:, rows].ravel(), batch[:, cols].ravel()
+        else:
+            # One group larger than a block: split it by avaliado
+            step = max(1, block_rows // (size - 1))
+            for group in members:
+                for start in range(0, size, step):
+                    avaliados = group[start:start + step]
+                    grid_avaliado = np.repeat(avaliados, size)
+                    grid_avaliador = np.tile(group, len(avaliados))
+                    keep = grid_avaliado != grid_avaliador
+                    yield grid_avaliado[keep], grid_avaliador[keep]
+
+
+def iter_row_keys(args, turmas):
+    """Yield key blocks: (avaliado, avaliador, id_problema, id_professor, kind)."""
+    for turma in turmas:
+        alunos = np.asarray(turma["alunos"], dtype=np.int64)
+        for id_problema in turma["problemas"]:
+            if "peer" in args.avaliacoes:
+                for avaliado, avaliador in iter_peer_pairs(alunos, args.tamanho_grupo, args.chunk_size):
+                    yield avaliado, avaliador, id_problema, 0, "peer"
+            if "self" in args.avaliacoes:
+                yield alunos, alunos, id_problema, 0, "self"
+            if "professor" in args.avaliacoes:
+                yield alunos, np.zeros_like(alunos), id_problema, turma["id_professor"], "professor"
+
+
+def sample_notas(rng, rows, maximos, min_fraction):
+    """Sample a (rows, k) matrix of grades rounded to one decimal, stored in tenths."""
+    maximos = np.asarray(maximos, dtype=np.float64)
+    low = np.round(maximos * min_fraction * 10)
+    high = np.round(maximos * 10)
+    # integers() is inclusive of both bounds with endpoint=True
+    return rng.integers(low, high, size=(rows, len(maximos)), endpoint=True, dtype=np.int16)
+
+
+def _format_tenths(max_tenths):
+    """Lookup table from tenths to the JSON number text JavaScript would print."""
+    table = []
+    for t in range(max_tenths + 1):
+        whole, frac = divmod(t, 10)
+        table.append(str(whole) if frac == 0 else f"{whole}.{frac}")
+    return table
+
+
+def _json_key(name):
+    return json.dumps(name, ensure_ascii=False) + ":"
+
+
+def _csv_quoted_parts(parts):
+    """CSV-escape the fixed JSON text of a field and wrap it in the field quotes."""
+    parts = [p.replace('"', '""') for p in parts]
+    parts[0] = '"' + parts[0]
+    parts[-1] = parts[-1] + '"'
+    return parts
+
+
+def _fill(parts, numbers):
+    """Interleave the fixed text with the number texts: parts[0] n0 parts[1] n1 ... parts[-1]."""
+    out = [parts[0]]
+    for number, part in zip(numbers, parts[1:]):
+        out.append(number)
+        out.append(part)
+    return "".join(out)
+
+
+class CsvNotasWriter:
+    """Streams rows in the CSV/JSON format consumed by the backend."""
+
+    def __init__(self, path, tags, criterios, file_defs, with_professor):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.with_professor = with_professor
+        self.file_names = [d["nome_tipo"] for d in file_defs]
+        columns = LEGACY_COLUMNS + (PROFESSOR_COLUMNS if with_professor else [])
+        self.file.write(",".join(columns) + "\r\n")
+
+        # The notas JSON is identical for every row except for the numbers, so it
+        # is rendered from the fixed text between them, already CSV-escaped.
+        # Names are JSON-encoded, never interpolated, so any character is safe.
+        notas_parts = []
+        text = "{"
+        for i, tag in enumerate(tags):
+            text += ("," if i else "") + _json_key(tag) + "{"
+            for j, criterio in enumerate(criterios):
+                notas_parts.append(text + ("," if j else "") + _json_key(criterio))
+                text = ""
+            text += "}"
+        notas_parts.append(text + ("," if tags else "") + _json_key("media"))
+        notas_parts.append("}")
+        self.notas_parts = _csv_quoted_parts(notas_parts)
+
+        arquivos_parts = []
+        text = "{"
+        for i, name in enumerate(self.file_names):
+            arquivos_parts.append(text + ("," if i else "") + _json_key(name) + "{" + _json_key("nota"))
+            text = ',"observacao":""}'
+        arquivos_parts.append(text + "}")
+        self.arquivos_parts = _csv_quoted_parts(arquivos_parts)
+        self.tenths = _format_tenths(100)
+
+    def _tenths_table(self, *blocks):
+        largest = max(int(b.max(initial=0)) for b in blocks if b is not None)
+        if largest >= len(self.tenths):
+            self.tenths = _format_tenths(largest)
+        return self.tenths
+
+    def write(self, avaliado, avaliador, id_problema, id_professor, notas, media, arquivos):
+        tenths = self._tenths_table(notas, arquivos)
+        notas_text = [_fill(self.notas_parts, [*(tenths[v] for v in row), js_number(m)])
+                      for row, m in zip(notas.tolist(), media.tolist())]
+        if id_professor:
+            arquivos_text = [_fill(self.arquivos_parts, [tenths[v] for v in row]) for row in arquivos.tolist()]
+            lines = [f"{a},,{id_problema},{n},{id_professor},{f}\r\n"
+                     for a, n, f in zip(avaliado.tolist(), notas_text, arquivos_text)]
+        else:
+            suffix = ",," if self.with_professor else ""
+            lines = [f"{a},{b},{id_problema},{n}{suffix}\r\n"
+                     for a, b, n in zip(avaliado.tolist(), avaliador.tolist(), notas_text)]
+        self.file.write("".join(lines))
+
+    def close(self):
+        self.file.close()
+
+
+class NpyNotasWriter(ColumnarNotasWriter):
+    """Adapts generated blocks (grades in tenths) to the columnar dataset layout."""
+
+    def write(self, avaliado, avaliador, id_problema, id_professor, notas, media, arquivos):
+        keys = np.empty((len(avaliado), 4), dtype=np.int64)
+        keys[:, 0] = avaliado
+        keys[:, 1] = avaliador
+        keys[:, 2] = id_problema
+        keys[:, 3] = id_professor
+        super().write(keys, notas / np.float32(10), media,
+                      arquivos / np.float32(10) if arquivos is not None else None)
+
+
+def write_layout(path, turmas, criterios_group, file_defs):
+    """Write the problemas sidecar used by the import/analysis scripts."""
+    problemas = []
+    for turma in turmas:
+        for id_problema in turma["problemas"]:
+            problemas.append({
+                "id_problema": id_problema,
+                "id_turma": turma["id_turma"],
+                "criterios": criterios_group,
+                "definicao_arquivos_de_avaliacao": file_defs,
+            })
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"turmas": turmas, "problemas": problemas}, f, ensure_ascii=False)
+
+
+def generate(args):
+    rng = np.random.default_rng(args.seed)
+    turmas = build_layout(args)
+    criterios_group = build_criterios_group(args.tags, args.criterios)
+    file_defs = build_file_defs(args.arquivos)
+    maximos = [c["nota_maxima_aluno"] for tag in args.tags for c in criterios_group[tag]]
+    arquivo_maximos = [d["nota_maxima"] for d in file_defs]
+    total_rows = count_rows(args)
+
+    output = Path(args.output)
+    if args.formato == "csv":
+        writer = CsvNotasWriter(output, args.tags, args.criterios, file_defs, "professor" in args.avaliacoes)
+        layout_path = output.with_name(output.name + ".problemas.json")
+    else:
+        schema = NotasSchema.from_criterios(criterios_group, file_defs)
+        writer = NpyNotasWriter(output, total_rows, schema)
+        layout_path = output / "problemas.json"
+
+    written = 0
+    try:
+        for avaliado, avaliador, id_problema, id_professor, _kind in iter_row_keys(args, turmas):
+            for start in range(0, len(avaliado), args.chunk_size):
+                block_avaliado = avaliado[start:start + args.chunk_size]
+                block_avaliador = avaliador[start:start + args.chunk_size]
+                rows = len(block_avaliado)
+                notas = sample_notas(rng, rows, maximos, args.min_fraction)
+                # media is the mean of every criterio grade, as stored by the frontend
+                media = np.round(notas.sum(axis=1) / (10.0 * notas.shape[1]), 10)
+                arquivos = (sample_notas(rng, rows, arquivo_maximos, args.min_fraction)
+                            if id_professor else None)
+                writer.write(block_avaliado, block_avaliador, id_problema, id_professor, notas, media, arquivos)
+                written += rows
+    finally:
+        writer.close()
+
+    write_layout(layout_path, turmas, criterios_group, file_defs)
+    return written, output, layout_path
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    started = time.perf_counter()
+    written, output, layout_path = generate(args)
+    elapsed = time.perf_counter() - started
+    rate = written / elapsed if elapsed > 0 else float("inf")
+    print(f"Done! {written} rows written to {output} in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+    print(f"Problem layout written to {layout_path}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,553 @@
+#!/usr/bin/env python3
+"""
+Offline Grade Engine
+Vectorized equivalent of MediaCalculator.calculateFinalMedia (src/utils/media_utils.ts).
+
+calculateFinalMedia looks up the professor and self evaluations with find()
+and the peer evaluations with filter() for every student, which is
+O(students x evaluations) per problem. This engine groups every evaluation by
+(id_problema, id_aluno_avaliado) once and computes all scores in a single
+pass with NumPy:
+
+    professor  first professor evaluation: criterios sum + notas_por_arquivo sum
+    auto       first self evaluation (avaliador == avaliado): criterios sum
+    peers      mean criterios sum of the other student evaluations
+    total      professor + auto + peers
+
+Each value is rounded like Number(x.toFixed(2)). Both notas_por_arquivo
+formats are supported (old: plain number, new: {nota, observacao}).
+
+The grades are summed in the column order of the problem's schema (the key
+order of its first row), while media_utils.ts adds them in each row's own
+JSON key order. Floating-point addition is not associative, so for rows
+whose keys come in another order a sum can differ in the last bit, and a
+value at a toFixed(2) tie can then come out 0.01 apart. Exports written by
+the app use one key order per problem, where the results are identical.
+
+Sources: a CSV export, a columnar directory (notas_columnar.py) or the local
+SQLite stand-in (local_db.py).
+
+conformance checks the engine against reference_final_media, a Python port
+of calculateFinalMedia, or with --typescript against the real
+media_utils.ts, run through ts-node (scripts/media_conformance.ts). Either
+way the source rows are checked together with edge_case_rows: several
+professor and self evaluations (find() keeps the first), no peers, notas
+without "media" and both file grade formats. On sources with mixed key
+orders it can report those 0.01 differences.
+
+Examples:
+    python grade_engine.py compute --csv notas.csv --output medias.csv
+    python grade_engine.py compute --db local.sqlite3 --output medias.csv
+    python grade_engine.py conformance --csv notas.csv
+    python grade_engine.py conformance --csv notas.csv --typescript
+    python grade_engine.py benchmark --alunos 10000
+"""
+
+import argparse
+import csv
+import json
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+
+import local_db
+from notas_columnar import ColumnarNotas, iter_csv_rows, load_problemas, pack_keys
+
+RESULT_COLUMNS = ["id_problema", "id_aluno", "professor", "auto", "peers", "total"]
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TS_RUNNER = os.path.join("scripts", "media_conformance.ts")
+DEFAULT_TS_COMMAND = f"npx --no-install ts-node --transpile-only {TS_RUNNER}"
+_ID_MASK = (1 << 21) - 1
+
+
+def js_to_fixed(values, digits=2):
+    """Vectorized Number(x.toFixed(digits)).
+
+    toFixed rounds the exact binary value half up, which differs from
+    np.round (half to even on a scaled, inexact value) only near ties; those
+    few values are resolved with Decimal.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    scale = 10.0 ** digits
+    scaled = values * scale
+    result = np.floor(scaled + 0.5) / scale
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for index in np.flatnonzero(near_tie):
+        result.flat[index] = _decimal_to_fixed(float(values.flat[index]), digits)
+    return result
+
+
+def _decimal_to_fixed(value, digits):
+    quantum = Decimal(1).scaleb(-digits)
+    return float(Decimal(value).quantize(quantum, rounding=ROUND_HALF_UP))
+
+
+def widen(values, decimals=6):
+    """float32 grades -> the float64 values the JSON text would have parsed to."""
+    return np.round(np.asarray(values, dtype=np.float64), decimals)
+
+
+def row_sums(matrix):
+    """Sum each row left to right, skipping NaN.
+
+    The order is the schema's column order, not the row's own key order that the TS loops
+    follow, so rows with reordered keys can differ in the last bit (see the module docstring).
+    """
+    matrix = widen(matrix)
+    total = np.zeros(matrix.shape[0], dtype=np.float64)
+    for column in range(matrix.shape[1]):
+        values = matrix[:, column]
+        total += np.where(np.isnan(values), 0.0, values)
+    return total
+
+
+def compute_final_medias(dataset, roster=None):
+    """Compute professor/auto/peers/total for every (problema, aluno avaliado).
+
+    ``roster`` optionally maps id_problema -> alunos, so students without any
+    evaluation get a zero row, as calculateFinalMedia would return for them.
+    Returns a dict of equal-length arrays keyed by RESULT_COLUMNS plus
+    ``peer_count``.
+    """
+    avaliado = np.asarray(dataset.avaliado)
+    avaliador = np.asarray(dataset.avaliador)
+    problema = np.asarray(dataset.problema)
+    professor = np.asarray(dataset.professor)
+
+    notas_sum = row_sums(dataset.notas)
+    arquivos_sum = row_sums(dataset.arquivos)
+
+    group_keys = pack_keys(avaliado, np.zeros_like(avaliado), problema)
+    if roster:
+        extra = [(id_problema, id_aluno) for id_problema, alunos in roster.items() for id_aluno in alunos]
+        extra = np.array(extra, dtype=np.int64).reshape(-1, 2)
+        all_keys = np.concatenate([group_keys, pack_keys(extra[:, 1], np.zeros(len(extra), np.int64), extra[:, 0])])
+        unique_keys, inverse = np.unique(all_keys, return_inverse=True)
+        group = inverse[: len(group_keys)]
+    else:
+        unique_keys, group = np.unique(group_keys, return_inverse=True)
+    groups = len(unique_keys)
+
+    is_professor = professor != 0
+    is_auto = ~is_professor & (avaliador == avaliado)
+    is_peer = ~is_professor & (avaliador != avaliado)
+
+    professor_score = np.zeros(groups)
+    rows = np.flatnonzero(is_professor)
+    if len(rows):
+        # find() returns the first match, so keep the first row of each group
+        found, first = np.unique(group[rows], return_index=True)
+        professor_score[found] = notas_sum[rows[first]] + arquivos_sum[rows[first]]
+
+    auto_score = np.zeros(groups)
+    rows = np.flatnonzero(is_auto)
+    if len(rows):
+        found, first = np.unique(group[rows], return_index=True)
+        auto_score[found] = notas_sum[rows[first]]
+
+    rows = np.flatnonzero(is_peer)
+    peer_count = np.bincount(group[rows], minlength=groups)
+    peer_sum = np.bincount(group[rows], weights=notas_sum[rows], minlength=groups)
+    peers_score = np.divide(peer_sum, peer_count, out=np.zeros(groups), where=peer_count > 0)
+
+    total = professor_score + auto_score + peers_score
+    return {
+        "id_problema": unique_keys >> 42,
+        "id_aluno": (unique_keys >> 21) & _ID_MASK,
+        "professor": js_to_fixed(professor_score),
+        "auto": js_to_fixed(auto_score),
+        "peers": js_to_fixed(peers_score),
+        "total": js_to_fixed(total),
+        "peer_count": peer_count,
+    }
+
+
+def calculate_raw_sum(notas):
+    """Port of MediaCalculator.calculateRawSum: sum of the top-level numbers, toFixed(2).
+
+    Accepts the JSON text or an already parsed dict. This is the value
+    AvaliacaoController averages into problema.media_geral.
+    """
+    if not notas:
+        return 0
+    if isinstance(notas, str):
+        try:
+            notas = json.loads(notas)
+        except json.JSONDecodeError:
+            return 0
+    if not isinstance(notas, dict):
+        return 0
+    values = [v for v in notas.values() if _is_number(v)]
+    return _decimal_to_fixed(sum(values), 2) if values else 0
+
+
+def problem_medias(result):
+    """media_geral per problem as ProblemaController computes it: mean of the students' totals."""
+    ids, inverse = np.unique(result["id_problema"], return_inverse=True)
+    sums = np.bincount(inverse, weights=result["total"])
+    counts = np.bincount(inverse)
+    return dict(zip(ids.tolist(), (sums / counts).tolist()))
+
+
+# Reference implementation: a line-by-line port of calculateFinalMedia, used for conformance checks
+
+def sum_notas(notas):
+    """sumNotas in calculateFinalMedia: the numbers inside each tag of a parsed notas dict."""
+    total = 0
+    for criterios in (notas or {}).values():
+        if isinstance(criterios, dict):
+            for value in criterios.values():
+                if _is_number(value):
+                    total += value
+    return total
+
+
+def sum_file_grades(notas_por_arquivo):
+    """sumFileGrades in calculateFinalMedia: plain numbers (old format) or {nota, observacao}."""
+    total = 0
+    for value in (notas_por_arquivo or {}).values():
+        if _is_number(value):
+            total += value
+        elif isinstance(value, dict) and _is_number(value.get("nota")):
+            total += value["nota"]
+    return total
+
+
+def reference_final_media(avaliacoes, aluno_id, criterios_group, file_defs):
+    """Direct port of MediaCalculator.calculateFinalMedia over AvaliacaoModel-like dicts."""
+    def avaliado_id(av):
+        return (av.get("aluno_avaliado") or {}).get("id")
+
+    def avaliador_id(av):
+        return (av.get("aluno_avaliador") or {}).get("id")
+
+    prof_eval = next((av for av in avaliacoes if av.get("id_professor") and avaliado_id(av) == aluno_id), None)
+    professor_score = 0
+    if prof_eval:
+        professor_score = sum_notas(prof_eval.get("notas")) + sum_file_grades(prof_eval.get("notas_por_arquivo"))
+
+    auto_eval = next((av for av in avaliacoes if avaliador_id(av) == aluno_id and avaliado_id(av) == aluno_id
+                      and not av.get("id_professor")), None)
+    auto_score = sum_notas(auto_eval.get("notas")) if auto_eval else 0
+
+    peer_evals = [av for av in avaliacoes if avaliado_id(av) == aluno_id and avaliador_id(av) != aluno_id
+                  and not av.get("id_professor")]
+    peers_score = 0
+    if peer_evals:
+        peer_sums = [sum_notas(av.get("notas")) for av in peer_evals]
+        total = 0
+        for value in peer_sums:
+            total += value
+        peers_score = total / len(peer_sums)
+
+    total = professor_score + auto_score + peers_score
+    return {
+        "professor": _decimal_to_fixed(professor_score, 2),
+        "auto": _decimal_to_fixed(auto_score, 2),
+        "peers": _decimal_to_fixed(peers_score, 2),
+        "total": _decimal_to_fixed(total, 2),
+    }
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def to_model(row):
+    """Shape a parsed avaliacao row like the AvaliacaoModel the frontend passes to calculateFinalMedia."""
+    return {
+        "id_problema": row["id_problema"],
+        "id_professor": row["id_professor"] or None,
+        "aluno_avaliado": {"id": row["id_aluno_avaliado"]} if row["id_aluno_avaliado"] else None,
+        "aluno_avaliador": {"id": row["id_aluno_avaliador"]} if row["id_aluno_avaliador"] else None,
+        "notas": row["notas"],
+        "notas_por_arquivo": row["notas_por_arquivo"],
+    }
+
+
+# Sources
+
+def iter_source_rows(args):
+    """Parsed avaliacao rows from whichever source the CLI was given."""
+    if args.csv:
+        return iter_csv_rows(args.csv)
+    if args.db:
+        conn = local_db.connect(args.db)
+        return _closing_rows(conn, local_db.iter_avaliacoes(conn))
+    dataset = ColumnarNotas.load(args.columnar)
+    return ({**row, "id_aluno_avaliado": int(row["id_aluno_avaliado"]),
+             "id_aluno_avaliador": int(row["id_aluno_avaliador"] or 0),
+             "id_problema": int(row["id_problema"]),
+             "id_professor": int(row["id_professor"] or 0),
+             "notas": json.loads(row["notas"]),
+             "notas_por_arquivo": json.loads(row["notas_por_arquivo"] or "{}")}
+            for row in dataset.iter_csv_rows())
+
+
+def _closing_rows(conn, rows):
+    try:
+        yield from rows
+    finally:
+        conn.close()
+
+
+def load_source(args):
+    if args.columnar:
+        return ColumnarNotas.load(args.columnar)
+    return ColumnarNotas.from_rows(iter_source_rows(args))
+
+
+def load_roster(args):
+    """Map id_problema -> alunos of its turma, from a problemas JSON or the local database."""
+    if args.problemas:
+        with open(args.problemas, encoding="utf-8") as f:
+            data = json.load(f)
+        turmas = {t["id_turma"]: t.get("alunos", []) for t in data.get("turmas", [])} if isinstance(data, dict) else {}
+        return {p["id_problema"]: turmas.get(p.get("id_turma"), []) for p in load_problemas(args.problemas)}
+    if args.db:
+        conn = local_db.connect(args.db)
+        try:
+            roster = {}
+            query = ("SELECT p.id_problema, a.id_aluno FROM problemas p "
+                     "JOIN alunos a ON a.id_turma = p.id_turma ORDER BY p.id_problema, a.id_aluno")
+            for id_problema, id_aluno in conn.execute(query):
+                roster.setdefault(id_problema, []).append(id_aluno)
+            return roster
+        finally:
+            conn.close()
+    return None
+
+
+def write_results(result, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(RESULT_COLUMNS)
+        writer.writerows(zip(*(result[c].tolist() for c in RESULT_COLUMNS)))
+
+
+def edge_case_rows(id_problema):
+    """Avaliacoes for the cases calculateFinalMedia resolves with find()/filter(), in one problem.
+
+    aluno 1: two professor and two self evaluations (the first of each counts), two peers
+    aluno 2: a professor evaluation only (no peers), old number file grades
+    aluno 3: a self evaluation whose notas have no "media"
+    aluno 4: peers without "media", one with a non-number grade
+    aluno 5: a professor grade that toFixed(2) rounds half up (1.125 -> 1.13)
+    """
+    def notas(a, b, media=True):
+        value = {"Tag": {"c1": a, "c2": b}}
+        if media:
+            value["media"] = (a + b) / 2 if isinstance(b, (int, float)) else a
+        return value
+
+    def row(avaliado, avaliador, value, id_professor=0, arquivos=None):
+        return {"id_problema": id_problema, "id_aluno_avaliado": avaliado, "id_aluno_avaliador": avaliador,
+                "id_professor": id_professor, "notas": value, "notas_por_arquivo": arquivos or {}}
+
+    return [
+        row(1, 0, notas(1.5, 2), 1, {"Relatório": {"nota": 3.5, "observacao": ""}}),
+        row(1, 0, notas(0.5, 0.5), 1, {"Relatório": {"nota": 1, "observacao": ""}}),
+        row(1, 1, notas(1, 1)),
+        row(1, 1, notas(2, 2)),
+        row(1, 2, notas(1.2, 1.3)),
+        row(1, 3, notas(0.7, 0.1)),
+        row(2, 0, notas(2, 1.75), 1, {"Relatório": 2.25}),
+        row(3, 3, notas(1.1, 0.9, media=False)),
+        row(4, 1, notas(1.0, "x", media=False)),
+        row(4, 2, notas(0.333, 0.334, media=False)),
+        row(5, 0, notas(1.125, 0), 1),
+    ]
+
+
+def reference_results(rows, keys):
+    """Expected results from reference_final_media, keyed by (id_problema, id_aluno)."""
+    by_problema = {}
+    for row in rows:
+        by_problema.setdefault(row["id_problema"], []).append(to_model(row))
+    return {(id_problema, id_aluno): reference_final_media(by_problema.get(id_problema, []), id_aluno, {}, [])
+            for id_problema, id_aluno in keys}
+
+
+def typescript_results(rows, keys, command=DEFAULT_TS_COMMAND):
+    """Expected results from the real MediaCalculator.calculateFinalMedia, run with ts-node."""
+    problemas = {}
+    for row in rows:
+        problemas.setdefault(str(row["id_problema"]), []).append(to_model(row))
+    with tempfile.TemporaryDirectory() as tmp:
+        fixture_path = os.path.join(tmp, "fixture.json")
+        output_path = os.path.join(tmp, "results.json")
+        with open(fixture_path, "w", encoding="utf-8") as f:
+            json.dump({"problemas": problemas, "cases": [list(key) for key in keys]}, f, ensure_ascii=False)
+        try:
+            completed = subprocess.run(shlex.split(command) + [fixture_path, output_path], cwd=BACKEND_DIR,
+                                       capture_output=True, text=True)
+        except FileNotFoundError as e:
+            sys.exit(f"Could not run TypeScript ({e}); install the backend dependencies with npm install")
+        if completed.returncode != 0:
+            sys.exit(f"TypeScript run failed ({command}):\n{completed.stderr.strip()}")
+        with open(output_path, encoding="utf-8") as f:
+            results = json.load(f)
+    return {(id_problema, id_aluno): {"professor": professor, "auto": auto, "peers": peers, "total": total}
+            for id_problema, id_aluno, professor, auto, peers, total in results}
+
+
+def check_conformance(rows, result, limit=None, ts_command=None, always=()):
+    """Compare engine results with calculateFinalMedia. Returns (checked, mismatches).
+
+    The expected values come from the Python port, or from the TypeScript itself when
+    ts_command is given. Results of the problems in ``always`` are checked on top of the
+    first ``limit`` others.
+    """
+    all_keys = list(zip(result["id_problema"].tolist(), result["id_aluno"].tolist()))
+    index = {key: i for i, key in enumerate(all_keys)}
+    keys = [key for key in all_keys if key[0] in always]
+    keys += [key for key in all_keys if key[0] not in always][:limit]
+    if ts_command:
+        expected = typescript_results(rows, keys, ts_command)
+    else:
+        expected = reference_results(rows, keys)
+    mismatches = []
+    for key in keys:
+        actual = {k: float(result[k][index[key]]) for k in ("professor", "auto", "peers", "total")}
+        if actual != expected[key]:
+            mismatches.append((*key, expected[key], actual))
+    return len(keys), mismatches
+
+
+def run_benchmark(args):
+    """Time the engine against the reference port on a generated dataset."""
+    import generate_all_notas
+
+    per_turma = args.alunos_por_turma
+    turmas = max(1, args.alunos // per_turma)
+    with tempfile.TemporaryDirectory() as tmp:
+        gen_args = generate_all_notas.parse_args([
+            "--seed", str(args.seed),
+            "--turmas", str(turmas),
+            "--alunos-por-turma", str(per_turma),
+            "--tamanho-grupo", str(args.tamanho_grupo),
+            "--problemas-por-turma", str(args.problemas_por_turma),
+            "--avaliacoes", "peer,self,professor",
+            "--formato", "npy",
+            "--output", f"{tmp}/dataset",
+        ])
+        rows, _, _ = generate_all_notas.generate(gen_args)
+        print(f"Dataset: {turmas * per_turma} alunos, {turmas * args.problemas_por_turma} problemas, {rows} avaliacoes")
+
+        started = time.perf_counter()
+        dataset = ColumnarNotas.load(f"{tmp}/dataset")
+        result = compute_final_medias(dataset)
+        engine_seconds = time.perf_counter() - started
+        students = len(result["id_aluno"])
+        print(f"Engine:    {engine_seconds:.3f}s for {students} (aluno, problema) results "
+              f"({rows / engine_seconds:,.0f} avaliacoes/s)")
+
+        # The reference port is quadratic per problem; time a sample of problems and extrapolate
+        sample_ids = np.unique(result["id_problema"])[: args.reference_problemas]
+        by_problema = {}
+        for row in _sample_rows(dataset, sample_ids):
+            by_problema.setdefault(row["id_problema"], []).append(to_model(row))
+        started = time.perf_counter()
+        computed = 0
+        for id_problema, avaliacoes in by_problema.items():
+            for id_aluno in {av["aluno_avaliado"]["id"] for av in avaliacoes}:
+                reference_final_media(avaliacoes, id_aluno, {}, [])
+                computed += 1
+        reference_seconds = time.perf_counter() - started
+        estimate = reference_seconds * students / max(computed, 1)
+        print(f"Reference: {reference_seconds:.3f}s for {computed} results "
+              f"(~{estimate:.1f}s estimated for all {students}, {estimate / engine_seconds:,.0f}x slower)")
+
+
+def _sample_rows(dataset, problema_ids):
+    wanted = np.isin(np.asarray(dataset.problema), problema_ids)
+    for index in np.flatnonzero(wanted):
+        avaliado, avaliador, id_problema, id_professor = (int(v) for v in dataset.keys[index])
+        yield {
+            "id_problema": id_problema,
+            "id_aluno_avaliado": avaliado,
+            "id_aluno_avaliador": avaliador,
+            "id_professor": id_professor,
+            "notas": dataset.schema.notas_dict(id_problema, widen(dataset.notas[index])),
+            "notas_por_arquivo": {k: v["nota"] for k, v in
+                                  dataset.schema.arquivos_dict(id_problema, widen(dataset.arquivos[index])).items()},
+        }
+
+
+def _add_source_arguments(parser):
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="CSV export of avaliacoes")
+    source.add_argument("--columnar", help="Columnar directory written by notas_columnar.py")
+    source.add_argument("--db", help="Local SQLite database (local_db.py)")
+    parser.add_argument("--problemas", help="Problemas JSON, used to include students without evaluations")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute final grades for every student and problem in bulk.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compute = subparsers.add_parser("compute", help="Compute professor/auto/peers/total grades")
+    _add_source_arguments(compute)
+    compute.add_argument("--output", default="medias.csv", help="Output CSV (default: medias.csv)")
+
+    conformance = subparsers.add_parser("conformance", help="Check the engine against the calculateFinalMedia port")
+    _add_source_arguments(conformance)
+    conformance.add_argument("--limit", type=int, default=None, help="Check at most this many results")
+    conformance.add_argument("--typescript", action="store_true",
+                             help="Compare with media_utils.ts run through ts-node instead of the Python port")
+    conformance.add_argument("--ts-command", default=DEFAULT_TS_COMMAND,
+                             help=f"Command that runs the TypeScript runner (default: {DEFAULT_TS_COMMAND})")
+
+    benchmark = subparsers.add_parser("benchmark", help="Benchmark the engine on a generated dataset")
+    benchmark.add_argument("--alunos", type=int, default=10_000)
+    benchmark.add_argument("--alunos-por-turma", type=int, default=40)
+    benchmark.add_argument("--tamanho-grupo", type=int, default=8)
+    benchmark.add_argument("--problemas-por-turma", type=int, default=4)
+    benchmark.add_argument("--reference-problemas", type=int, default=50,
+                           help="Problems timed with the reference port (default: 50)")
+    benchmark.add_argument("--seed", type=int, default=42)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "benchmark":
+        run_benchmark(args)
+        return 0
+
+    started = time.perf_counter()
+    if args.command == "compute":
+        dataset = load_source(args)
+        result = compute_final_medias(dataset, load_roster(args))
+        write_results(result, args.output)
+        elapsed = time.perf_counter() - started
+        print(f"Done! {len(result['id_aluno'])} results from {len(dataset)} avaliacoes written to "
+              f"{args.output} in {elapsed:.2f}s")
+        return 0
+
+    rows = list(iter_source_rows(args))
+    edge_problema = max((row["id_problema"] for row in rows), default=0) + 1
+    rows = edge_case_rows(edge_problema) + rows
+    result = compute_final_medias(ColumnarNotas.from_rows(rows))
+    ts_command = args.ts_command if args.typescript else None
+    checked, mismatches = check_conformance(rows, result, args.limit, ts_command, always={edge_problema})
+    for id_problema, id_aluno, expected, actual in mismatches[:20]:
+        print(f"MISMATCH problema {id_problema} aluno {id_aluno}: expected {expected}, got {actual}")
+    if mismatches:
+        print(f"FAILED: {len(mismatches)} of {checked} results differ from calculateFinalMedia"
+              + (" (media_utils.ts)" if ts_command else ""))
+        if all(abs(expected[k] - actual[k]) < 0.0101 for *_, expected, actual in mismatches for k in actual):
+            print("  All differences are 0.01 or less: toFixed(2) ties of rows whose notas keys are in "
+                  "another order than the first row of their problema")
+        return 1
+    against = "media_utils.ts" if ts_command else "the calculateFinalMedia port"
+    print(f"OK: {checked} results match {against}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
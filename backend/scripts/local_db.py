@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Local Database Stand-in
+SQLite copy of the Supabase tables the grading code touches, for offline tools.
+
+The tables keep the Supabase column names and store notas, notas_por_arquivo,
+criterios and definicao_arquivos_de_avaliacao as JSON text, exactly like the
+backend does, so scripts can be pointed at a local file instead of Supabase.
+load also rebuilds the grade aggregates and media_geral (grade_aggregates.py),
+which the avaliacoes trigger maintains in Supabase.
+
+Examples:
+    # Create a database from a generated CSV and its problemas sidecar
+    python local_db.py load notas.csv --problemas notas.csv.problemas.json --db local.sqlite3
+
+    # Show table sizes
+    python local_db.py info --db local.sqlite3
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+import time
+
+from notas_columnar import dumps_notas, iter_csv_rows, load_problemas
+
+DEFAULT_DB = "local.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS turmas (
+    id_turma INTEGER PRIMARY KEY,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    id_professor INTEGER,
+    nome_turma TEXT
+);
+CREATE TABLE IF NOT EXISTS alunos (
+    id_aluno INTEGER PRIMARY KEY,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    nome_completo TEXT,
+    email TEXT,
+    id_turma INTEGER REFERENCES turmas(id_turma)
+);
+CREATE TABLE IF NOT EXISTS problemas (
+    id_problema INTEGER PRIMARY KEY,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    nome_problema TEXT,
+    id_turma INTEGER REFERENCES turmas(id_turma),
+    media_geral REAL,
+    criterios TEXT DEFAULT '{}',
+    definicao_arquivos_de_avaliacao TEXT DEFAULT '[]',
+    data_e_hora_criterios_e_arquivos TEXT DEFAULT '{}',
+    faltas_por_tag TEXT DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS avaliacoes (
+    id_avaliacao INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    id_problema INTEGER REFERENCES problemas(id_problema),
+    id_aluno_avaliador INTEGER,
+    id_aluno_avaliado INTEGER,
+    id_professor INTEGER,
+    notas TEXT DEFAULT '{}',
+    notas_por_arquivo TEXT DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS avaliacoes_id_problema_idx ON avaliacoes (id_problema);
+"""
+
+
+def connect(path=DEFAULT_DB):
+    """Open (and create if needed) the local database."""
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def insert_layout(conn, turmas, problemas):
+    """Insert turmas, alunos and problemas described by a problemas JSON file."""
+    conn.executemany(
+        "INSERT OR REPLACE INTO turmas (id_turma, id_professor, nome_turma) VALUES (?, ?, ?)",
+        [(t["id_turma"], t.get("id_professor"), t.get("nome_turma") or f"Turma {t['id_turma']}") for t in turmas],
+    )
+    conn.executemany(
+        "INSERT OR REPLACE INTO alunos (id_aluno, nome_completo, id_turma) VALUES (?, ?, ?)",
+        [(id_aluno, f"Aluno {id_aluno}", t["id_turma"]) for t in turmas for id_aluno in t.get("alunos", [])],
+    )
+    conn.executemany(
+        "INSERT OR REPLACE INTO problemas (id_problema, nome_problema, id_turma, criterios, "
+        "definicao_arquivos_de_avaliacao) VALUES (?, ?, ?, ?, ?)",
+        [
+            (
+                p["id_problema"],
+                p.get("nome_problema") or f"Problema {p['id_problema']}",
+                p.get("id_turma"),
+                json.dumps(p["criterios"], ensure_ascii=False),
+                json.dumps(p["definicao_arquivos_de_avaliacao"], ensure_ascii=False),
+            )
+            for p in problemas
+        ],
+    )
+
+
+def read_layout(path):
+    """Read turmas and problemas from a problemas JSON file."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    turmas = data.get("turmas", []) if isinstance(data, dict) else []
+    return turmas, load_problemas(path)
+
+
+def fetch_problemas(conn, ids=None):
+    """Return problemas with criterios and file definitions parsed."""
+    query = "SELECT id_problema, id_turma, nome_problema, media_geral, criterios, definicao_arquivos_de_avaliacao FROM problemas"
+    params = []
+    if ids is not None:
+        ids = list(ids)
+        query += f" WHERE id_problema IN ({','.join('?' * len(ids))})"
+        params = ids
+    problemas = []
+    for row in conn.execute(query, params):
+        problema = dict(row)
+        problema["criterios"] = _loads(problema["criterios"], {})
+        problema["definicao_arquivos_de_avaliacao"] = _loads(problema["definicao_arquivos_de_avaliacao"], [])
+        problemas.append(problema)
+    return problemas
+
+
+def iter_avaliacoes(conn, id_problema=None, id_turma=None, parse=True):
+    """Yield avaliacoes in id order as parsed rows, like notas_columnar.iter_csv_rows.
+
+    With parse=False notas and notas_por_arquivo are left as the stored JSON text.
+    """
+    query = ("SELECT id_avaliacao, id_problema, id_aluno_avaliador, id_aluno_avaliado, id_professor, notas, "
+             "notas_por_arquivo FROM avaliacoes")
+    params = []
+    if id_problema is not None:
+        query += " WHERE id_problema = ?"
+        params = [id_problema]
+    elif id_turma is not None:
+        query += " WHERE id_problema IN (SELECT id_problema FROM problemas WHERE id_turma = ?)"
+        params = [id_turma]
+    query += " ORDER BY id_avaliacao"
+    for row in conn.execute(query, params):
+        yield {
+            "id_avaliacao": row["id_avaliacao"],
+            "id_aluno_avaliado": row["id_aluno_avaliado"] or 0,
+            "id_aluno_avaliador": row["id_aluno_avaliador"] or 0,
+            "id_problema": row["id_problema"] or 0,
+            "id_professor": row["id_professor"] or 0,
+            "notas": _loads(row["notas"], {}) if parse else row["notas"],
+            "notas_por_arquivo": _loads(row["notas_por_arquivo"], {}) if parse else row["notas_por_arquivo"],
+        }
+
+
+def _loads(text, default):
+    if not text:
+        return default
+    try:
+        value = json.loads(text)
+    except (TypeError, json.JSONDecodeError):
+        return default
+    return value if isinstance(value, type(default)) else default
+
+
+def avaliacao_params(row):
+    """Map a parsed avaliacao row to INSERT parameters (None for absent ids)."""
+    return (
+        row["id_problema"],
+        row["id_aluno_avaliador"] or None,
+        row["id_aluno_avaliado"] or None,
+        row["id_professor"] or None,
+        dumps_notas(row["notas"]),
+        dumps_notas(row["notas_por_arquivo"]),
+    )
+
+
+INSERT_AVALIACAO = ("INSERT INTO avaliacoes (id_problema, id_aluno_avaliador, id_aluno_avaliado, id_professor, "
+                    "notas, notas_por_arquivo) VALUES (?, ?, ?, ?, ?, ?)")
+
+
+def load_csv(conn, csv_path, batch_size=10_000):
+    """Insert every avaliacao from a CSV export. Returns the number of rows."""
+    total = 0
+    batch = []
+    for row in iter_csv_rows(csv_path):
+        batch.append(avaliacao_params(row))
+        if len(batch) >= batch_size:
+            conn.executemany(INSERT_AVALIACAO, batch)
+            total += len(batch)
+            batch.clear()
+    if batch:
+        conn.executemany(INSERT_AVALIACAO, batch)
+        total += len(batch)
+    conn.commit()
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the local SQLite stand-in for the Supabase database.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    load = subparsers.add_parser("load", help="Load a CSV export (and optional problemas JSON)")
+    load.add_argument("csv_path")
+    load.add_argument("--problemas", help="Problemas JSON written by generate_all_notas.py")
+    load.add_argument("--db", default=DEFAULT_DB)
+
+    info = subparsers.add_parser("info", help="Show table sizes")
+    info.add_argument("--db", default=DEFAULT_DB)
+
+    args = parser.parse_args(argv)
+    conn = connect(args.db)
+    try:
+        if args.command == "load":
+            started = time.perf_counter()
+            if args.problemas:
+                insert_layout(conn, *read_layout(args.problemas))
+            rows = load_csv(conn, args.csv_path)
+            # Imported here: grade_aggregates imports this module
+            import grade_aggregates
+            grade_aggregates.rebuild(conn)
+            print(f"Done! {rows} avaliacoes loaded into {args.db} in {time.perf_counter() - started:.2f}s")
+        else:
+            for table in ("turmas", "alunos", "problemas", "avaliacoes"):
+                count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                print(f"{table}: {count}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
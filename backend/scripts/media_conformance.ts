@@ -0,0 +1,23 @@
+// Runs MediaCalculator.calculateFinalMedia on a fixture written by grade_engine.py conformance --typescript
+//
+// Usage: npx ts-node --transpile-only scripts/media_conformance.ts fixture.json results.json
+//
+// fixture.json: { "problemas": { "<id_problema>": [AvaliacaoModel, ...] }, "cases": [[id_problema, id_aluno], ...] }
+// results.json: [[id_problema, id_aluno, professor, auto, peers, total], ...] in the order of "cases"
+
+import * as fs from 'fs';
+import { MediaCalculator } from '../src/utils/media_utils';
+
+const [fixturePath, outputPath] = process.argv.slice(2);
+if (!fixturePath || !outputPath) {
+    console.error('Usage: media_conformance.ts <fixture.json> <results.json>');
+    process.exit(2);
+}
+
+const fixture = JSON.parse(fs.readFileSync(fixturePath, 'utf-8'));
+const results = fixture.cases.map(([idProblema, idAluno]: [number, number]) => {
+    const avaliacoes = fixture.problemas[String(idProblema)] || [];
+    const media = MediaCalculator.calculateFinalMedia(avaliacoes, idAluno, {}, []);
+    return [idProblema, idAluno, media.professor, media.auto, media.peers, media.total];
+});
+fs.writeFileSync(outputPath, JSON.stringify(results));
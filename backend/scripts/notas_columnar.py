@@ -0,0 +1,582 @@
+#!/usr/bin/env python3
+"""
+Columnar Notas Storage
+Stores avaliacoes as fixed-order float32 matrices instead of JSON-in-CSV.
+
+Each problem's criterios ({tag: {criterio: value}}) are mapped to a fixed
+column order, so one evaluation becomes one matrix row and consumers never
+re-parse JSON. A dataset is a directory:
+
+    schema.json   column names, row count and per-problem column lists
+    keys.npy      int64 (rows, 4): id_aluno_avaliado, id_aluno_avaliador, id_problema, id_professor
+    notas.npy     float32 (rows, notas columns), NaN where a problem has no such criterio
+    media.npy     float64 (rows,), the stored "media" field (NaN when absent)
+    arquivos.npy  float32 (rows, file types), professor file grades (NaN when absent)
+
+Professor evaluations use id_aluno_avaliador = 0, student evaluations use
+id_professor = 0. File observacoes are not kept; only the numeric grade is.
+
+The CSV reader accepts the three dialects found in this repo: standard CSV
+quoting (""), backslash-escaped quotes (notas_sample.csv) and unescaped JSON
+inside quotes (notas_sample_clean.csv).
+
+Examples:
+    python notas_columnar.py to-columnar notas_sample.csv notas_sample_npy
+    python notas_columnar.py to-csv notas_sample_npy roundtrip.csv
+    python notas_columnar.py info notas_sample_npy
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+KEY_COLUMNS = ["id_aluno_avaliado", "id_aluno_avaliador", "id_problema", "id_professor"]
+CSV_COLUMNS = ["id_aluno_avaliado", "id_aluno_avaliador", "id_problema", "notas"]
+PROFESSOR_CSV_COLUMNS = ["id_professor", "notas_por_arquivo"]
+MEDIA_KEY = "media"
+
+# Ids are packed into one int64 for lookups: 21 bits each
+_ID_BITS = 21
+ID_LIMIT = 1 << _ID_BITS
+
+
+def js_number(value):
+    """Format a number the way JSON.stringify would (1.0 -> 1, shortest repr otherwise)."""
+    if isinstance(value, np.floating):
+        text = np.format_float_positional(value, unique=True, trim="-")
+    else:
+        text = repr(float(value))
+        if text.endswith(".0"):
+            text = text[:-2]
+    return text
+
+
+class NotasSchema:
+    """Fixed column order for (tag, criterio) grades and file grades.
+
+    Columns are the union over every problem, in first-seen order. Problems
+    that do not list their own columns use all of them.
+    """
+
+    def __init__(self, notas=None, arquivos=None, problemas=None):
+        self.notas = [tuple(c) for c in (notas or [])]
+        self.arquivos = list(arquivos or [])
+        self.problemas = {int(k): v for k, v in (problemas or {}).items()}
+        self._notas_index = {c: i for i, c in enumerate(self.notas)}
+        self._arquivos_index = {c: i for i, c in enumerate(self.arquivos)}
+
+    @classmethod
+    def from_criterios(cls, criterios_group, file_defs=None):
+        """Build a schema from a problem's CriteriosGroup and file definitions."""
+        schema = cls()
+        schema.add_problema(None, criterios_group, file_defs)
+        return schema
+
+    def add_problema(self, id_problema, criterios_group, file_defs=None):
+        """Register a problem's criterios; criterio keys are lowercased like the frontend does."""
+        notas = [(tag, c["nome_criterio"].lower()) for tag, criterios in criterios_group.items() for c in criterios]
+        arquivos = [d["nome_tipo"] for d in (file_defs or []) if d.get("nome_tipo")]
+        self._register(id_problema, notas, arquivos)
+
+    def observe(self, id_problema, notas, notas_por_arquivo=None):
+        """Register the columns used by one parsed evaluation."""
+        columns = [(tag, criterio) for tag, criterios in (notas or {}).items() if isinstance(criterios, dict)
+                   for criterio in criterios]
+        self._register(id_problema, columns, list(notas_por_arquivo or {}))
+
+    def _register(self, id_problema, notas, arquivos):
+        for column in notas:
+            if column not in self._notas_index:
+                self._notas_index[column] = len(self.notas)
+                self.notas.append(column)
+        for name in arquivos:
+            if name not in self._arquivos_index:
+                self._arquivos_index[name] = len(self.arquivos)
+                self.arquivos.append(name)
+        if id_problema is None:
+            return
+        entry = self.problemas.setdefault(int(id_problema), {"notas": [], "arquivos": []})
+        for column in notas:
+            index = self._notas_index[column]
+            if index not in entry["notas"]:
+                entry["notas"].append(index)
+        for name in arquivos:
+            index = self._arquivos_index[name]
+            if index not in entry["arquivos"]:
+                entry["arquivos"].append(index)
+
+    def notas_columns(self, id_problema):
+        entry = self.problemas.get(int(id_problema))
+        return entry["notas"] if entry else list(range(len(self.notas)))
+
+    def arquivos_columns(self, id_problema):
+        entry = self.problemas.get(int(id_problema))
+        return entry["arquivos"] if entry else list(range(len(self.arquivos)))
+
+    def notas_row(self, notas):
+        """Flatten a {tag: {criterio: value}} dict into a float32 row."""
+        row = np.full(len(self.notas), np.nan, dtype=np.float32)
+        for tag, criterios in (notas or {}).items():
+            if not isinstance(criterios, dict):
+                continue
+            for criterio, value in criterios.items():
+                index = self._notas_index.get((tag, criterio))
+                if index is not None and isinstance(value, (int, float)) and not isinstance(value, bool):
+                    row[index] = value
+        return row
+
+    def arquivos_row(self, notas_por_arquivo):
+        """Flatten notas_por_arquivo (old number format or new {nota} format) into a float32 row."""
+        row = np.full(len(self.arquivos), np.nan, dtype=np.float32)
+        for name, value in (notas_por_arquivo or {}).items():
+            index = self._arquivos_index.get(name)
+            if index is None:
+                continue
+            if isinstance(value, dict):
+                value = value.get("nota")
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                row[index] = value
+        return row
+
+    def notas_dict(self, id_problema, row, media=None):
+        """Rebuild the nested notas dict for one matrix row."""
+        notas = {}
+        for index in self.notas_columns(id_problema):
+            value = row[index]
+            if np.isnan(value):
+                continue
+            tag, criterio = self.notas[index]
+            notas.setdefault(tag, {})[criterio] = value
+        if media is not None and not np.isnan(media):
+            notas[MEDIA_KEY] = media
+        return notas
+
+    def arquivos_dict(self, id_problema, row):
+        arquivos = {}
+        for index in self.arquivos_columns(id_problema):
+            if not np.isnan(row[index]):
+                arquivos[self.arquivos[index]] = {"nota": row[index], "observacao": ""}
+        return arquivos
+
+    def to_json(self, rows):
+        return {
+            "rows": int(rows),
+            "notas": [list(c) for c in self.notas],
+            "arquivos": self.arquivos,
+            "problemas": {str(k): v for k, v in self.problemas.items()},
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data.get("notas"), data.get("arquivos"), data.get("problemas"))
+
+
+class ColumnarNotasWriter:
+    """Fills a columnar dataset of a known row count in chunks, through memory maps."""
+
+    def __init__(self, path, rows, schema):
+        self.dir = Path(path)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.schema = schema
+        self.rows = rows
+        with open(self.dir / "schema.json", "w", encoding="utf-8") as f:
+            json.dump(schema.to_json(rows), f, ensure_ascii=False)
+        open_memmap = np.lib.format.open_memmap
+        self.keys = open_memmap(self.dir / "keys.npy", mode="w+", dtype=np.int64, shape=(rows, 4))
+        self.notas = open_memmap(self.dir / "notas.npy", mode="w+", dtype=np.float32,
+                                 shape=(rows, len(schema.notas)))
+        self.media = open_memmap(self.dir / "media.npy", mode="w+", dtype=np.float64, shape=(rows,))
+        self.arquivos = open_memmap(self.dir / "arquivos.npy", mode="w+", dtype=np.float32,
+                                    shape=(rows, len(schema.arquivos)))
+        self.offset = 0
+
+    def write(self, keys, notas, media, arquivos=None):
+        """Append a block; ``arquivos=None`` stores NaN file grades."""
+        end = self.offset + len(keys)
+        if end > self.rows:
+            raise ValueError(f"Writer sized for {self.rows} rows, got {end}")
+        block = slice(self.offset, end)
+        self.keys[block] = keys
+        self.notas[block] = notas
+        self.media[block] = media
+        self.arquivos[block] = np.nan if arquivos is None else arquivos
+        self.offset = end
+
+    def close(self):
+        for array in (self.keys, self.notas, self.media, self.arquivos):
+            array.flush()
+        del self.keys, self.notas, self.media, self.arquivos
+
+
+class ColumnarNotas:
+    """A loaded columnar dataset. Arrays are memory-mapped unless ``mmap=False``."""
+
+    def __init__(self, schema, keys, notas, media, arquivos):
+        self.schema = schema
+        self.keys = keys
+        self.notas = notas
+        self.media = media
+        self.arquivos = arquivos
+        self._index = None
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        path = Path(path)
+        with open(path / "schema.json", encoding="utf-8") as f:
+            schema = NotasSchema.from_json(json.load(f))
+        mode = "r" if mmap else None
+        arrays = [np.load(path / name, mmap_mode=mode) for name in ("keys.npy", "notas.npy", "media.npy", "arquivos.npy")]
+        return cls(schema, *arrays)
+
+    @classmethod
+    def from_rows(cls, rows, schema=None):
+        """Build an in-memory dataset from parsed rows (see iter_csv_rows)."""
+        rows = list(rows)
+        schema = schema or NotasSchema()
+        for row in rows:
+            schema.observe(row["id_problema"], row["notas"], row["notas_por_arquivo"])
+        keys = np.array([(r["id_aluno_avaliado"], r["id_aluno_avaliador"], r["id_problema"], r["id_professor"])
+                         for r in rows], dtype=np.int64).reshape(len(rows), 4)
+        notas = np.array([schema.notas_row(r["notas"]) for r in rows], dtype=np.float32).reshape(
+            len(rows), len(schema.notas))
+        media = np.array([_media_value(r["notas"]) for r in rows], dtype=np.float64)
+        arquivos = np.array([schema.arquivos_row(r["notas_por_arquivo"]) for r in rows], dtype=np.float32).reshape(
+            len(rows), len(schema.arquivos))
+        return cls(schema, keys, notas, media, arquivos)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def avaliado(self):
+        return self.keys[:, 0]
+
+    @property
+    def avaliador(self):
+        return self.keys[:, 1]
+
+    @property
+    def problema(self):
+        return self.keys[:, 2]
+
+    @property
+    def professor(self):
+        return self.keys[:, 3]
+
+    def _build_index(self):
+        packed = pack_keys(self.avaliado, self.avaliador, self.problema)
+        order = np.argsort(packed, kind="stable")
+        self._index = (packed[order], order)
+
+    def lookup(self, avaliado, avaliador, problema):
+        """Row numbers for (avaliado, avaliador, problema) keys; -1 where missing.
+
+        Accepts scalars or arrays. Professor evaluations use avaliador = 0.
+        """
+        if self._index is None:
+            self._build_index()
+        sorted_keys, order = self._index
+        wanted = pack_keys(np.atleast_1d(avaliado), np.atleast_1d(avaliador), np.atleast_1d(problema))
+        rows = np.full(len(wanted), -1, dtype=np.int64)
+        if len(sorted_keys):
+            position = np.minimum(np.searchsorted(sorted_keys, wanted), len(sorted_keys) - 1)
+            found = sorted_keys[position] == wanted
+            rows[found] = order[position[found]]
+        return rows if np.ndim(avaliado) else int(rows[0])
+
+    def iter_problemas(self):
+        """Yield (id_problema, row indices) for every problem, rows in file order."""
+        problema = np.asarray(self.problema)
+        order = np.argsort(problema, kind="stable")
+        ids, starts = np.unique(problema[order], return_index=True)
+        bounds = list(starts[1:]) + [len(order)]
+        for id_problema, start, end in zip(ids.tolist(), starts.tolist(), bounds):
+            yield id_problema, order[start:end]
+
+    def iter_csv_rows(self, chunk_size=100_000):
+        """Yield CSV row dicts (notas and notas_por_arquivo as JSON text)."""
+        schema = self.schema
+        for start in range(0, len(self), chunk_size):
+            keys = np.asarray(self.keys[start:start + chunk_size])
+            notas = np.asarray(self.notas[start:start + chunk_size])
+            media = np.asarray(self.media[start:start + chunk_size])
+            arquivos = np.asarray(self.arquivos[start:start + chunk_size])
+            for i, (avaliado, avaliador, id_problema, id_professor) in enumerate(keys.tolist()):
+                row = {
+                    "id_aluno_avaliado": avaliado,
+                    "id_aluno_avaliador": avaliador or "",
+                    "id_problema": id_problema,
+                    "notas": dumps_notas(schema.notas_dict(id_problema, notas[i], media[i])),
+                    "id_professor": id_professor or "",
+                    "notas_por_arquivo": "",
+                }
+                if id_professor:
+                    row["notas_por_arquivo"] = dumps_notas(schema.arquivos_dict(id_problema, arquivos[i]))
+                yield row
+
+
+def pack_keys(avaliado, avaliador, problema):
+    """Pack (avaliado, avaliador, problema) into a single sortable int64."""
+    avaliado = np.asarray(avaliado, dtype=np.int64)
+    avaliador = np.asarray(avaliador, dtype=np.int64)
+    problema = np.asarray(problema, dtype=np.int64)
+    if avaliado.size and max(avaliado.max(), avaliador.max(), problema.max()) >= ID_LIMIT:
+        raise ValueError(f"Ids must be below {ID_LIMIT} to be packed")
+    return (problema << (2 * _ID_BITS)) | (avaliado << _ID_BITS) | avaliador
+
+
+def dumps_notas(value):
+    """Serialize a notas dict compactly, with JavaScript-style numbers."""
+    return json.dumps(_js_numbers(value), ensure_ascii=False, separators=(",", ":"))
+
+
+def _js_numbers(value):
+    # json.dumps writes 1.0 where JSON.stringify writes 1, and cannot encode numpy scalars
+    if isinstance(value, dict):
+        return {k: _js_numbers(v) for k, v in value.items()}
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else value
+    if isinstance(value, np.floating):
+        return _js_numbers(float(js_number(value)))
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+def _media_value(notas):
+    value = notas.get(MEDIA_KEY)
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else np.nan
+
+
+def detect_dialect(first_line):
+    """Guess how JSON fields are quoted from the first data line."""
+    # Check how a JSON field opens first: a name containing a quote puts a JSON
+    # escape (backslash-quote) in the line whatever the CSV dialect
+    if '"{""' in first_line:
+        return "standard"
+    if '"{\\"' in first_line:
+        return "backslash"
+    if '\\"' in first_line:
+        return "backslash"
+    if '""' in first_line:
+        return "standard"
+    return "raw"
+
+
+def _split_raw_line(line, header):
+    """Parse a line whose JSON fields are quoted but not escaped."""
+    decoder = json.JSONDecoder()
+    line = line.rstrip("\r\n")
+    values = []
+    pos = 0
+    while len(values) < len(header) and pos <= len(line):
+        if line.startswith('"{', pos):
+            value, end = decoder.raw_decode(line, pos + 1)
+            values.append(json.dumps(value, ensure_ascii=False))
+            pos = end + 1  # Skip the closing quote
+        else:
+            comma = line.find(",", pos)
+            comma = len(line) if comma == -1 else comma
+            values.append(line[pos:comma])
+            pos = comma
+        pos += 1  # Skip the delimiter
+    return values
+
+
+def parse_csv_lines(lines, header, dialect):
+    """Yield one record dict (or None for blank lines) per single-line CSV record."""
+    if dialect == "raw":
+        for line in lines:
+            yield dict(zip(header, _split_raw_line(line, header))) if line.strip() else None
+        return
+    options = {"escapechar": "\\", "doublequote": False} if dialect == "backslash" else {}
+    # One reader for the whole batch; fall back to line by line if a record
+    # is malformed or spans lines, so each line still gets its own result
+    try:
+        parsed = list(csv.reader(lines, **options))
+    except csv.Error:
+        parsed = None
+    if parsed is None or len(parsed) != len(lines):
+        parsed = (next(csv.reader([line], **options), None) for line in lines)
+    for values in parsed:
+        yield dict(zip(header, values)) if values else None
+
+
+def iter_csv_records(path):
+    """Yield raw CSV records as dicts of strings, whatever the quoting dialect."""
+    with open(path, newline="", encoding="utf-8") as f:
+        header = next(csv.reader([f.readline()]))
+        first = f.readline()
+        if not first:
+            return
+        dialect = detect_dialect(first)
+        lines = _chain([first], f)
+        if dialect == "raw":
+            for record in parse_csv_lines(lines, header, dialect):
+                if record:
+                    yield record
+            return
+        options = {"escapechar": "\\", "doublequote": False} if dialect == "backslash" else {}
+        for values in csv.reader(lines, **options):
+            if values:
+                yield dict(zip(header, values))
+
+
+def _chain(head, tail):
+    yield from head
+    yield from tail
+
+
+def _parse_int(text):
+    text = (text or "").strip()
+    return int(float(text)) if text else 0
+
+
+def _parse_json(text):
+    text = (text or "").strip()
+    if not text:
+        return {}
+    try:
+        value = json.loads(text)
+    except json.JSONDecodeError:
+        return {}
+    return value if isinstance(value, dict) else {}
+
+
+def parse_record(record):
+    """Convert a raw CSV record into typed fields."""
+    return {
+        "id_aluno_avaliado": _parse_int(record.get("id_aluno_avaliado")),
+        "id_aluno_avaliador": _parse_int(record.get("id_aluno_avaliador")),
+        "id_problema": _parse_int(record.get("id_problema")),
+        "id_professor": _parse_int(record.get("id_professor")),
+        "notas": _parse_json(record.get("notas")),
+        "notas_por_arquivo": _parse_json(record.get("notas_por_arquivo")),
+    }
+
+
+def iter_csv_rows(path):
+    """Yield parsed avaliacao rows from a CSV export."""
+    for record in iter_csv_records(path):
+        yield parse_record(record)
+
+
+def load_problemas(path):
+    """Read a problemas JSON file ({"problemas": [...]}, as written by generate_all_notas.py)."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    problemas = data["problemas"] if isinstance(data, dict) else data
+    parsed = []
+    for problema in problemas:
+        problema = dict(problema)
+        for field, default in (("criterios", {}), ("definicao_arquivos_de_avaliacao", [])):
+            value = problema.get(field)
+            if isinstance(value, str):
+                try:
+                    value = json.loads(value)
+                except json.JSONDecodeError:
+                    value = default
+            problema[field] = value or default
+        parsed.append(problema)
+    return parsed
+
+
+def csv_to_columnar(csv_path, output_dir, problemas=None, chunk_size=100_000):
+    """Convert a CSV export to a columnar dataset in two streaming passes.
+
+    The first pass discovers the schema and row count, the second fills the
+    memory-mapped matrices chunk by chunk.
+    """
+    schema = NotasSchema()
+    for problema in problemas or []:
+        schema.add_problema(problema["id_problema"], problema["criterios"], problema["definicao_arquivos_de_avaliacao"])
+    rows = 0
+    for row in iter_csv_rows(csv_path):
+        schema.observe(row["id_problema"], row["notas"], row["notas_por_arquivo"])
+        rows += 1
+
+    writer = ColumnarNotasWriter(output_dir, rows, schema)
+    try:
+        keys, notas, media, arquivos = [], [], [], []
+        for row in iter_csv_rows(csv_path):
+            keys.append((row["id_aluno_avaliado"], row["id_aluno_avaliador"], row["id_problema"], row["id_professor"]))
+            notas.append(schema.notas_row(row["notas"]))
+            media.append(_media_value(row["notas"]))
+            arquivos.append(schema.arquivos_row(row["notas_por_arquivo"]))
+            if len(keys) >= chunk_size:
+                writer.write(np.array(keys, dtype=np.int64), np.array(notas), np.array(media), np.array(arquivos))
+                keys, notas, media, arquivos = [], [], [], []
+        if keys:
+            writer.write(np.array(keys, dtype=np.int64), np.array(notas), np.array(media), np.array(arquivos))
+    finally:
+        writer.close()
+    return rows
+
+
+def columnar_to_csv(input_dir, csv_path):
+    """Write a columnar dataset back to the standard CSV/JSON format."""
+    dataset = ColumnarNotas.load(input_dir)
+    with_professor = bool(np.any(np.asarray(dataset.professor) != 0))
+    columns = CSV_COLUMNS + (PROFESSOR_CSV_COLUMNS if with_professor else [])
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        buffer = []
+        for row in dataset.iter_csv_rows():
+            buffer.append(row)
+            if len(buffer) >= 10_000:
+                writer.writerows(buffer)
+                buffer.clear()
+        writer.writerows(buffer)
+    return len(dataset)
+
+
+def print_info(input_dir):
+    dataset = ColumnarNotas.load(input_dir)
+    problemas = np.unique(np.asarray(dataset.problema))
+    print(f"Rows: {len(dataset)}")
+    print(f"Problemas: {len(problemas)}")
+    print(f"Notas columns ({len(dataset.schema.notas)}):")
+    for tag, criterio in dataset.schema.notas:
+        print(f"  {tag} / {criterio}")
+    if dataset.schema.arquivos:
+        print(f"Arquivos columns ({len(dataset.schema.arquivos)}): {', '.join(dataset.schema.arquivos)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert avaliacoes between CSV/JSON and columnar matrices.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    to_columnar = subparsers.add_parser("to-columnar", help="Convert a CSV export to a columnar directory")
+    to_columnar.add_argument("csv_path")
+    to_columnar.add_argument("output_dir")
+    to_columnar.add_argument("--problemas", help="Problemas JSON used to fix the column order")
+    to_columnar.add_argument("--chunk-size", type=int, default=100_000)
+
+    to_csv = subparsers.add_parser("to-csv", help="Convert a columnar directory back to CSV")
+    to_csv.add_argument("input_dir")
+    to_csv.add_argument("csv_path")
+
+    info = subparsers.add_parser("info", help="Describe a columnar directory")
+    info.add_argument("input_dir")
+
+    args = parser.parse_args(argv)
+    started = time.perf_counter()
+    if args.command == "to-columnar":
+        problemas = load_problemas(args.problemas) if args.problemas else None
+        rows = csv_to_columnar(args.csv_path, args.output_dir, problemas, args.chunk_size)
+        print(f"Done! {rows} rows converted to {args.output_dir} in {time.perf_counter() - started:.2f}s")
+    elif args.command == "to-csv":
+        rows = columnar_to_csv(args.input_dir, args.csv_path)
+        print(f"Done! {rows} rows written to {args.csv_path} in {time.perf_counter() - started:.2f}s")
+    else:
+        print_info(args.input_dir)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
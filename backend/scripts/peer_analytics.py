@@ -0,0 +1,503 @@
+#!/usr/bin/env python3
+"""
+Peer Evaluation Analytics
+Evaluator bias, agreement, reciprocal patterns and outliers in the peer grades.
+
+The peer grades form a sparse matrix per (problema, criterio): avaliados x
+avaliadores. All of them are handled at once as one COO array with an entry
+per (problema, criterio, avaliado, avaliador), grouped with np.unique and
+aggregated with np.bincount. Grades are standardized per (problema, criterio)
+and fitted with an additive model by alternating group means:
+
+    z = quality of the avaliado + offset of the avaliador + residual   (per problema)
+
+From that, for every problem:
+
+    evaluators   leniency (offset > 0) or severity (offset < 0) in z units and
+                 points per grade, correlation with the other evaluators'
+                 consensus and the spread of the residuals
+    agreement    ICC(1) per (problema, criterio)
+    reciprocal   pairs that grade each other above the consensus
+    outliers     evaluations far from what the model expects (robust z-score)
+    peers        peer mean with evaluator offsets removed, next to the plain
+                 peer mean that MediaCalculator.calculateFinalMedia uses
+
+Offsets are centered per problem, so they are relative to the other
+evaluators of the same problem. A group whose members only evaluate each
+other cannot be told apart from a group of better students.
+
+Sources: a CSV export, a columnar directory (notas_columnar.py) or the local
+SQLite stand-in (local_db.py).
+
+Examples:
+    python peer_analytics.py analyze --csv notas.csv --output analytics/
+    python peer_analytics.py analyze --db local.sqlite3 --output analytics/ --reciprocal-threshold 0.8
+    python peer_analytics.py benchmark --alunos 10000 --problemas-por-turma 10
+"""
+
+import argparse
+import csv
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from grade_engine import compute_final_medias, js_to_fixed, load_source, row_sums, widen
+from notas_columnar import ColumnarNotas, pack_keys
+
+DEFAULT_ITERATIONS = 50
+DEFAULT_LENIENCY_THRESHOLD = 0.75
+DEFAULT_OUTLIER_THRESHOLD = 3.5
+DEFAULT_RECIPROCAL_THRESHOLD = 1.0
+
+_ID_MASK = (1 << 21) - 1
+# MAD -> standard deviation for normally distributed residuals
+_MAD_SCALE = 1.4826
+
+
+def _group(keys):
+    """Dense group ids for int64 keys: (sorted unique keys, group of each key)."""
+    return np.unique(keys, return_inverse=True)
+
+
+def _mean_by(group, values, size):
+    counts = np.bincount(group, minlength=size)
+    sums = np.bincount(group, weights=values, minlength=size)
+    return np.divide(sums, counts, out=np.zeros(size), where=counts > 0)
+
+
+def _median_by(group, values, size):
+    """Lower median of the values of each group."""
+    # One argsort of group + value scaled into [0, 0.5) is several times faster than lexsort
+    low, high = (values.min(), values.max()) if len(values) else (0.0, 0.0)
+    order = np.argsort(group + (values - low) / (2 * (high - low) or 1.0))
+    counts = np.bincount(group, minlength=size)
+    starts = np.cumsum(counts) - counts
+    medians = np.zeros(size)
+    present = counts > 0
+    medians[present] = values[order][starts[present] + (counts[present] - 1) // 2]
+    return medians
+
+
+def _correlation_by(group, x, y, size):
+    """Pearson correlation of x and y per group (NaN with fewer than 2 entries or no variance)."""
+    n = np.maximum(np.bincount(group, minlength=size), 1)
+    sx = np.bincount(group, x, size)
+    sy = np.bincount(group, y, size)
+    cov = np.bincount(group, x * y, size) - sx * sy / n
+    var = (np.bincount(group, x * x, size) - sx * sx / n) * (np.bincount(group, y * y, size) - sy * sy / n)
+    valid = var > 1e-12
+    return np.divide(cov, np.sqrt(np.where(valid, var, 1.0)), out=np.full(size, np.nan), where=valid)
+
+
+def peer_entries(dataset):
+    """COO form of the peer grades: one entry per (evaluation, criterio) with a grade."""
+    keys = np.asarray(dataset.keys)
+    # Same rows as the peers score of calculateFinalMedia / compute_final_medias
+    peer_rows = np.flatnonzero((keys[:, 3] == 0) & (keys[:, 1] != keys[:, 0]))
+    values = widen(dataset.notas[peer_rows])
+    index, criterio = np.nonzero(~np.isnan(values))
+    rows = peer_rows[index]
+    return {
+        "peer_rows": peer_rows,
+        "row": rows,
+        "problema": keys[rows, 2],
+        "avaliado": keys[rows, 0],
+        "avaliador": keys[rows, 1],
+        "criterio": criterio.astype(np.int64),
+        "value": values[index, criterio],
+    }
+
+
+def fit_bias_model(entries, iterations=DEFAULT_ITERATIONS, tolerance=1e-6):
+    """Standardize per (problema, criterio) and fit avaliado quality + avaliador offset."""
+    value, problema = entries["value"], entries["problema"]
+    zeros = np.zeros_like(problema)
+    # criterio/avaliado/avaliador go in the avaliado slot of pack_keys, so ids are always (key >> 21) & _ID_MASK
+    cell_keys, cell = _group(pack_keys(entries["criterio"], zeros, problema))
+    cell_mean = _mean_by(cell, value, len(cell_keys))
+    cell_std = np.sqrt(_mean_by(cell, (value - cell_mean[cell]) ** 2, len(cell_keys)))
+    z = np.divide(value - cell_mean[cell], cell_std[cell], out=np.zeros_like(value), where=cell_std[cell] > 0)
+
+    avaliado_keys, avaliado = _group(pack_keys(entries["avaliado"], zeros, problema))
+    avaliador_keys, avaliador = _group(pack_keys(entries["avaliador"], zeros, problema))
+    offset = np.zeros(len(avaliador_keys))
+    for _ in range(iterations):
+        quality = _mean_by(avaliado, z - offset[avaliador], len(avaliado_keys))
+        previous, offset = offset, _mean_by(avaliador, z - quality[avaliado], len(avaliador_keys))
+        if np.max(np.abs(offset - previous), initial=0.0) < tolerance:
+            break
+
+    # Only differences between evaluators are identifiable: center the offsets per problem
+    problema_keys, evaluator_problema = _group(avaliador_keys >> 42)
+    offset -= _mean_by(evaluator_problema, offset, len(problema_keys))[evaluator_problema]
+    quality = _mean_by(avaliado, z - offset[avaliador], len(avaliado_keys))
+
+    return {
+        "cell_keys": cell_keys,
+        "cell": cell,
+        "cell_mean": cell_mean,
+        "cell_std": cell_std,
+        "z": z,
+        "avaliado_keys": avaliado_keys,
+        "avaliado": avaliado,
+        "quality": quality,
+        "avaliador_keys": avaliador_keys,
+        "avaliador": avaliador,
+        "offset": offset,
+        "residual": z - quality[avaliado] - offset[avaliador],
+    }
+
+
+def leave_one_out_consensus(entries, model):
+    """For each entry, the mean z the other evaluators gave the same avaliado and criterio (NaN if none)."""
+    _, group = _group(pack_keys(entries["avaliado"], entries["criterio"], entries["problema"]))
+    counts = np.bincount(group)
+    sums = np.bincount(group, weights=model["z"])
+    others = counts[group] - 1
+    return np.divide(sums[group] - model["z"], others, out=np.full(len(group), np.nan), where=others > 0)
+
+
+def evaluator_table(entries, model, consensus, threshold=DEFAULT_LENIENCY_THRESHOLD):
+    """Per (problema, avaliador): evaluations, offsets, agreement with the consensus and residual spread."""
+    avaliador, size = model["avaliador"], len(model["avaliador_keys"])
+    _, first = np.unique(entries["row"], return_index=True)
+    points = model["offset"][avaliador] * model["cell_std"][model["cell"]]
+    compared = ~np.isnan(consensus)
+    deviation = _mean_by(avaliador[compared], (model["z"] - consensus)[compared], size)
+    deviation[np.bincount(avaliador[compared], minlength=size) == 0] = np.nan
+    return {
+        "id_problema": model["avaliador_keys"] >> 42,
+        "id_aluno_avaliador": (model["avaliador_keys"] >> 21) & _ID_MASK,
+        "evaluations": np.bincount(avaliador[first], minlength=size),
+        "grades": np.bincount(avaliador, minlength=size),
+        "offset_z": model["offset"],
+        "offset_points": _mean_by(avaliador, points, size),
+        "consensus_deviation_z": deviation,
+        "agreement_r": _correlation_by(avaliador[compared], model["z"][compared], consensus[compared], size),
+        "residual_rms": np.sqrt(_mean_by(avaliador, model["residual"] ** 2, size)),
+        "flagged": np.abs(model["offset"]) > threshold,
+    }
+
+
+def agreement_table(entries, model, schema):
+    """ICC(1) per (problema, criterio): share of the grade variance explained by who is evaluated."""
+    value, cell, cells = entries["value"], model["cell"], len(model["cell_keys"])
+    target_keys, target = _group(pack_keys(entries["avaliado"], entries["criterio"], entries["problema"]))
+    targets = len(target_keys)
+    target_cell = np.zeros(targets, dtype=np.int64)
+    target_cell[target] = cell
+    n_i = np.bincount(target, minlength=targets).astype(np.float64)
+    target_mean = _mean_by(target, value, targets)
+
+    ratings = np.bincount(cell, minlength=cells).astype(np.float64)
+    avaliados = np.bincount(target_cell, minlength=cells).astype(np.float64)
+    ss_between = np.bincount(target_cell, n_i * (target_mean - model["cell_mean"][target_cell]) ** 2, cells)
+    ss_within = np.bincount(cell, (value - target_mean[target]) ** 2, cells)
+    df_between, df_within = avaliados - 1, ratings - avaliados
+    valid = (df_between > 0) & (df_within > 0)
+    ms_between = np.divide(ss_between, df_between, out=np.zeros(cells), where=valid)
+    ms_within = np.divide(ss_within, df_within, out=np.zeros(cells), where=valid)
+    # Average ratings per avaliado, corrected for unequal group sizes
+    k0 = np.divide(ratings - np.bincount(target_cell, n_i ** 2, cells) / np.maximum(ratings, 1), df_between,
+                   out=np.ones(cells), where=valid)
+    denominator = ms_between + (k0 - 1) * ms_within
+    icc = np.divide(ms_between - ms_within, denominator, out=np.full(cells, np.nan), where=valid & (denominator > 0))
+
+    columns = [schema.notas[c] for c in ((model["cell_keys"] >> 21) & _ID_MASK).tolist()]
+    return {
+        "id_problema": model["cell_keys"] >> 42,
+        "tag": np.array([tag for tag, _ in columns], dtype=object),
+        "criterio": np.array([criterio for _, criterio in columns], dtype=object),
+        "avaliados": avaliados.astype(np.int64),
+        "ratings": ratings.astype(np.int64),
+        "icc": icc,
+    }
+
+
+def reciprocal_table(entries, model, consensus, threshold=DEFAULT_RECIPROCAL_THRESHOLD):
+    """Pairs that evaluated each other, with how far above the consensus each one graded the other (z).
+
+    The score is the smaller of the two deviations, so it is only high when
+    both sides are generous to each other. Pairs above ``threshold`` are flagged.
+    """
+    compared = ~np.isnan(consensus)
+    pair_keys, pair = _group(pack_keys(entries["avaliado"], entries["avaliador"], entries["problema"])[compared])
+    deviation = _mean_by(pair, (model["z"] - consensus)[compared], len(pair_keys))
+    problema, avaliado, avaliador = pair_keys >> 42, (pair_keys >> 21) & _ID_MASK, pair_keys & _ID_MASK
+    # Keep each mutual pair once, as a -> b with a < b
+    reverse = pack_keys(avaliador, avaliado, problema)
+    position = np.minimum(np.searchsorted(pair_keys, reverse), max(len(pair_keys) - 1, 0))
+    mutual = np.flatnonzero((pair_keys[position] == reverse) & (avaliador < avaliado))
+    back = position[mutual]
+    score = np.minimum(deviation[mutual], deviation[back])
+    return {
+        "id_problema": problema[mutual],
+        "aluno_a": avaliador[mutual],
+        "aluno_b": avaliado[mutual],
+        "a_to_b_z": deviation[mutual],
+        "b_to_a_z": deviation[back],
+        "score": score,
+        "flagged": score > threshold,
+    }
+
+
+def reciprocity_by_problem(reciprocal):
+    """Correlation between the two directions of the mutual pairs of each problem."""
+    problema_keys, problema = _group(reciprocal["id_problema"])
+    return {
+        "id_problema": problema_keys,
+        "pairs": np.bincount(problema, minlength=len(problema_keys)),
+        "reciprocity_r": _correlation_by(problema, reciprocal["a_to_b_z"], reciprocal["b_to_a_z"], len(problema_keys)),
+    }
+
+
+def outlier_table(entries, model, threshold=DEFAULT_OUTLIER_THRESHOLD):
+    """Score every evaluation by its residuals: robust z-score per (problema, criterio), RMS over criterios."""
+    residual, cell, cells = model["residual"], model["cell"], len(model["cell_keys"])
+    center = _median_by(cell, residual, cells)
+    sigma = _MAD_SCALE * _median_by(cell, np.abs(residual - center[cell]), cells)
+    # Mostly identical grades give a zero MAD; fall back to the RMS residual, then to 1
+    fallback = np.sqrt(_mean_by(cell, residual ** 2, cells))
+    sigma = np.where(sigma > 1e-9, sigma, np.where(fallback > 1e-9, fallback, 1.0))
+    pair_keys, pair = _group(pack_keys(entries["avaliado"], entries["avaliador"], entries["problema"]))
+    score = np.sqrt(_mean_by(pair, ((residual - center[cell]) / sigma[cell]) ** 2, len(pair_keys)))
+    return {
+        "id_problema": pair_keys >> 42,
+        "id_aluno_avaliado": (pair_keys >> 21) & _ID_MASK,
+        "id_aluno_avaliador": pair_keys & _ID_MASK,
+        "score": score,
+        "flagged": score > threshold,
+    }
+
+
+def adjusted_peer_means(dataset, entries, model, plain=None):
+    """Peer mean per (problema, avaliado), plain and with each avaliador's offset removed from their grades."""
+    peer_rows = entries["peer_rows"]
+    keys = np.asarray(dataset.keys)
+    # Points removed from each grade: the avaliador's offset in that criterio's scale
+    correction = model["offset"][model["avaliador"]] * model["cell_std"][model["cell"]]
+    row_correction = np.bincount(np.searchsorted(peer_rows, entries["row"]), weights=correction,
+                                 minlength=len(peer_rows))
+    adjusted_sums = row_sums(dataset.notas[peer_rows]) - row_correction
+
+    avaliado = keys[peer_rows, 0]
+    group_keys, group = _group(pack_keys(avaliado, np.zeros_like(avaliado), keys[peer_rows, 2]))
+    adjusted = js_to_fixed(_mean_by(group, adjusted_sums, len(group_keys)))
+
+    plain = plain if plain is not None else compute_final_medias(dataset)
+    plain_keys = pack_keys(plain["id_aluno"], np.zeros_like(plain["id_aluno"]), plain["id_problema"])
+    position = np.searchsorted(plain_keys, group_keys)
+    peers = plain["peers"][position]
+    return {
+        "id_problema": group_keys >> 42,
+        "id_aluno": (group_keys >> 21) & _ID_MASK,
+        "peer_count": plain["peer_count"][position],
+        "peers": peers,
+        "peers_adjusted": adjusted,
+        "delta": np.round(adjusted - peers, 2),
+    }
+
+
+def analyze(dataset, iterations=DEFAULT_ITERATIONS, leniency_threshold=DEFAULT_LENIENCY_THRESHOLD,
+            outlier_threshold=DEFAULT_OUTLIER_THRESHOLD, reciprocal_threshold=DEFAULT_RECIPROCAL_THRESHOLD):
+    """Run every analysis. Returns a dict of tables, each a dict of equal-length arrays."""
+    entries = peer_entries(dataset)
+    model = fit_bias_model(entries, iterations)
+    consensus = leave_one_out_consensus(entries, model)
+    reciprocal = reciprocal_table(entries, model, consensus, reciprocal_threshold)
+    return {
+        "evaluators": evaluator_table(entries, model, consensus, leniency_threshold),
+        "agreement": agreement_table(entries, model, dataset.schema),
+        "reciprocal": reciprocal,
+        "reciprocity": reciprocity_by_problem(reciprocal),
+        "outliers": outlier_table(entries, model, outlier_threshold),
+        "peers": adjusted_peer_means(dataset, entries, model),
+    }
+
+
+def write_table(table, path, flagged_only=False):
+    """Write a table as CSV, floats rounded to 4 decimals. Returns the number of rows written."""
+    rows = np.flatnonzero(table["flagged"]) if flagged_only else np.arange(len(next(iter(table.values()))))
+    columns = [name for name in table if not (flagged_only and name == "flagged")]
+    values = []
+    for name in columns:
+        column = np.asarray(table[name])[rows]
+        values.append((np.round(column, 4) if column.dtype.kind == "f" else column).tolist())
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        writer.writerows(zip(*values))
+    return len(rows)
+
+
+def write_report(tables, output):
+    """Write the report files to ``output``. Returns the number of rows written per file."""
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    return {
+        "evaluators.csv": write_table(tables["evaluators"], output / "evaluators.csv"),
+        "agreement.csv": write_table(tables["agreement"], output / "agreement.csv"),
+        "reciprocity.csv": write_table(tables["reciprocity"], output / "reciprocity.csv"),
+        "reciprocal_flagged.csv": write_table(tables["reciprocal"], output / "reciprocal_flagged.csv", True),
+        "outliers_flagged.csv": write_table(tables["outliers"], output / "outliers_flagged.csv", True),
+        "peers_adjusted.csv": write_table(tables["peers"], output / "peers_adjusted.csv"),
+    }
+
+
+def print_summary(tables):
+    evaluators, peers = tables["evaluators"], tables["peers"]
+    print(f"Evaluators: {len(evaluators['offset_z'])} (problema, avaliador) pairs, "
+          f"{int(evaluators['flagged'].sum())} flagged as lenient or severe")
+    if len(evaluators["offset_points"]):
+        low, median, high = np.percentile(evaluators["offset_points"], [5, 50, 95])
+        print(f"  offset per grade (points): p5 {low:+.3f}  p50 {median:+.3f}  p95 {high:+.3f}")
+    icc = tables["agreement"]["icc"]
+    if np.isfinite(icc).any():
+        print(f"Agreement: median ICC(1) {np.nanmedian(icc):.3f} over {int(np.isfinite(icc).sum())} "
+              f"(problema, criterio) cells")
+    print(f"Reciprocal: {len(tables['reciprocal']['score'])} mutual pairs, "
+          f"{int(tables['reciprocal']['flagged'].sum())} flagged")
+    print(f"Outliers: {int(tables['outliers']['flagged'].sum())} of {len(tables['outliers']['score'])} "
+          f"evaluations flagged")
+    if len(peers["delta"]):
+        changed = np.abs(peers["delta"]) >= 0.01
+        print(f"Peers: {int(changed.sum())} of {len(changed)} peer means change after the adjustment "
+              f"(max |delta| {np.abs(peers['delta']).max():.2f})")
+
+
+def inject_bias(dataset, rng, lenient_fraction, shift, colluding_pairs):
+    """Make some evaluators lenient and some mutual pairs give each other full marks.
+
+    Modifies ``dataset.notas`` in place. Returns the lenient evaluators as
+    (problema << 21 | avaliador) keys and the colluding pairs as
+    (problema, aluno_a, aluno_b) rows with aluno_a < aluno_b.
+    """
+    keys = np.asarray(dataset.keys)
+    peer = (keys[:, 3] == 0) & (keys[:, 1] != keys[:, 0])
+    maximum = np.nanmax(dataset.notas, axis=0)
+
+    evaluator_keys = np.unique(keys[peer, 2] << 21 | keys[peer, 1])
+    lenient = rng.choice(evaluator_keys, size=int(len(evaluator_keys) * lenient_fraction), replace=False)
+    rows = np.flatnonzero(peer & np.isin(keys[:, 2] << 21 | keys[:, 1], lenient))
+    dataset.notas[rows] = np.minimum(dataset.notas[rows] + np.round(shift * maximum, 1), maximum)
+
+    # Colluding pairs: both directions of an existing mutual pair get the maximum grade
+    pair_keys = np.unique(pack_keys(keys[peer, 0], keys[peer, 1], keys[peer, 2]))
+    problema, avaliado, avaliador = pair_keys >> 42, (pair_keys >> 21) & _ID_MASK, pair_keys & _ID_MASK
+    forward = np.flatnonzero(avaliador < avaliado)
+    forward = forward[np.isin(pack_keys(avaliador[forward], avaliado[forward], problema[forward]), pair_keys)]
+    chosen = rng.choice(forward, size=min(colluding_pairs, len(forward)), replace=False)
+    both = np.concatenate([pair_keys[chosen], pack_keys(avaliador[chosen], avaliado[chosen], problema[chosen])])
+    rows = np.flatnonzero(peer & np.isin(pack_keys(keys[:, 0], keys[:, 1], keys[:, 2]), both))
+    dataset.notas[rows] = np.where(np.isnan(dataset.notas[rows]), np.nan, maximum)
+    return lenient, np.stack([problema[chosen], avaliador[chosen], avaliado[chosen]], axis=1)
+
+
+def _precision_recall(found, expected):
+    hits = len(np.intersect1d(found, expected))
+    return hits / max(len(found), 1), hits / max(len(expected), 1)
+
+
+def run_benchmark(args):
+    """Time the analysis on a generated dataset with injected lenient evaluators and colluding pairs."""
+    import generate_all_notas
+
+    per_turma = args.alunos_por_turma
+    turmas = max(1, args.alunos // per_turma)
+    with tempfile.TemporaryDirectory() as tmp:
+        gen_args = generate_all_notas.parse_args([
+            "--seed", str(args.seed),
+            "--turmas", str(turmas),
+            "--alunos-por-turma", str(per_turma),
+            "--tamanho-grupo", str(args.tamanho_grupo),
+            "--problemas-por-turma", str(args.problemas_por_turma),
+            "--avaliacoes", "peer,self,professor",
+            "--formato", "npy",
+            "--output", f"{tmp}/dataset",
+        ])
+        rows, _, _ = generate_all_notas.generate(gen_args)
+        dataset = ColumnarNotas.load(f"{tmp}/dataset", mmap=False)
+    lenient, colluding = inject_bias(dataset, np.random.default_rng(args.seed), args.lenient_fraction,
+                                     args.shift, args.colluding_pairs)
+    print(f"Dataset: {turmas * per_turma} alunos, {turmas * args.problemas_por_turma} problemas, {rows} avaliacoes "
+          f"({len(lenient)} lenient evaluators and {len(colluding)} colluding pairs injected)")
+
+    started = time.perf_counter()
+    tables = analyze(dataset)
+    elapsed = time.perf_counter() - started
+    print(f"Analysis: {elapsed:.2f}s ({rows / elapsed:,.0f} avaliacoes/s)")
+
+    evaluators = tables["evaluators"]
+    flagged = evaluators["flagged"] & (evaluators["offset_z"] > 0)
+    found = evaluators["id_problema"][flagged] << 21 | evaluators["id_aluno_avaliador"][flagged]
+    precision, recall = _precision_recall(found, lenient)
+    print(f"Lenient evaluators: precision {precision:.1%}, recall {recall:.1%}")
+
+    reciprocal = tables["reciprocal"]
+    flagged = reciprocal["flagged"]
+    found = pack_keys(reciprocal["aluno_a"][flagged], reciprocal["aluno_b"][flagged], reciprocal["id_problema"][flagged])
+    precision, recall = _precision_recall(found, pack_keys(colluding[:, 1], colluding[:, 2], colluding[:, 0]))
+    print(f"Colluding pairs:    precision {precision:.1%}, recall {recall:.1%}")
+
+
+def _add_source_arguments(parser):
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="CSV export of avaliacoes")
+    source.add_argument("--columnar", help="Columnar directory written by notas_columnar.py")
+    source.add_argument("--db", help="Local SQLite database (local_db.py)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluator bias, agreement and outlier analytics for peer grades.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    report = subparsers.add_parser("analyze", help="Analyze the peer grades and write CSV reports")
+    _add_source_arguments(report)
+    report.add_argument("--output", default="peer_analytics", help="Output directory (default: peer_analytics)")
+    report.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS,
+                        help=f"Maximum model iterations (default: {DEFAULT_ITERATIONS})")
+    report.add_argument("--leniency-threshold", type=float, default=DEFAULT_LENIENCY_THRESHOLD,
+                        help=f"Flag evaluators whose |offset| is above this, in z units "
+                             f"(default: {DEFAULT_LENIENCY_THRESHOLD})")
+    report.add_argument("--outlier-threshold", type=float, default=DEFAULT_OUTLIER_THRESHOLD,
+                        help=f"Flag evaluations scoring above this (default: {DEFAULT_OUTLIER_THRESHOLD})")
+    report.add_argument("--reciprocal-threshold", type=float, default=DEFAULT_RECIPROCAL_THRESHOLD,
+                        help=f"Flag mutual pairs scoring above this, in z units "
+                             f"(default: {DEFAULT_RECIPROCAL_THRESHOLD})")
+
+    benchmark = subparsers.add_parser("benchmark", help="Benchmark and check detection on a generated dataset")
+    benchmark.add_argument("--alunos", type=int, default=10_000)
+    benchmark.add_argument("--alunos-por-turma", type=int, default=40)
+    benchmark.add_argument("--tamanho-grupo", type=int, default=8)
+    benchmark.add_argument("--problemas-por-turma", type=int, default=10)
+    benchmark.add_argument("--lenient-fraction", type=float, default=0.02,
+                           help="Share of evaluators made lenient (default: 0.02)")
+    benchmark.add_argument("--shift", type=float, default=0.15,
+                           help="Lenient grade increase, as a fraction of the maximum grade (default: 0.15)")
+    benchmark.add_argument("--colluding-pairs", type=int, default=200)
+    benchmark.add_argument("--seed", type=int, default=42)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "benchmark":
+        run_benchmark(args)
+        return 0
+
+    started = time.perf_counter()
+    dataset = load_source(args)
+    tables = analyze(dataset, args.iterations, args.leniency_threshold, args.outlier_threshold,
+                     args.reciprocal_threshold)
+    written = write_report(tables, args.output)
+    elapsed = time.perf_counter() - started
+    print_summary(tables)
+    for name, count in written.items():
+        print(f"  {name}: {count} rows")
+    print(f"Done! {len(dataset)} avaliacoes analyzed into {args.output} in {elapsed:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
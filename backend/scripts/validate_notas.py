@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Avaliacoes CSV Validator / Normalizer
+Checks evaluation exports against the problems' criterios and writes a clean copy.
+
+Every row is checked for:
+    parse        unreadable ids or notas JSON
+    required     missing id_problema, id_aluno_avaliado or notas
+    evaluator    not exactly one of id_aluno_avaliador / id_professor
+    self_pair    avaliador == avaliado (allowed with --allow-self)
+    problem      id_problema not in the problemas source
+    schema       tags/criterios different from the problem's criterios
+    range        a grade outside 0..nota_maxima_aluno (nota_maxima_professor for professors),
+                 or NaN/Infinity anywhere in notas or notas_por_arquivo
+    media        "media" different from the mean of the criterios grades
+    ids          an id at or above 2^21, too large for the duplicate check
+    duplicate    (avaliado, avaliador, problema) already seen earlier in the file
+
+Valid rows are written in standard CSV quoting with compact JSON; rejected
+rows go to a reject file with their line number, error code and original
+text. Chunks of lines are parsed and checked in a process pool while the
+main process streams results in order, so memory stays bounded for
+multi-GB exports. Duplicates are tracked in an open-addressing int64 hash
+table (16 bytes per key) instead of a Python set.
+
+Records must fit on one line, which is true for every export in this repo.
+Existing output or reject files are only overwritten with --force.
+
+Examples:
+    python validate_notas.py notas_sample.csv --problemas notas.csv.problemas.json
+    python validate_notas.py big.csv --db local.sqlite3 --output big_clean.csv --rejects big_rejects.csv --fix-media
+    python validate_notas.py notas_sample.csv --problemas notas.csv.problemas.json --force
+"""
+
+import argparse
+import csv
+import io
+import math
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import local_db
+from notas_columnar import (CSV_COLUMNS, ID_LIMIT, MEDIA_KEY, PROFESSOR_CSV_COLUMNS, detect_dialect, dumps_notas,
+                            load_problemas, pack_keys, parse_csv_lines, parse_record)
+
+REJECT_COLUMNS = ["line", "error", "message", "original"]
+MEDIA_TOLERANCE = 1e-6
+
+# Worker state, set once per process by _init_worker
+_worker = {}
+
+
+class PackedKeySet:
+    """Open-addressing hash set of non-zero int64 keys, with vectorized batch inserts."""
+
+    _MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+    def __init__(self, capacity=1 << 16):
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self.table = np.zeros(size, dtype=np.int64)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _slots(self, keys):
+        shift = np.uint64(64 - (len(self.table).bit_length() - 1))
+        hashed = (keys.astype(np.uint64) * self._MULTIPLIER) >> shift
+        return hashed.astype(np.int64)
+
+    def add_many(self, keys):
+        """Insert keys in order; returns a mask of the ones not seen before (first occurrence wins)."""
+        keys = np.asarray(keys, dtype=np.int64)
+        is_new = np.zeros(len(keys), dtype=bool)
+        if not len(keys):
+            return is_new
+        unique, first = np.unique(keys, return_index=True)
+        while (self.count + len(unique)) * 2 > len(self.table):
+            self._grow()
+        inserted = self._insert_unique(unique)
+        is_new[first[inserted]] = True
+        return is_new
+
+    def _insert_unique(self, keys):
+        mask = len(self.table) - 1
+        position = self._slots(keys)
+        inserted = np.zeros(len(keys), dtype=bool)
+        pending = np.arange(len(keys))
+        while len(pending):
+            slots = self.table[position[pending]]
+            found = slots == keys[pending]
+            empty = slots == 0
+            # Several keys may race for the same empty slot: the first one takes it
+            candidates = pending[empty]
+            _, winners = np.unique(position[candidates], return_index=True)
+            winners = candidates[winners]
+            self.table[position[winners]] = keys[winners]
+            inserted[winners] = True
+            self.count += len(winners)
+            done = found.copy()
+            done[np.isin(pending, winners)] = True
+            pending = pending[~done]
+            # Keys that collided (or lost a race) probe the next slot
+            collided = self.table[position[pending]] != keys[pending]
+            position[pending[collided]] = (position[pending[collided]] + 1) & mask
+        return inserted
+
+    def _grow(self):
+        old = self.table[self.table != 0]
+        self.table = np.zeros(len(self.table) * 2, dtype=np.int64)
+        self.count = 0
+        self._insert_unique(old)
+
+
+def build_rules(problemas):
+    """Per-problem expected criterios and maxima, keyed by id_problema."""
+    rules = {}
+    for problema in problemas:
+        expected = {}
+        for tag, criterios in (problema.get("criterios") or {}).items():
+            expected[tag] = {
+                c["nome_criterio"].lower(): (c.get("nota_maxima_aluno"), c.get("nota_maxima_professor"))
+                for c in criterios
+            }
+        rules[int(problema["id_problema"])] = expected
+    return rules
+
+
+def _init_worker(header, dialect, rules, options):
+    _worker.update(header=header, dialect=dialect, rules=rules, options=options)
+
+
+def _has_non_finite(value):
+    """True if a parsed JSON value holds NaN or +-Infinity (json.loads accepts them, JSON and jsonb do not)."""
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, dict):
+        return any(_has_non_finite(v) for v in value.values())
+    if isinstance(value, list):
+        return any(_has_non_finite(v) for v in value)
+    return False
+
+
+def check_row(row, rules, options):
+    """Return (error code, message) for the first failed check, or None."""
+    if not row["id_problema"] or not row["id_aluno_avaliado"] or not row["notas"]:
+        return "required", "id_problema, id_aluno_avaliado and notas are required"
+    if bool(row["id_aluno_avaliador"]) == bool(row["id_professor"]):
+        return "evaluator", "exactly one of id_aluno_avaliador or id_professor is required"
+    if row["id_aluno_avaliador"] == row["id_aluno_avaliado"] and not options["allow_self"]:
+        return "self_pair", "avaliador and avaliado are the same aluno"
+
+    if _has_non_finite(row["notas"]) or _has_non_finite(row["notas_por_arquivo"]):
+        # NaN passes every comparison below, so it has to be caught here
+        return "range", "NaN or Infinity grade"
+
+    notas = row["notas"]
+    values = []
+    for tag, criterios in notas.items():
+        if tag == MEDIA_KEY:
+            continue
+        if not isinstance(criterios, dict):
+            return "schema", f"tag {tag!r} is not an object"
+        for criterio, value in criterios.items():
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                return "schema", f"{tag}/{criterio} is not a number"
+            values.append(value)
+
+    if rules is not None:
+        expected = rules.get(row["id_problema"])
+        if expected is None:
+            return "problem", f"problema {row['id_problema']} not found"
+        given = {tag: set(c) for tag, c in notas.items() if tag != MEDIA_KEY}
+        wanted = {tag: set(c) for tag, c in expected.items()}
+        if given != wanted:
+            return "schema", "criterios differ from the problem definition"
+        use_professor = bool(row["id_professor"])
+        for tag, criterios in notas.items():
+            if tag == MEDIA_KEY:
+                continue
+            for criterio, value in criterios.items():
+                maximum = expected[tag][criterio][1 if use_professor else 0]
+                if value < 0 or (maximum is not None and value > maximum):
+                    return "range", f"{tag}/{criterio} = {value} outside 0..{maximum}"
+
+    if values and not options["fix_media"]:
+        media = notas.get(MEDIA_KEY)
+        expected_media = sum(values) / len(values)
+        if not isinstance(media, (int, float)) or abs(media - expected_media) > MEDIA_TOLERANCE:
+            return "media", f"media {media} differs from the criterios mean {expected_media:.10g}"
+    return None
+
+
+def validate_chunk(first_line, lines):
+    """Worker: validate and normalize a chunk of lines.
+
+    Returns (clean lines, their original lines, their packed keys, their line numbers, rejects).
+    """
+    header, dialect = _worker["header"], _worker["dialect"]
+    rules, options = _worker["rules"], _worker["options"]
+    output_columns = options["output_columns"]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    clean, originals, keys, line_numbers, rejects = [], [], [], [], []
+
+    records = parse_csv_lines(lines, header, dialect)
+    for offset, line in enumerate(lines):
+        number = first_line + offset
+        try:
+            record = next(records)
+        except (ValueError, csv.Error) as e:
+            rejects.append((number, "parse", str(e), line.rstrip("\r\n")))
+            records = parse_csv_lines(lines[offset + 1:], header, dialect)
+            continue
+        if record is None:
+            continue
+        try:
+            row = parse_record(record)
+            if (record.get("notas") or "").strip() not in ("", "{}") and not row["notas"]:
+                raise ValueError("notas is not a JSON object")
+        except (ValueError, OverflowError) as e:
+            # OverflowError: ids such as "inf" or "1e400"
+            rejects.append((number, "parse", str(e), line.rstrip("\r\n")))
+            continue
+
+        error = check_row(row, rules, options)
+        if error:
+            rejects.append((number, *error, line.rstrip("\r\n")))
+            continue
+        key = (row["id_aluno_avaliado"], row["id_aluno_avaliador"], row["id_problema"])
+        if min(key) < 0 or max(key) >= ID_LIMIT:
+            rejects.append((number, "ids", f"ids must be between 0 and {ID_LIMIT - 1}", line.rstrip("\r\n")))
+            continue
+
+        notas = row["notas"]
+        if options["fix_media"]:
+            values = [v for tag, c in notas.items() if tag != MEDIA_KEY for v in c.values()]
+            notas = {tag: c for tag, c in notas.items() if tag != MEDIA_KEY}
+            if values:
+                notas[MEDIA_KEY] = round(sum(values) / len(values), 10)
+        normalized = {
+            "id_aluno_avaliado": row["id_aluno_avaliado"],
+            "id_aluno_avaliador": row["id_aluno_avaliador"] or "",
+            "id_problema": row["id_problema"],
+            "notas": dumps_notas(notas),
+            "id_professor": row["id_professor"] or "",
+            "notas_por_arquivo": dumps_notas(row["notas_por_arquivo"]) if row["id_professor"] else "",
+        }
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([normalized[c] for c in output_columns])
+        clean.append(buffer.getvalue())
+        originals.append(line.rstrip("\r\n"))
+        keys.append(key)
+        line_numbers.append(number)
+
+    keys = np.array(keys, dtype=np.int64).reshape(-1, 3)
+    packed = pack_keys(keys[:, 0], keys[:, 1], keys[:, 2])
+    return clean, originals, packed, line_numbers, rejects
+
+
+def iter_line_chunks(f, chunk_lines, first_line):
+    chunk = []
+    start = first_line
+    for line in f:
+        chunk.append(line)
+        if len(chunk) >= chunk_lines:
+            yield start, chunk
+            start += len(chunk)
+            chunk = []
+    if chunk:
+        yield start, chunk
+
+
+def load_rules(args):
+    if args.problemas:
+        return build_rules(load_problemas(args.problemas))
+    if args.db:
+        conn = local_db.connect(args.db)
+        try:
+            return build_rules(local_db.fetch_problemas(conn))
+        finally:
+            conn.close()
+    return None
+
+
+def run(args):
+    rules = load_rules(args)
+    stats = {"rows": 0, "clean": 0}
+    errors = {}
+    started = time.perf_counter()
+
+    with open(args.csv_path, newline="", encoding="utf-8") as source, \
+            open(args.output, "w", newline="", encoding="utf-8") as clean_file, \
+            open(args.rejects, "w", newline="", encoding="utf-8") as rejects_file:
+        header = next(csv.reader([source.readline()]))
+        position = source.tell()
+        first = source.readline()
+        source.seek(position)
+        dialect = detect_dialect(first)
+
+        with_professor = "id_professor" in header
+        output_columns = CSV_COLUMNS + (PROFESSOR_CSV_COLUMNS if with_professor else [])
+        csv.writer(clean_file).writerow(output_columns)
+        rejects_writer = csv.writer(rejects_file)
+        rejects_writer.writerow(REJECT_COLUMNS)
+
+        options = {"allow_self": args.allow_self, "fix_media": args.fix_media, "output_columns": output_columns}
+        seen = PackedKeySet()
+        in_flight = deque()
+
+        def drain_one():
+            clean, originals, packed, line_numbers, rejects = in_flight.popleft().result()
+            is_new = seen.add_many(packed)
+            clean_file.write("".join(line for line, new in zip(clean, is_new) if new))
+            for number, original, new in zip(line_numbers, originals, is_new):
+                if not new:
+                    rejects.append((number, "duplicate", "(avaliado, avaliador, problema) already seen", original))
+            rejects.sort()
+            rejects_writer.writerows(rejects)
+            stats["clean"] += int(is_new.sum())
+            stats["rows"] += len(clean) + sum(1 for r in rejects if r[1] != "duplicate")
+            for reject in rejects:
+                errors[reject[1]] = errors.get(reject[1], 0) + 1
+
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                 initargs=(header, dialect, rules, options)) as pool:
+            for first_line, chunk in iter_line_chunks(source, args.chunk_lines, 2):
+                in_flight.append(pool.submit(validate_chunk, first_line, chunk))
+                # Bound memory: never hold more than two chunks per worker
+                if len(in_flight) >= 2 * args.workers:
+                    drain_one()
+            while in_flight:
+                drain_one()
+
+    elapsed = time.perf_counter() - started
+    rejected = sum(errors.values())
+    rate = stats["rows"] / elapsed if elapsed > 0 else float("inf")
+    print(f"Done! {stats['rows']} rows checked in {elapsed:.2f}s ({rate:,.0f} rows/s): "
+          f"{stats['clean']} clean, {rejected} rejected")
+    for code, count in sorted(errors.items()):
+        print(f"  {code}: {count}")
+    if rules is None:
+        print("  (no problemas source given: schema and range checks were skipped)")
+    return stats, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate and normalize an avaliacoes CSV export.")
+    parser.add_argument("csv_path")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--problemas", help="Problemas JSON with criterios (generate_all_notas.py sidecar)")
+    source.add_argument("--db", help="Local SQLite database (local_db.py) to read problemas from")
+    parser.add_argument("--output", help="Clean CSV (default: <input>_clean.csv)")
+    parser.add_argument("--rejects", help="Reject file (default: <input>_rejects.csv)")
+    parser.add_argument("--allow-self", action="store_true", help="Accept self evaluations (avaliador == avaliado)")
+    parser.add_argument("--fix-media", action="store_true", help="Recompute media instead of rejecting mismatches")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPUs)")
+    parser.add_argument("--chunk-lines", type=int, default=20_000, help="Lines per chunk (default: 20000)")
+    parser.add_argument("--force", action="store_true", help="Overwrite existing output and reject files")
+    args = parser.parse_args(argv)
+
+    stem = args.csv_path[:-4] if args.csv_path.endswith(".csv") else args.csv_path
+    args.output = args.output or f"{stem}_clean.csv"
+    args.rejects = args.rejects or f"{stem}_rejects.csv"
+    for path in (args.output, args.rejects):
+        if not os.path.exists(path):
+            continue
+        if os.path.samefile(path, args.csv_path):
+            parser.error(f"{path} is the input file")
+        if not args.force:
+            parser.error(f"{path} already exists (use --force to overwrite)")
+    _, errors = run(args)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,7 +3,6 @@ import { Request, Response } from 'express';
 import { Pair } from '../config/utils';
 import { supabase } from '../config/supabase_wrapper';
 import { createControllerLogger } from '../utils/controller_logger';
-import { MediaCalculator } from '../utils/media_utils';
 import { Utils } from '../config/utils';
 
 const logger = createControllerLogger('Avaliacao', 'Controller');
@@ -138,22 +137,7 @@ export const AvaliacaoController: EndpointController = {
                 return res.status(500).json({ error: error.message });
             }
 
-            // Update problema media_geral
-            const { data: avaliacoes, error: avaliacoesError } = await supabase
-                .from('avaliacoes')
-                .select('notas')
-                .eq('id_problema', id_problema);
-
-            if (!avaliacoesError && avaliacoes) {
-                const notas = avaliacoes.map(a => MediaCalculator.calculateRawSum(a.notas));
-                const media = notas.length > 0 ? notas.reduce((a, b) => a + b, 0) / notas.length : 0;
-
-                await supabase
-                    .from('problemas')
-                    .update({ media_geral: media })
-                    .eq('id_problema', id_problema);
-            }
-
+            // problema.media_geral is updated by the avaliacoes trigger (migrations/001_grade_aggregates.sql)
             return res.status(201).json(data);
         }),
 
@@ -203,22 +187,7 @@ export const AvaliacaoController: EndpointController = {
                 return res.status(404).json({ error: 'Avaliacao not found' });
             }
 
-            // Update problema media_geral
-            const { data: avaliacoes, error: avaliacoesError } = await supabase
-                .from('avaliacoes')
-                .select('notas')
-                .eq('id_problema', data.id_problema);
-
-            if (!avaliacoesError && avaliacoes) {
-                const notas = avaliacoes.map(a => MediaCalculator.calculateRawSum(a.notas));
-                const media = notas.length > 0 ? notas.reduce((a, b) => a + b, 0) / notas.length : 0;
-
-                await supabase
-                    .from('problemas')
-                    .update({ media_geral: media })
-                    .eq('id_problema', data.id_problema);
-            }
-
+            // problema.media_geral is updated by the avaliacoes trigger (migrations/001_grade_aggregates.sql)
             return res.json(data);
         }),
 
@@ -236,13 +205,6 @@ export const AvaliacaoController: EndpointController = {
                 return res.status(400).json({ error: 'id_avaliacao is required' });
             }
 
-            // Get the problema_id before deleting
-            const { data: avaliacao } = await supabase
-                .from('avaliacoes')
-                .select('id_problema')
-                .eq('id_avaliacao', id_avaliacao)
-                .single();
-
             const { error } = await supabase
                 .from('avaliacoes')
                 .delete()
@@ -253,30 +215,7 @@ export const AvaliacaoController: EndpointController = {
                 return res.status(500).json({ error: error.message });
             }
 
-            // Update problema media_geral if we found the avaliacao
-            if (avaliacao) {
-                const { data: avaliacoes, error: avaliacoesError } = await supabase
-                    .from('avaliacoes')
-                    .select('notas')
-                    .eq('id_problema', avaliacao.id_problema);
-
-                if (!avaliacoesError && avaliacoes && avaliacoes.length > 0) {
-                    const notas = avaliacoes.map(a => MediaCalculator.calculateRawSum(a.notas));
-                    const media = notas.length > 0 ? notas.reduce((a, b) => a + b, 0) / notas.length : 0;
-
-                    await supabase
-                        .from('problemas')
-                        .update({ media_geral: media })
-                        .eq('id_problema', avaliacao.id_problema);
-                } else if (!avaliacoesError) {
-                    // If no avaliacoes left, set media_geral to 0
-                    await supabase
-                        .from('problemas')
-                        .update({ media_geral: 0 })
-                        .eq('id_problema', avaliacao.id_problema);
-                }
-            }
-
+            // problema.media_geral is updated by the avaliacoes trigger (0 once no avaliacoes are left)
             return res.status(204).send();
         })
     }
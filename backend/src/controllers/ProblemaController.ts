@@ -4,6 +4,7 @@ import { Pair } from '../config/utils';
 import { supabase } from '../config/supabase_wrapper';
 import { createControllerLogger } from '../utils/controller_logger';
 import { MediaCalculator } from '../utils/media_utils';
+import { GradeAggregates } from '../utils/grade_aggregates';
 import { Utils } from '../config/utils';
 
 const logger = createControllerLogger('Problema', 'Controller');
@@ -67,7 +68,19 @@ export const ProblemaController: EndpointController = {
             if (id_aluno && data) {
                 logger.info(`Calculating student-specific averages for aluno ${id_aluno}`);
 
+                // Final medias kept up to date by the avaliacoes trigger; missing problems are computed below
+                const aggregated = await GradeAggregates.getFinalMedias(
+                    data.map((problema) => problema.id_problema),
+                    Number(id_aluno)
+                );
+
                 for (const problema of data) {
+                    if (aggregated?.has(problema.id_problema)) {
+                        const result = aggregated.get(problema.id_problema);
+                        problema.media_geral = result ? result.total : null;
+                        continue;
+                    }
+
                     // Get all evaluations for this problem (including professor evaluations)
                     const { data: avaliacoes, error: avaliacoesError } = await supabase
                         .from('avaliacoes')
@@ -85,7 +98,8 @@ export const ProblemaController: EndpointController = {
                             fileDefs = JSON.parse(problema.definicao_arquivos_de_avaliacao);
                         } catch { }
 
-                        // Parse avaliacoes to get proper structure
+                        // Parse avaliacoes to get proper structure; calculateFinalMedia matches students on
+                        // aluno_avaliado.id / aluno_avaliador.id, like the AvaliacaoModel the frontend builds
                         const parsedAvaliacoes = avaliacoes.map((av) => {
                             let notas = av.notas;
                             let notas_por_arquivo = av.notas_por_arquivo;
@@ -95,7 +109,13 @@ export const ProblemaController: EndpointController = {
                             try {
                                 notas_por_arquivo = typeof notas_por_arquivo === 'string' ? JSON.parse(notas_por_arquivo) : notas_por_arquivo;
                             } catch { }
-                            return { ...av, notas, notas_por_arquivo };
+                            return {
+                                ...av,
+                                notas,
+                                notas_por_arquivo,
+                                aluno_avaliado: av.id_aluno_avaliado ? { id: av.id_aluno_avaliado } : null,
+                                aluno_avaliador: av.id_aluno_avaliador ? { id: av.id_aluno_avaliador } : null,
+                            };
                         });
 
                         // Use the MediaCalculator to get the final media for this specific student
@@ -317,68 +337,9 @@ export const ProblemaController: EndpointController = {
                 return res.status(500).json({ error: error.message });
             }
 
-            logger.info(`Successfully added avaliacao for problema ${id_problema}. Updating media_geral...`);
-
-            // Update media_geral
-            // 1. Fetch the full problem to get criterios and file definitions
-            const { data: problema, error: problemaError } = await supabase
-                .from('problemas')
-                .select('*')
-                .eq('id_problema', id_problema)
-                .single();
-            if (problemaError || !problema) {
-                logger.error(`Error fetching full problema for media calculation: ${problemaError?.message}`);
-            } else {
-                // 2. Fetch all avaliacoes for the problem (with all relevant fields)
-                const { data: avaliacoesFull, error: avaliacoesFullError } = await supabase
-                    .from('avaliacoes')
-                    .select('*')
-                    .eq('id_problema', id_problema);
-                if (avaliacoesFullError || !avaliacoesFull) {
-                    logger.error(`Error fetching full avaliacoes for media calculation: ${avaliacoesFullError?.message}`);
-                } else {
-                    // 3. Parse criterios and file definitions
-                    let criteriosGroup = {};
-                    let fileDefs = [];
-                    try {
-                        criteriosGroup = JSON.parse(problema.criterios);
-                    } catch { }
-                    try {
-                        fileDefs = JSON.parse(problema.definicao_arquivos_de_avaliacao);
-                    } catch { }
-                    // 4. Group avaliacoes by id_aluno_avaliado
-                    const byAluno: Record<string, any[]> = {};
-                    for (const av of avaliacoesFull) {
-                        const alunoId = av.id_aluno_avaliado;
-                        if (!byAluno[String(alunoId)]) byAluno[String(alunoId)] = [];
-                        // Parse notas and notas_por_arquivo for calculation
-                        let notas = av.notas;
-                        let notas_por_arquivo = av.notas_por_arquivo;
-                        try { notas = typeof notas === 'string' ? JSON.parse(notas) : notas; } catch { }
-                        try { notas_por_arquivo = typeof notas_por_arquivo === 'string' ? JSON.parse(notas_por_arquivo) : notas_por_arquivo; } catch { }
-                        byAluno[String(alunoId)].push({ ...av, notas, notas_por_arquivo });
-                    }
-                    // 5. For each student, calculate their final media
-                    const allMedias = Object.entries(byAluno).map(([alunoId, avaliacoes]) => {
-                        const avs = avaliacoes as any[];
-                        const result = MediaCalculator.calculateFinalMedia(avs, Number(alunoId), criteriosGroup, fileDefs);
-                        return result.total;
-                    });
-                    // 6. Set media_geral as the average of all students' final medias
-                    const media = allMedias.length > 0 ? allMedias.reduce((a, b) => a + b, 0) / allMedias.length : 0;
-                    logger.info(`Calculated new media_geral for problema ${id_problema} (NEW LOGIC): ${media}`);
-                    const { error: updateError } = await supabase
-                        .from('problemas')
-                        .update({ media_geral: media })
-                        .eq('id_problema', id_problema);
-                    if (updateError) {
-                        logger.error(`Error updating media_geral: ${updateError.message}`);
-                    } else {
-                        logger.info(`Successfully updated media_geral for problema ${id_problema}`);
-                    }
-                }
-            }
+            logger.info(`Successfully added avaliacao for problema ${id_problema}`);
 
+            // problema.media_geral is updated by the avaliacoes trigger (migrations/001_grade_aggregates.sql)
             return res.status(201).json(data);
         }),
 
@@ -9,6 +9,7 @@ import bodyParser from 'body-parser';
 import cors from "cors";
 import logger from './utils/logger';
 import path from 'path';
+import { Server } from 'http';
 
 // Import controllers
 import { AlunoController } from './controllers/AlunoController';
@@ -58,20 +59,45 @@ process.on('exit', (code) => {
     cleanup();
 });
 
-// Handle CTRL+C
-process.on('SIGINT', () => {
-    console.log('🛑 Received SIGINT signal');
-    logger.info('Received SIGINT signal');
+// Graceful shutdown: stop accepting connections, let in-flight requests finish, then exit.
+// start_and_monitor.py forwards SIGTERM/SIGINT/SIGHUP here and sets SHUTDOWN_TIMEOUT_MS to
+// fit inside its own drain window, after which it kills the process group.
+const SHUTDOWN_TIMEOUT_MS = Number(process.env.SHUTDOWN_TIMEOUT_MS) || 8000;
+let server: Server | undefined;
+let inFlightRequests = 0;
+let shuttingDown = false;
+
+const gracefulShutdown = (signal: NodeJS.Signals) => {
+    if (shuttingDown) {
+        console.log(`🛑 Received ${signal} again, exiting now`);
+        logger.warn(`Received ${signal} during shutdown, exiting with ${inFlightRequests} requests in flight`);
+        process.exit(1);
+    }
+    shuttingDown = true;
+    console.log(`🛑 Received ${signal} signal, draining ${inFlightRequests} in-flight requests`);
+    logger.info(`Received ${signal} signal, draining ${inFlightRequests} in-flight requests`);
     cleanup();
-    process.exit(0);
-});
 
-process.on('SIGTERM', () => {
-    console.log('🛑 Received SIGTERM signal');
-    logger.info('Received SIGTERM signal');
-    cleanup();
-    process.exit(0);
-});
+    if (!server) {
+        process.exit(0);
+    }
+    const startedAt = Date.now();
+    server.close(() => {
+        logger.info(`Server drained in ${Date.now() - startedAt} ms`);
+        process.exit(0);
+    });
+    // Keep-alive connections with no request in flight would hold server.close() open
+    server.closeIdleConnections();
+    setTimeout(() => {
+        console.log(`⏱️ Drain timeout, exiting with ${inFlightRequests} requests in flight`);
+        logger.warn(`Drain timeout after ${SHUTDOWN_TIMEOUT_MS} ms, exiting with ${inFlightRequests} requests in flight`);
+        process.exit(1);
+    }, SHUTDOWN_TIMEOUT_MS).unref();
+};
+
+process.on('SIGINT', gracefulShutdown);
+process.on('SIGTERM', gracefulShutdown);
+process.on('SIGHUP', gracefulShutdown);
 
 // Handle uncaught exceptions
 process.on('uncaughtException', (err) => {
@@ -274,6 +300,19 @@ const app: Express = express();
 
 //expressws(app);
 
+// Track in-flight requests for the shutdown drain; once shutting down, ask clients to close
+// their keep-alive connections so server.close() can finish as soon as the last response is sent
+app.use((req: Request, res: Response, next: NextFunction) => {
+    inFlightRequests++;
+    res.once('close', () => {
+        inFlightRequests--;
+    });
+    if (shuttingDown) {
+        res.set('Connection', 'close');
+    }
+    next();
+});
+
 console.log('🔧 Configuring CORS...');
 
 // Configure CORS properly
@@ -316,7 +355,7 @@ const port = 5919;
 console.log(`🎯 Server will listen on port: ${port}`);
 
 console.log('🚀 Starting server...');
-app.listen(port, () => {
+server = app.listen(port, () => {
     console.log(`✅ Server running on port ${port}`);
     console.log(`🏥 Health check available at: http://localhost:${port}/health`);
     console.log(`📡 API available at: http://localhost:${port}/`);
@@ -0,0 +1,77 @@
+import { supabase } from '../config/supabase_wrapper';
+import { createControllerLogger } from './controller_logger';
+
+const logger = createControllerLogger('GradeAggregates', 'Utils');
+
+export interface FinalMedia {
+    professor: number;
+    auto: number;
+    peers: number;
+    total: number;
+}
+
+export class GradeAggregates {
+    /**
+     * Final medias of one student, read from the running sums the avaliacoes trigger keeps
+     * (migrations/001_grade_aggregates.sql) instead of recomputed from every avaliacao of each problem.
+     * Gives the same values as MediaCalculator.calculateFinalMedia.
+     * @param idProblemas The problems to look up
+     * @param alunoId The id of the student being evaluated
+     * @returns A map from id_problema to the student's FinalMedia, or to null when the problem has no
+     * avaliacoes. Problems left out of the map (more than one professor or self evaluation for the
+     * student, where calculateFinalMedia takes the first one) must be computed with calculateFinalMedia.
+     * Returns null if the aggregates cannot be read.
+     */
+    static async getFinalMedias(idProblemas: number[], alunoId: number): Promise<Map<number, FinalMedia | null> | null> {
+        const medias = new Map<number, FinalMedia | null>();
+        if (idProblemas.length === 0) return medias;
+
+        const [problemas, alunos] = await Promise.all([
+            supabase
+                .from('problema_aggregates')
+                .select('id_problema, avaliacoes_count')
+                .in('id_problema', idProblemas),
+            supabase
+                .from('aluno_problema_aggregates')
+                .select('*')
+                .in('id_problema', idProblemas)
+                .eq('id_aluno', alunoId),
+        ]);
+        if (problemas.error || alunos.error) {
+            logger.error(`Error fetching grade aggregates: ${(problemas.error || alunos.error)!.message}`);
+            return null;
+        }
+
+        const withAvaliacoes = new Set(
+            (problemas.data || []).filter((p: any) => p.avaliacoes_count > 0).map((p: any) => Number(p.id_problema))
+        );
+        const byProblema = new Map((alunos.data || []).map((a: any): [number, any] => [Number(a.id_problema), a]));
+
+        for (const idProblema of idProblemas) {
+            if (!withAvaliacoes.has(Number(idProblema))) {
+                medias.set(idProblema, null);
+                continue;
+            }
+            const aggregate = byProblema.get(Number(idProblema));
+            if (!aggregate) {
+                // The problem has avaliacoes, none of them for this student
+                medias.set(idProblema, { professor: 0, auto: 0, peers: 0, total: 0 });
+                continue;
+            }
+            if (aggregate.professor_count > 1 || aggregate.auto_count > 1) {
+                continue;
+            }
+            const professorScore = aggregate.professor_count === 1 ? Number(aggregate.professor_sum) : 0;
+            const autoScore = aggregate.auto_count === 1 ? Number(aggregate.auto_sum) : 0;
+            const peersScore = aggregate.peer_count > 0 ? Number(aggregate.peer_sum) / aggregate.peer_count : 0;
+            const total = professorScore + autoScore + peersScore;
+            medias.set(idProblema, {
+                professor: Number(professorScore.toFixed(2)),
+                auto: Number(autoScore.toFixed(2)),
+                peers: Number(peersScore.toFixed(2)),
+                total: Number(total.toFixed(2)),
+            });
+        }
+        return medias;
+    }
+}
@@ -11,12 +11,14 @@ import gc
 import psutil
 
 from logging.handlers import RotatingFileHandler
+from supervisor_metrics import MetricsStore, DEFAULT_BUDGET_MB
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Set up logging with rotation to prevent unbounded log file growth
-log_dir = Path(__file__).parent / "logs"
+# (SUPERVISOR_LOG_DIR moves the log file, e.g. for scripts/bench_supervisor.py)
+log_dir = Path(os.environ.get("SUPERVISOR_LOG_DIR") or Path(__file__).parent / "logs")
 log_dir.mkdir(exist_ok=True)  # Create logs directory if it doesn't exist
 log_file = log_dir / "process.log"
 
@@ -47,10 +49,57 @@ logging.basicConfig(
 active_threads = []
 shutdown_event = threading.Event()
 
+# Set by the SIGTERM/SIGINT/SIGHUP handlers; the main loop waits on it instead of sleeping
+stop_requested = threading.Event()
+stop_signal = None
+signalled_pid = None  # the process the handler forwarded the stop signal to
+
+# The supervised process, so the signal handlers can forward signals to its process group
+current_process = None
+
+# How long the backend gets to finish in-flight requests after a stop signal before its
+# process group is killed. Docker sends SIGKILL 10s after SIGTERM by default
+# (stop_grace_period), so the default leaves time to flush logs after the drain.
+DEFAULT_DRAIN_TIMEOUT = 8.0
+STOP_SIGNALS = (signal.SIGTERM, signal.SIGINT, signal.SIGHUP)
+
+# Metrics history (see supervisor_metrics.py), set up in main()
+metrics = None
+
 def log_message(message):
     print(message)
     logging.info(message)
 
+def record_event(kind, detail=""):
+    """Record a lifecycle event in the metrics store, if enabled."""
+    if metrics is None:
+        return
+    try:
+        metrics.event(kind, detail)
+    except Exception as e:
+        log_message(f"Python: Error recording event {kind}: {e}")
+
+def record_metrics(process):
+    """Sample memory usage of the supervisor and the backend process tree."""
+    if metrics is None:
+        return
+    try:
+        metrics.sample("supervisor_rss_mb", psutil.Process().memory_info().rss / 1024 / 1024)
+        metrics.sample("active_threads", len(active_threads))
+        if process and process.poll() is None:
+            parent = psutil.Process(process.pid)
+            tree = [parent] + parent.children(recursive=True)
+            rss = 0
+            for proc in tree:
+                try:
+                    rss += proc.memory_info().rss
+                except psutil.NoSuchProcess:
+                    pass
+            metrics.sample("backend_rss_mb", rss / 1024 / 1024)
+        metrics.flush()
+    except Exception as e:
+        log_message(f"Python: Error recording metrics: {e}")
+
 def cleanup_threads():
     """Clean up any active threads."""
     global active_threads
@@ -98,6 +147,13 @@ def run_git_command_safely(command, cwd=None, timeout=30):
         log_message(f"Python: Error running git command {' '.join(command)}: {e}")
         return None
 
+def get_current_commit(repo_dir):
+    """Return the checked out commit hash, or an empty string."""
+    result = run_git_command_safely(["git", "rev-parse", "HEAD"], cwd=repo_dir)
+    if result is None or result.returncode != 0:
+        return ""
+    return result.stdout.strip()
+
 
 
 
@@ -202,8 +258,9 @@ def pull_updates(repo_dir, branch):
 
 def start_process(command):
     """Start a subprocess with the given command and print logs in real time."""
+    global current_process
     log_message(f"Python: Starting subprocess with command: {command}")
-    process = subprocess.Popen(
+    process = current_process = subprocess.Popen(
         command,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
@@ -211,6 +268,7 @@ def start_process(command):
         text=True,                 # Decode bytes to string automatically
         preexec_fn=os.setsid
     )
+    record_event("process_start", command)
     # Print the logs in a separate thread or inline
     print_logs_in_real_time(process)
     return process
@@ -243,22 +301,69 @@ def print_logs_in_real_time(process):
     
     active_threads.extend([stdout_thread, stderr_thread])
 
-def stop_process(process):
-    """Stop the given subprocess with proper cleanup."""
+def process_group_alive(pgid):
+    """Return True while any process of the group is still running (zombies do not count)."""
     try:
-        if process and process.poll() is None:  # Check if process is running
-            # First, try graceful termination
-            os.killpg(os.getpgid(process.pid), signal.SIGTERM)
-            
-            # Wait for process to terminate gracefully
-            try:
-                process.wait(timeout=10)
-            except subprocess.TimeoutExpired:
+        os.killpg(pgid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    # killpg also succeeds for zombies, e.g. orphans reparented to us when running as PID 1
+    for proc in psutil.process_iter(["status"]):
+        try:
+            if proc.info["status"] != psutil.STATUS_ZOMBIE and os.getpgid(proc.pid) == pgid:
+                return True
+        except (ProcessLookupError, psutil.Error):
+            pass
+    return False
+
+def wait_for_process_group(process, pgid, timeout):
+    """Wait until the process and the rest of its group have exited. Returns False on timeout."""
+    deadline = time.monotonic() + timeout
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return False
+    while process_group_alive(pgid):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+def stop_process(process, timeout=10, sig=signal.SIGTERM, signal_sent=False):
+    """Stop the given subprocess with proper cleanup.
+
+    Sends sig to the process group (unless signal_sent, when it was already forwarded), waits up
+    to timeout seconds for the whole group to exit and kills it after that. Returns as soon as the
+    group is gone, after the log threads have forwarded the child's last output.
+    """
+    try:
+        if process and (process.poll() is None or process_group_alive(process.pid)):
+            pgid = process.pid  # start_process makes the child a process group leader
+            started = time.monotonic()
+            if not signal_sent:
+                try:
+                    os.killpg(pgid, sig)
+                except ProcessLookupError:
+                    pass
+
+            if not wait_for_process_group(process, pgid, timeout):
                 # Force kill if it doesn't terminate gracefully
                 log_message("Python: Process didn't terminate gracefully, force killing...")
-                os.killpg(os.getpgid(process.pid), signal.SIGKILL)
+                record_event("process_killed", f"still running {timeout:g}s after {signal.Signals(sig).name}")
+                try:
+                    os.killpg(pgid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
                 process.wait()
-            
+            else:
+                log_message(f"Python: Process exited {time.monotonic() - started:.2f}s after {signal.Signals(sig).name}")
+
+            # The pipes reach EOF once the group is gone; let the log threads forward what is left
+            for thread in active_threads:
+                thread.join(timeout=2.0)
+
             # Clean up process resources
             if process.stdout and not process.stdout.closed:
                 process.stdout.close()
@@ -273,11 +378,48 @@ def stop_process(process):
     except Exception as e:
         log_message(f"Python: Error stopping process: {e}")
 
+def handle_stop_signal(signum, frame):
+    """Forward a stop signal to the backend right away and wake the main loop.
+
+    A second signal while the backend is still draining kills its process group.
+    """
+    global stop_signal, signalled_pid
+    process = current_process
+    if stop_requested.is_set():
+        if process is not None:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        return
+    stop_signal = signum
+    if process is not None and process.poll() is None:
+        try:
+            os.killpg(process.pid, signum)
+            signalled_pid = process.pid
+        except ProcessLookupError:
+            pass
+    stop_requested.set()
+
+def install_signal_handlers():
+    for sig in STOP_SIGNALS:
+        signal.signal(sig, handle_stop_signal)
+
+def flush_logs():
+    for handler in logging.getLogger().handlers:
+        try:
+            handler.flush()
+        except Exception:
+            pass
+
 def restart_process_if_crashed(process, command):
     """Check if the process has crashed and restart it."""
     try:
-        if process.poll() is not None:  # If process is not running
+        # Checked after poll(): a backend that exits because the stop signal was forwarded to it
+        # only does so once the handler has set stop_requested, so that is a shutdown, not a crash
+        if process.poll() is not None and not stop_requested.is_set():  # If process is not running
             log_message("Python: Process crashed. Restarting...")
+            record_event("crash", f"exit code {process.returncode}")
             return start_process(command)
     except Exception as e:
         log_message(f"Python: Error occurred: {e}")
@@ -291,12 +433,21 @@ def restart_process_if_crashed(process, command):
 def main():
     parser = argparse.ArgumentParser(description='Monitor and auto-update a git repository.')
     parser.add_argument('--branch', default='main', help='Git branch to monitor (default: main)')
+    parser.add_argument('--metrics-db', default=str(log_dir / "metrics.sqlite3"),
+                        help='SQLite file for the metrics history (default: logs/metrics.sqlite3)')
+    parser.add_argument('--metrics-budget-mb', type=float, default=DEFAULT_BUDGET_MB,
+                        help=f'Disk budget for the metrics history (default: {DEFAULT_BUDGET_MB} MB)')
+    parser.add_argument('--no-metrics', action='store_true', help='Do not keep a metrics history')
+    parser.add_argument('--drain-timeout', type=float, default=DEFAULT_DRAIN_TIMEOUT,
+                        help='Seconds the backend gets to finish in-flight requests on shutdown before it is killed '
+                             f'(default: {DEFAULT_DRAIN_TIMEOUT:g}, keep below the container stop timeout)')
     args = parser.parse_args()
 
     # Determine repository directory - should be the mounted volume root  
     # Since we're running from /app/no_fluxo_backend but .git is at /app
     REPO_DIR = "/app" if os.path.exists('/app/.git') else "../"
-    START_COMMAND = "npm run start-prod"
+    # exec, so the shell is replaced and process.wait() tracks npm itself
+    START_COMMAND = "exec npm run start-prod"
     CHECK_INTERVAL = 10  # Interval in seconds to check for updates
     BRANCH = args.branch
     
@@ -340,6 +491,20 @@ def main():
     else:
         log_message("Python: Git repository not found - auto-updates disabled")
 
+    global metrics
+    if not args.no_metrics:
+        try:
+            metrics = MetricsStore(args.metrics_db, budget_mb=args.metrics_budget_mb)
+            metrics.set_commit(get_current_commit(REPO_DIR))
+            record_event("supervisor_start", f"branch {BRANCH}")
+        except Exception as e:
+            log_message(f"Python: Metrics history disabled: {e}")
+            metrics = None
+
+    # Let the backend stop draining a little before the supervisor gives up on it
+    os.environ.setdefault('SHUTDOWN_TIMEOUT_MS', str(int(max(args.drain_timeout - 1, 0.5) * 1000)))
+
+    install_signal_handlers()
     process = start_process(START_COMMAND)
     
     # Memory monitoring counter
@@ -350,8 +515,12 @@ def main():
     git_cleanup_counter = 0
     GIT_CLEANUP_INTERVAL = 360  # Clean up git stashes every 360 iterations (1 hour)
 
+    # Metrics maintenance counter
+    metrics_maintenance_counter = 0
+    METRICS_MAINTENANCE_INTERVAL = 360  # Downsample and enforce the disk budget every hour
+
     try:
-        while True:
+        while not stop_requested.is_set():
             # Log memory usage periodically
             memory_check_counter += 1
             if memory_check_counter >= MEMORY_CHECK_INTERVAL:
@@ -363,11 +532,28 @@ def main():
             if git_cleanup_counter >= GIT_CLEANUP_INTERVAL and os.path.exists('/.dockerenv'):
                 cleanup_git_stashes(REPO_DIR)
                 git_cleanup_counter = 0
+
+            metrics_maintenance_counter += 1
+            if metrics is not None and metrics_maintenance_counter >= METRICS_MAINTENANCE_INTERVAL:
+                try:
+                    metrics.maintain()
+                except Exception as e:
+                    log_message(f"Python: Error maintaining metrics history: {e}")
+                metrics_maintenance_counter = 0
             
-            if check_for_updates(REPO_DIR, BRANCH):
+            updates = check_for_updates(REPO_DIR, BRANCH)
+            # A stop signal may arrive during the git calls; the backend then exits on purpose
+            if stop_requested.is_set():
+                break
+            if updates:
                 log_message(f"Python: New changes detected in branch {BRANCH}. Updating...")
                 stop_process(process)
+                previous_commit = get_current_commit(REPO_DIR)
                 pull_updates(REPO_DIR, BRANCH)
+                current_commit = get_current_commit(REPO_DIR)
+                if metrics is not None:
+                    metrics.set_commit(current_commit)
+                record_event("deploy", f"{previous_commit[:12]} -> {current_commit[:12]}")
                 
                 log_message("Python: Starting the process...")
                 process = start_process(START_COMMAND)
@@ -380,18 +566,31 @@ def main():
                 if new_process is None:
                     log_message("Python: Process crashed and could not be restarted. trying again in 10 seconds...")
 
-                    while new_process is None:
-                        time.sleep(10)
+                    while new_process is None and not stop_requested.wait(10):
                         new_process = start_process(START_COMMAND)
+                    if new_process is not None:
+                        process = new_process
                 else:
                     process = new_process
 
-            time.sleep(CHECK_INTERVAL)
-    except KeyboardInterrupt:
-        log_message("Python: Exiting. Stopping subprocess...")
-        stop_process(process)
+            record_metrics(process)
+            stop_requested.wait(CHECK_INTERVAL)
     finally:
+        signal_name = signal.Signals(stop_signal).name if stop_signal else "exception"
+        log_message(f"Python: Received {signal_name}. Stopping subprocess...")
+        # The handler already forwarded the signal, unless the process was (re)started after it
+        forwarded = process is not None and process.pid == signalled_pid
+        stop_process(process, timeout=args.drain_timeout, sig=stop_signal or signal.SIGTERM,
+                     signal_sent=forwarded)
         cleanup_threads()
+        if metrics is not None:
+            record_event("supervisor_stop", signal_name)
+            try:
+                metrics.close()
+            except Exception as e:
+                log_message(f"Python: Error closing metrics history: {e}")
+        log_message("Python: Supervisor stopped")
+        flush_logs()
 
 if __name__ == "__main__":
     main()
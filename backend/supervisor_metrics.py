@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Supervisor Metrics Store
+Keeps the supervisor's samples and lifecycle events in a local SQLite database.
+
+start_and_monitor.py records samples (memory usage, thread counts) and
+events (process starts, crashes, deploys, stops) through a MetricsStore.
+Writes are buffered in memory and flushed in one WAL transaction per
+supervisor tick. Each flush also folds the samples into 1-minute and 1-hour
+rollups, so downsampling only has to delete expired rows:
+
+    raw samples        kept for 1 day
+    1-minute rollups   kept for 30 days
+    1-hour rollups     kept until the disk budget needs the space
+    events             kept until the disk budget needs the space
+
+When the file grows past the disk budget, the oldest rows are dropped (raw
+samples first, then minute rollups, hour rollups and events) and the freed
+pages are returned to the filesystem.
+
+Examples:
+    python supervisor_metrics.py restarts --days 14
+    python supervisor_metrics.py memory
+    python supervisor_metrics.py deploys --days 90
+    python supervisor_metrics.py info --db logs/metrics.sqlite3
+"""
+
+import argparse
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+DEFAULT_DB = Path(__file__).parent / "logs" / "metrics.sqlite3"
+DEFAULT_BUDGET_MB = 50
+
+MINUTE = 60
+HOUR = 3600
+DAY = 86400
+RAW_RETENTION = 1 * DAY
+MINUTE_RETENTION = 30 * DAY
+
+# Samples are folded into these bucket sizes (seconds) as they are written
+RESOLUTIONS = (MINUTE, HOUR)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    ts REAL NOT NULL,
+    name TEXT NOT NULL,
+    value REAL NOT NULL,
+    commit_sha TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS samples_ts_idx ON samples (ts);
+CREATE TABLE IF NOT EXISTS rollups (
+    resolution INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    commit_sha TEXT NOT NULL DEFAULT '',
+    count INTEGER NOT NULL,
+    sum REAL NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    PRIMARY KEY (resolution, bucket, name, commit_sha)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS events (
+    ts REAL NOT NULL,
+    kind TEXT NOT NULL,
+    commit_sha TEXT NOT NULL DEFAULT '',
+    detail TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS events_ts_idx ON events (ts);
+CREATE INDEX IF NOT EXISTS events_kind_ts_idx ON events (kind, ts);
+"""
+
+UPSERT_ROLLUP = """
+INSERT INTO rollups (resolution, bucket, name, commit_sha, count, sum, min, max)
+VALUES (?, ?, ?, ?, 1, ?, ?, ?)
+ON CONFLICT (resolution, bucket, name, commit_sha) DO UPDATE SET
+    count = count + 1,
+    sum = sum + excluded.sum,
+    min = MIN(min, excluded.min),
+    max = MAX(max, excluded.max)
+"""
+
+# Oldest-first deletion order when the database is over its disk budget
+PRUNE_ORDER = (
+    ("samples", "ts", ""),
+    ("rollups", "bucket", f"resolution = {MINUTE}"),
+    ("rollups", "bucket", f"resolution = {HOUR}"),
+    ("events", "ts", ""),
+)
+
+
+def connect(path):
+    """Open (and create if needed) a metrics database."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    # auto_vacuum only takes effect before the first table is created
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class MetricsStore:
+    """Buffered writer used by the supervisor. All methods are thread-safe."""
+
+    def __init__(self, path=DEFAULT_DB, budget_mb=DEFAULT_BUDGET_MB, flush_every=500):
+        self.path = str(path)
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.flush_every = flush_every
+        self.commit_sha = ""
+        self._samples = []
+        self._events = []
+        self._lock = threading.Lock()
+        self._conn = connect(self.path)
+        self._conn_lock = threading.Lock()
+
+    def set_commit(self, commit_sha):
+        """Tag the following samples and events with this commit."""
+        self.commit_sha = commit_sha or ""
+
+    def sample(self, name, value, ts=None):
+        with self._lock:
+            self._samples.append((ts or time.time(), name, float(value), self.commit_sha))
+            full = len(self._samples) >= self.flush_every
+        if full:
+            self.flush()
+
+    def event(self, kind, detail="", ts=None):
+        with self._lock:
+            self._events.append((ts or time.time(), kind, self.commit_sha, detail))
+
+    def flush(self):
+        """Write buffered samples and events in one transaction."""
+        with self._lock:
+            samples, self._samples = self._samples, []
+            events, self._events = self._events, []
+        if not samples and not events:
+            return
+        rollups = [
+            (resolution, int(ts // resolution) * resolution, name, commit_sha, value, value, value)
+            for ts, name, value, commit_sha in samples
+            for resolution in RESOLUTIONS
+        ]
+        with self._conn_lock, self._conn:
+            self._conn.executemany("INSERT INTO samples (ts, name, value, commit_sha) VALUES (?, ?, ?, ?)", samples)
+            self._conn.executemany(UPSERT_ROLLUP, rollups)
+            self._conn.executemany("INSERT INTO events (ts, kind, commit_sha, detail) VALUES (?, ?, ?, ?)", events)
+
+    def maintain(self, now=None):
+        """Delete expired raw samples and minute rollups, then enforce the disk budget."""
+        self.flush()
+        now = now or time.time()
+        with self._conn_lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM samples WHERE ts < ?", (now - RAW_RETENTION,))
+                self._conn.execute("DELETE FROM rollups WHERE resolution = ? AND bucket < ?",
+                                   (MINUTE, now - MINUTE_RETENTION))
+            self._enforce_budget()
+
+    def _size(self):
+        page_count = self._conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+        page_size = self._conn.execute("PRAGMA page_size").fetchone()[0]
+        return (page_count - free_pages) * page_size
+
+    def _enforce_budget(self):
+        for table, column, condition in PRUNE_ORDER:
+            where = f"WHERE {condition}" if condition else ""
+            while self._size() > self.budget_bytes:
+                # Drop the oldest tenth of the table (at least one row) and check again
+                rows = self._conn.execute(f"SELECT COUNT(*) FROM {table} {where}").fetchone()[0]
+                if not rows:
+                    break
+                cutoff = self._conn.execute(
+                    f"SELECT {column} FROM {table} {where} ORDER BY {column} LIMIT 1 OFFSET ?",
+                    (max(rows // 10, 1) - 1,),
+                ).fetchone()[0]
+                extra = f"AND {condition}" if condition else ""
+                with self._conn:
+                    self._conn.execute(f"DELETE FROM {table} WHERE {column} <= ? {extra}", (cutoff,))
+        # execute() would stop after the first freed page; executescript runs the pragma to completion
+        self._conn.executescript("PRAGMA incremental_vacuum;")
+        self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        self.flush()
+        with self._conn_lock:
+            self._conn.close()
+
+
+# --- Queries -----------------------------------------------------------------
+
+def _day(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d")
+
+
+def restarts_per_day(conn, days):
+    since = time.time() - days * DAY
+    counts = {}
+    for (ts,) in conn.execute("SELECT ts FROM events WHERE kind = 'crash' AND ts >= ? ORDER BY ts", (since,)):
+        counts[_day(ts)] = counts.get(_day(ts), 0) + 1
+    return counts
+
+
+def memory_per_commit(conn, name):
+    """Mean/min/max of a sample per commit, from the hourly rollups (which cover all history)."""
+    return conn.execute(
+        """
+        SELECT commit_sha, SUM(sum) / SUM(count), MIN(min), MAX(max), SUM(count), MIN(bucket), MAX(bucket)
+        FROM rollups WHERE resolution = ? AND name = ?
+        GROUP BY commit_sha ORDER BY MIN(bucket)
+        """,
+        (HOUR, name),
+    ).fetchall()
+
+
+def deploys(conn, days):
+    since = time.time() - days * DAY
+    return conn.execute("SELECT ts, commit_sha, detail FROM events WHERE kind = 'deploy' AND ts >= ? ORDER BY ts",
+                        (since,)).fetchall()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the supervisor metrics database.")
+    parser.add_argument("--db", default=str(DEFAULT_DB), help=f"Metrics database (default: {DEFAULT_DB})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    restarts = subparsers.add_parser("restarts", help="Crash restarts per day")
+    restarts.add_argument("--days", type=int, default=30)
+
+    memory = subparsers.add_parser("memory", help="Memory usage per deployed commit")
+    memory.add_argument("--metric", default="backend_rss_mb",
+                        help="Sample name (default: backend_rss_mb; also supervisor_rss_mb)")
+
+    deploy = subparsers.add_parser("deploys", help="Deploys and how often they happen")
+    deploy.add_argument("--days", type=int, default=30)
+
+    subparsers.add_parser("info", help="Row counts and disk usage")
+
+    args = parser.parse_args(argv)
+    if not Path(args.db).exists():
+        sys.exit(f"No metrics database at {args.db}")
+    conn = connect(args.db)
+    try:
+        if args.command == "restarts":
+            counts = restarts_per_day(conn, args.days)
+            for day, count in counts.items():
+                print(f"{day}  {count:>5}  {'#' * min(count, 60)}")
+            print(f"Total: {sum(counts.values())} restarts in the last {args.days} days")
+        elif args.command == "memory":
+            print(f"{'commit':<12} {'mean MB':>9} {'min MB':>9} {'max MB':>9} {'samples':>8}  first seen -> last seen")
+            for commit_sha, mean, low, high, count, first, last in memory_per_commit(conn, args.metric):
+                print(f"{(commit_sha or '-')[:12]:<12} {mean:>9.1f} {low:>9.1f} {high:>9.1f} {count:>8}  "
+                      f"{datetime.fromtimestamp(first):%Y-%m-%d %H:%M} -> {datetime.fromtimestamp(last):%Y-%m-%d %H:%M}")
+        elif args.command == "deploys":
+            rows = deploys(conn, args.days)
+            for ts, commit_sha, detail in rows:
+                print(f"{datetime.fromtimestamp(ts):%Y-%m-%d %H:%M:%S}  {commit_sha[:12]:<12} {detail}")
+            per_week = len(rows) / (args.days / 7) if args.days else 0
+            print(f"Total: {len(rows)} deploys in the last {args.days} days ({per_week:.1f} per week)")
+            if len(rows) > 1:
+                gaps = [b[0] - a[0] for a, b in zip(rows, rows[1:])]
+                print(f"Mean time between deploys: {sum(gaps) / len(gaps) / HOUR:.1f} hours")
+        else:
+            for table in ("samples", "rollups", "events"):
+                count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                print(f"{table}: {count}")
+            for resolution, label in ((MINUTE, "minute"), (HOUR, "hour")):
+                count = conn.execute("SELECT COUNT(*) FROM rollups WHERE resolution = ?", (resolution,)).fetchone()[0]
+                print(f"  {label} rollups: {count}")
+            size = sum(p.stat().st_size for p in Path(args.db).parent.glob(Path(args.db).name + "*"))
+            print(f"Disk usage: {size / 1024 / 1024:.2f} MB (including WAL)")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
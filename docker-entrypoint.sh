@@ -94,7 +94,8 @@ else
 fi
 
 # Build the command (working from backend directory)
-COMMAND="cd /app/backend/ && python start_and_monitor.py --branch ${GIT_BRANCH:-main}"
+# exec, so python replaces bash and receives the SIGTERM from docker stop itself
+COMMAND="cd /app/backend/ && exec python start_and_monitor.py --branch ${GIT_BRANCH:-main}"
 
 # Fix any remaining permission issues before starting
 echo "🔧 Final permission fixes..."
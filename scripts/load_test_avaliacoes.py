@@ -0,0 +1,826 @@
+#!/usr/bin/env python3
+"""
+Avaliacoes Load Test
+Replays evaluation traffic from a generate_all_notas.py CSV against the avaliacao routes.
+
+Requests are a mix of POST /avaliacoes/create (one per CSV row),
+PUT /avaliacoes/update and DELETE /avaliacoes/delete (on avaliacoes created
+earlier in the run), sent the way the frontend sends them. Two load models:
+
+    closed loop   --concurrency workers send requests back to back
+    open loop     --rate or --ramp schedule arrivals independently of the
+                  responses; latency is measured from the scheduled time, so
+                  queueing in a saturated backend shows up in the numbers
+
+Per route it records a latency histogram, throughput, status codes and
+errors, and writes everything (plus a per-second timeline) to a JSON file
+that --compare can diff against a previous run.
+
+--mock-backend starts a stand-in for the avaliacao routes on a local SQLite
+database (backend/scripts/local_db.py) that does the same work per request
+as AvaliacaoController and the avaliacoes trigger, which adjusts the grade
+aggregates and media_geral (backend/scripts/grade_aggregates.py). With
+--full-recompute it re-reads every avaliacao of the problem instead, like
+the controller did before the aggregates. It can also be started on its own
+with `serve`.
+
+The stand-in answers with the controller's status codes, including its
+update bug: AvaliacaoController.update reads id_avaliacao from req.params,
+which /avaliacoes/update never sets, so every update is a 400 without a
+write. --query-update makes the stand-in read the query string instead (as
+the frontend sends it) to measure what an update would cost; the report
+then says its update numbers do not reflect the real backend.
+
+Examples:
+    # Against the stand-in, 200 requests/s for 60s
+    python scripts/load_test_avaliacoes.py run notas.csv --mock-backend --problemas notas.csv.problemas.json --rate 200 --duration 60
+
+    # Ramp from 0 to 500 requests/s over 2 minutes, hold for 1 minute
+    python scripts/load_test_avaliacoes.py run notas.csv --mock-backend --ramp 0:0,2m:500,3m:500
+
+    # Closed loop against a running backend, compared with the last run
+    python scripts/load_test_avaliacoes.py run notas.csv --url http://localhost:5919 --token $TOKEN --concurrency 50 --compare last.json
+
+    # Only the stand-in
+    python scripts/load_test_avaliacoes.py serve --port 5919
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "backend" / "scripts"))
+
+import local_db  # noqa: E402
+import grade_aggregates  # noqa: E402
+from grade_engine import calculate_raw_sum  # noqa: E402
+from notas_columnar import MEDIA_KEY, iter_csv_records, parse_record  # noqa: E402
+
+ROUTES = {
+    "create": ("POST", "/avaliacoes/create"),
+    "update": ("PUT", "/avaliacoes/update"),
+    "delete": ("DELETE", "/avaliacoes/delete"),
+}
+PERCENTILES = (50, 90, 95, 99, 99.9)
+# The stand-in database is thrown away after a run, so keep it (and its -wal/-shm files) out of the working tree
+DEFAULT_DB = os.path.join(tempfile.gettempdir(), "load_test_avaliacoes.sqlite3")
+
+
+# --- HTTP/1.1 over asyncio streams -------------------------------------------
+
+async def read_message(reader):
+    """Read one HTTP message. Returns (start line, headers, body)."""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        body = bytearray()
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            chunk = await reader.readexactly(size + 2)
+            if size == 0:
+                break
+            body += chunk[:-2]
+        return lines[0], headers, bytes(body)
+    length = int(headers.get("content-length", 0))
+    body = await reader.readexactly(length) if length else b""
+    return lines[0], headers, body
+
+
+class HttpConnection:
+    """A keep-alive connection that sends one request at a time."""
+
+    def __init__(self, host, port, headers):
+        self.host = host
+        self.port = port
+        self.headers = headers
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, body=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        payload = json.dumps(body, ensure_ascii=False).encode() if body is not None else b""
+        head = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}",
+                f"Content-Length: {len(payload)}"]
+        if body is not None:
+            head.append("Content-Type: application/json")
+        head.extend(f"{name}: {value}" for name, value in self.headers.items())
+        try:
+            self.writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + payload)
+            await self.writer.drain()
+            status_line, headers, data = await read_message(self.reader)
+        except BaseException:
+            # The connection state is unknown after a failure (or a cancel)
+            self.close()
+            raise
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return int(status_line.split(" ", 2)[1]), data
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+# --- Statistics --------------------------------------------------------------
+
+class LatencyHistogram:
+    """Log-bucketed latencies (1% wide buckets), cheap to record and to store."""
+
+    GROWTH = 1.01
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self._log_growth = math.log(self.GROWTH)
+
+    def record(self, seconds):
+        micros = max(seconds * 1e6, 1.0)
+        index = int(math.log(micros) / self._log_growth)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def _upper_bound(self, index):
+        return self.GROWTH ** (index + 1) / 1e6
+
+    def percentile(self, p):
+        if not self.count:
+            return 0.0
+        rank = math.ceil(p / 100 * self.count)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self._upper_bound(index), self.max)
+        return self.max
+
+    def to_json(self):
+        summary = {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0,
+            "min_ms": round(self.min * 1000, 3) if self.count else 0,
+            "max_ms": round(self.max * 1000, 3),
+        }
+        for p in PERCENTILES:
+            summary[f"p{p:g}_ms"] = round(self.percentile(p) * 1000, 3)
+        # Upper bound in ms -> count, enough to recompute any percentile later
+        summary["buckets"] = {f"{self._upper_bound(i) * 1000:.4g}": n for i, n in sorted(self.buckets.items())}
+        return summary
+
+
+class RouteStats:
+    """Counters for one route."""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.statuses = {}
+        self.errors = {}
+        self.ok = 0
+        self.timeline = {}
+
+    def record(self, second, latency, status=None, error=None):
+        self.latency.record(latency)
+        if error is not None:
+            self.errors[error] = self.errors.get(error, 0) + 1
+        else:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+        success = error is None and 200 <= status < 300
+        self.ok += success
+        counts = self.timeline.setdefault(second, [0, 0])
+        counts[0] += 1
+        counts[1] += not success
+
+    def to_json(self, elapsed):
+        count = self.latency.count
+        return {
+            "requests": count,
+            "ok": self.ok,
+            "failed": count - self.ok,
+            "error_rate": round((count - self.ok) / count, 6) if count else 0,
+            "throughput_rps": round(count / elapsed, 2) if elapsed else 0,
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+            "errors": self.errors,
+            "latency": self.latency.to_json(),
+        }
+
+
+# --- Workload ----------------------------------------------------------------
+
+def load_rows(csv_path, limit):
+    """Create payloads from a CSV export, with notas as JSON text like the frontend sends."""
+    rows = []
+    for record in iter_csv_records(csv_path):
+        row = parse_record(record)
+        if not row["id_problema"] or not row["notas"]:
+            continue
+        payload = {
+            "id_problema": row["id_problema"],
+            "id_aluno_avaliado": row["id_aluno_avaliado"],
+            "notas": record["notas"].strip(),
+        }
+        if row["id_professor"]:
+            payload["id_professor"] = row["id_professor"]
+            payload["notas_por_arquivo"] = (record.get("notas_por_arquivo") or "").strip() or "{}"
+        else:
+            payload["id_aluno_avaliador"] = row["id_aluno_avaliador"]
+        rows.append(payload)
+        if limit and len(rows) >= limit:
+            break
+    return rows
+
+
+def parse_mix(text):
+    """'create=70,update=20,delete=10' -> {'create': 0.7, ...}"""
+    weights = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ROUTES:
+            raise argparse.ArgumentTypeError(f"unknown route {name!r} (use {', '.join(ROUTES)})")
+        weights[name] = float(weight or 1)
+    total = sum(weights.values())
+    if total <= 0:
+        raise argparse.ArgumentTypeError("the mix needs a positive weight")
+    return {name: weight / total for name, weight in weights.items()}
+
+
+class Workload:
+    """Picks the next request: creates walk the CSV, updates and deletes hit created avaliacoes."""
+
+    def __init__(self, rows, mix, rng):
+        self.rows = rows
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.rng = rng
+        self.next_row = 0
+        self.created = []  # (id_avaliacao, payload)
+
+    def next_request(self):
+        route = self.rng.choices(self.names, self.weights)[0]
+        if route != "create" and not self.created:
+            route = "create"
+        method, path = ROUTES[route]
+        if route == "create":
+            payload = self.rows[self.next_row % len(self.rows)]
+            self.next_row += 1
+            return route, method, path, payload
+        # Swap-remove a random created avaliacao so two requests do not race on it
+        index = self.rng.randrange(len(self.created))
+        self.created[index], self.created[-1] = self.created[-1], self.created[index]
+        id_avaliacao, payload = self.created.pop()
+        if route == "delete":
+            return route, method, f"{path}?id_avaliacao={id_avaliacao}", None
+        body = {key: value for key, value in payload.items() if key != "id_aluno_avaliado"}
+        body["notas"] = self._edit_notas(payload["notas"])
+        return route, method, f"{path}?id_avaliacao={id_avaliacao}", (id_avaliacao, body)
+
+    def _edit_notas(self, text):
+        """Lower one grade a little and recompute media, like a student revising an evaluation."""
+        notas = json.loads(text)
+        cells = [(tag, criterio) for tag, criterios in notas.items() if isinstance(criterios, dict)
+                 for criterio in criterios]
+        if not cells:
+            return text
+        tag, criterio = self.rng.choice(cells)
+        notas[tag][criterio] = round(notas[tag][criterio] * self.rng.uniform(0.8, 1.0), 1)
+        values = [v for t, c in notas.items() if isinstance(c, dict) for v in c.values()]
+        notas[MEDIA_KEY] = round(sum(values) / len(values), 10)
+        return json.dumps(notas, ensure_ascii=False, separators=(",", ":"))
+
+    def on_response(self, route, payload, status, data):
+        if route == "create" and status == 201:
+            try:
+                id_avaliacao = json.loads(data)["id_avaliacao"]
+            except (ValueError, KeyError, TypeError):
+                return
+            self.created.append((id_avaliacao, payload))
+        elif route == "update":
+            id_avaliacao, body = payload
+            # A rejected update leaves the avaliacao in place, so it can still be updated or deleted
+            if status != 404:
+                self.created.append((id_avaliacao, body))
+
+
+# --- Arrival schedules -------------------------------------------------------
+
+def parse_duration(text):
+    text = text.strip()
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    for suffix in ("ms", "s", "m", "h"):
+        if text.endswith(suffix):
+            return float(text[:-len(suffix)]) * units[suffix]
+    return float(text)
+
+
+def parse_ramp(text):
+    """'0:0,2m:500,3m:500' -> [(0, 0), (120, 500), (180, 500)]: rate is linear between points."""
+    points = []
+    for part in text.split(","):
+        at, _, rate = part.partition(":")
+        points.append((parse_duration(at), float(rate)))
+    if len(points) < 2 or any(b[0] < a[0] for a, b in zip(points, points[1:])):
+        raise argparse.ArgumentTypeError("a ramp needs at least two time:rate points in time order")
+    if any(rate < 0 for _, rate in points):
+        raise argparse.ArgumentTypeError("rates cannot be negative")
+    return points
+
+
+def iter_arrivals(points, poisson, rng):
+    """Yield arrival offsets (seconds) for a piecewise-linear rate profile.
+
+    The expected number of arrivals up to t is the integral of the rate; an
+    arrival happens each time it grows by 1 (or by an exponential draw for
+    Poisson arrivals), which also handles ramps that start at 0.
+    """
+    draw = (lambda: rng.expovariate(1.0)) if poisson else (lambda: 1.0)
+    need = draw()
+    for (t0, r0), (t1, r1) in zip(points, points[1:]):
+        length = t1 - t0
+        if length <= 0:
+            continue
+        slope = (r1 - r0) / (2 * length)
+        area = r0 * length + slope * length * length
+        done = 0.0
+        while done + need <= area:
+            done += need
+            if abs(slope) < 1e-12:
+                offset = done / r0
+            else:
+                offset = (-r0 + math.sqrt(max(r0 * r0 + 4 * slope * done, 0.0))) / (2 * slope)
+            yield t0 + min(offset, length)
+            need = draw()
+        need -= area - done
+
+
+# --- Runner ------------------------------------------------------------------
+
+class LoadTest:
+    def __init__(self, args, rows, host, port):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.workload = Workload(rows, args.mix, self.rng)
+        self.stats = {route: RouteStats() for route in ROUTES}
+        headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+        self.pool = asyncio.Queue()
+        for _ in range(args.concurrency):
+            self.pool.put_nowait(HttpConnection(host, port, headers))
+        self.in_flight = set()
+        self.dropped = 0
+        self.started = 0.0
+
+    async def send(self, scheduled=None):
+        route, method, path, payload = self.workload.next_request()
+        body = payload[1] if route == "update" else payload
+        connection = await self.pool.get()
+        start = scheduled if scheduled is not None else time.perf_counter()
+        status = data = error = None
+        try:
+            status, data = await asyncio.wait_for(connection.request(method, path, body), self.args.timeout)
+        except asyncio.TimeoutError:
+            error = "timeout"
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as e:
+            error = type(e).__name__
+        finally:
+            self.pool.put_nowait(connection)
+        end = time.perf_counter()
+        self.stats[route].record(int(start - self.started), end - start, status, error)
+        if error is None:
+            self.workload.on_response(route, payload, status, data)
+
+    async def closed_loop(self):
+        deadline = self.started + self.args.duration
+        remaining = [self.args.requests or math.inf]
+
+        async def worker():
+            while time.perf_counter() < deadline and remaining[0] > 0:
+                remaining[0] -= 1
+                await self.send()
+
+        await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+
+    async def open_loop(self, points):
+        for offset in iter_arrivals(points, self.args.poisson, self.rng):
+            scheduled = self.started + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(self.in_flight) >= self.args.max_in_flight:
+                # Open loop: never slow the schedule down, count what could not be sent
+                self.dropped += 1
+                continue
+            task = asyncio.ensure_future(self.send(scheduled))
+            self.in_flight.add(task)
+            task.add_done_callback(self.in_flight.discard)
+        if self.in_flight:
+            await asyncio.wait(self.in_flight, timeout=self.args.timeout)
+            for task in list(self.in_flight):
+                task.cancel()
+
+    async def run(self):
+        self.started = time.perf_counter()
+        if self.args.ramp or self.args.rate:
+            points = self.args.ramp or [(0, self.args.rate), (self.args.duration, self.args.rate)]
+            await self.open_loop(points)
+        else:
+            await self.closed_loop()
+        elapsed = time.perf_counter() - self.started
+        while not self.pool.empty():
+            self.pool.get_nowait().close()
+        return elapsed
+
+    def results(self, elapsed, target):
+        routes = {route: stats.to_json(elapsed) for route, stats in self.stats.items() if stats.latency.count}
+        requests = sum(r["requests"] for r in routes.values())
+        ok = sum(r["ok"] for r in routes.values())
+        seconds = sorted({s for stats in self.stats.values() for s in stats.timeline})
+        timeline = [
+            {"second": s, **{route: stats.timeline.get(s, [0, 0]) for route, stats in self.stats.items()}}
+            for s in seconds
+        ]
+        args = self.args
+        return {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "target": target,
+            "config": {
+                "csv": str(args.csv_path),
+                "mode": "open" if (args.ramp or args.rate) else "closed",
+                "concurrency": args.concurrency,
+                "rate": args.rate,
+                "ramp": args.ramp,
+                "poisson": args.poisson,
+                "duration": args.duration,
+                "mix": args.mix,
+                "seed": args.seed,
+                "mock_backend": args.mock_backend,
+                "full_recompute": args.full_recompute,
+                "query_update": args.query_update,
+            },
+            "elapsed_s": round(elapsed, 3),
+            "totals": {
+                "requests": requests,
+                "ok": ok,
+                "failed": requests - ok,
+                "dropped": self.dropped,
+                "error_rate": round((requests - ok) / requests, 6) if requests else 0,
+                "throughput_rps": round(requests / elapsed, 2) if elapsed else 0,
+            },
+            "routes": routes,
+            "notes": self.notes(routes),
+            "timeline": timeline,
+        }
+
+    def notes(self, routes):
+        """Caveats that apply to these numbers, printed with the summary and kept in the results file."""
+        if "update" not in routes:
+            return []
+        if self.args.mock_backend and self.args.query_update:
+            return ["update: the stand-in reads id_avaliacao from the query string; AvaliacaoController.update "
+                    "reads req.params and answers 400 to every update, so these update numbers do not reflect "
+                    "the real backend"]
+        return ["update: AvaliacaoController.update reads id_avaliacao from req.params, which /avaliacoes/update "
+                "never sets, so every update is a 400 without a write; the update numbers measure that rejection"]
+
+
+def print_summary(results):
+    totals = results["totals"]
+    print(f"\n{'route':<8} {'requests':>9} {'rps':>9} {'errors':>8} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for route, stats in results["routes"].items():
+        latency = stats["latency"]
+        print(f"{route:<8} {stats['requests']:>9} {stats['throughput_rps']:>9.1f} {stats['failed']:>8} "
+              f"{latency['p50_ms']:>9.2f} {latency['p99_ms']:>9.2f} {latency['max_ms']:>9.2f}")
+    print(f"\nTotal: {totals['requests']} requests in {results['elapsed_s']:.1f}s "
+          f"({totals['throughput_rps']:.1f} rps), {totals['failed']} failed, {totals['dropped']} dropped")
+    for note in results.get("notes", []):
+        print(f"Note: {note}")
+
+
+def print_comparison(previous, current):
+    """Print the change of the headline numbers per route against a previous results file."""
+    print(f"\nCompared with {previous.get('started_at', 'previous run')}:")
+    for route, stats in current["routes"].items():
+        old = previous.get("routes", {}).get(route)
+        if not old:
+            continue
+        parts = []
+        for label, get in (("rps", lambda s: s["throughput_rps"]),
+                           ("p50", lambda s: s["latency"]["p50_ms"]),
+                           ("p99", lambda s: s["latency"]["p99_ms"]),
+                           ("errors", lambda s: s["error_rate"])):
+            before, after = get(old), get(stats)
+            change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+            parts.append(f"{label} {before:g} -> {after:g} ({change})")
+        print(f"  {route:<8} " + ", ".join(parts))
+
+
+# --- Stand-in backend --------------------------------------------------------
+
+class MockBackend:
+    """The avaliacao routes on the local SQLite stand-in, doing what AvaliacaoController does.
+
+    Every write adjusts the grade aggregates and problemas.media_geral in the
+    same transaction, like the avaliacoes trigger. With full_recompute it
+    re-selects the notas of the whole problem instead, so the cost per
+    request grows with the problem. Database work runs on one thread, like a
+    single connection would.
+    """
+
+    def __init__(self, db_path, require_auth=True, full_recompute=False, query_update=False):
+        self.db_path = db_path
+        self.require_auth = require_auth
+        self.full_recompute = full_recompute
+        self.query_update = query_update
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.conn = None
+        self.handlers = {(method, path): getattr(self, route) for route, (method, path) in ROUTES.items()}
+
+    def _db(self):
+        if self.conn is None:
+            self.conn = local_db.connect(self.db_path)
+            grade_aggregates.ensure_schema(self.conn)
+        return self.conn
+
+    def _row(self, id_avaliacao):
+        row = self._db().execute("SELECT * FROM avaliacoes WHERE id_avaliacao = ?", (id_avaliacao,)).fetchone()
+        return dict(row) if row else None
+
+    def _after_write(self, old, new):
+        if not self.full_recompute:
+            grade_aggregates.apply_change(self._db(), old, new)
+            return
+        for id_problema in {row["id_problema"] for row in (old, new) if row}:
+            self._update_media(id_problema)
+
+    def _update_media(self, id_problema):
+        conn = self._db()
+        sums = [calculate_raw_sum(notas) for (notas,) in
+                conn.execute("SELECT notas FROM avaliacoes WHERE id_problema = ?", (id_problema,))]
+        media = sum(sums) / len(sums) if sums else 0
+        conn.execute("UPDATE problemas SET media_geral = ? WHERE id_problema = ?", (media, id_problema))
+
+    def _as_text(self, value, default="{}"):
+        if not value:
+            return default
+        return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+    def create(self, query, body):
+        id_problema, id_aluno_avaliado, notas = (body.get("id_problema"), body.get("id_aluno_avaliado"),
+                                                 body.get("notas"))
+        if not id_problema or not id_aluno_avaliado or not notas:
+            return 400, {"error": "ID do problema, ID do avaliado e notas são obrigatórios"}
+        if bool(body.get("id_aluno_avaliador")) == bool(body.get("id_professor")):
+            return 400, {"error": "Envie apenas um: id_aluno_avaliador OU id_professor"}
+        conn = self._db()
+        cursor = conn.execute(local_db.INSERT_AVALIACAO, (
+            id_problema, body.get("id_aluno_avaliador") or None, id_aluno_avaliado,
+            body.get("id_professor") or None, self._as_text(notas), self._as_text(body.get("notas_por_arquivo")),
+        ))
+        row = self._row(cursor.lastrowid)
+        self._after_write(None, row)
+        conn.commit()
+        return 201, row
+
+    def update(self, query, body):
+        # The controller reads req.params, which is always empty on /avaliacoes/update
+        id_avaliacao = query.get("id_avaliacao") if self.query_update else None
+        if not id_avaliacao:
+            return 400, {"error": "id_avaliacao is required"}
+        if bool(body.get("id_aluno_avaliador")) == bool(body.get("id_professor")):
+            return 400, {"error": "Envie apenas um: id_aluno_avaliador OU id_professor"}
+        columns = {"notas": self._as_text(body.get("notas"))}
+        for key in ("id_aluno_avaliador", "id_professor"):
+            if body.get(key):
+                columns[key] = body[key]
+        if body.get("notas_por_arquivo"):
+            columns["notas_por_arquivo"] = self._as_text(body["notas_por_arquivo"])
+        conn = self._db()
+        old = self._row(id_avaliacao)
+        if old is None:
+            return 404, {"error": "Avaliacao not found"}
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        conn.execute(f"UPDATE avaliacoes SET {assignments} WHERE id_avaliacao = ?", (*columns.values(), id_avaliacao))
+        row = self._row(id_avaliacao)
+        self._after_write(old, row)
+        conn.commit()
+        return 200, row
+
+    def delete(self, query, body):
+        id_avaliacao = query.get("id_avaliacao")
+        if not id_avaliacao:
+            return 400, {"error": "id_avaliacao is required"}
+        row = self._row(id_avaliacao)
+        conn = self._db()
+        conn.execute("DELETE FROM avaliacoes WHERE id_avaliacao = ?", (id_avaliacao,))
+        if row:
+            self._after_write(row, None)
+        conn.commit()
+        return 204, None
+
+    async def handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    request_line, headers, data = await read_message(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                method, target = request_line.split(" ")[:2]
+                url = urlsplit(target)
+                handler = self.handlers.get((method, url.path))
+                if handler is None:
+                    status, payload = 404, {"error": f"Cannot {method} {url.path}"}
+                elif self.require_auth and not headers.get("authorization"):
+                    status, payload = 401, {"error": "Unauthorized: Valid authentication required"}
+                else:
+                    query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                    try:
+                        body = json.loads(data) if data else {}
+                        status, payload = await loop.run_in_executor(self.executor, handler, query, body)
+                    except Exception as e:
+                        status, payload = 500, {"error": str(e)}
+                if payload is None:
+                    # 204 No Content, like res.status(204).send()
+                    writer.write(f"HTTP/1.1 {status} No Content\r\n\r\n".encode())
+                else:
+                    response = json.dumps(payload, ensure_ascii=False).encode()
+                    writer.write(f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}\r\n"
+                                 f"Content-Type: application/json; charset=utf-8\r\n"
+                                 f"Content-Length: {len(response)}\r\n\r\n".encode() + response)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host, port, ready=None):
+        server = await asyncio.start_server(self.handle, host, port)
+        if ready:
+            ready()
+        async with server:
+            await server.serve_forever()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_mock_backend(args):
+    """Start the stand-in in a separate process so it does not share the load generator's CPU."""
+    port = free_port()
+    command = [sys.executable, __file__, "serve", "--host", "127.0.0.1", "--port", str(port), "--db", args.db,
+               "--reset"]
+    if args.problemas:
+        command += ["--problemas", args.problemas]
+    if args.full_recompute:
+        command.append("--full-recompute")
+    if args.query_update:
+        command.append("--query-update")
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    # serve prints one line once it is listening
+    line = process.stdout.readline()
+    if not line.startswith("Listening"):
+        process.kill()
+        sys.exit(f"Stand-in backend failed to start: {line.strip()}")
+    return process, port
+
+
+# --- Commands ----------------------------------------------------------------
+
+def run(args):
+    rows = load_rows(args.csv_path, args.limit)
+    if not rows:
+        sys.exit(f"No usable rows in {args.csv_path}")
+
+    process = None
+    if args.mock_backend:
+        process, port = start_mock_backend(args)
+        host = "127.0.0.1"
+        target = f"mock://{args.db}"
+        args.token = args.token or "load-test"
+    else:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+        target = args.url
+
+    mode = (f"ramp {args.ramp}" if args.ramp else f"{args.rate:g} req/s" if args.rate
+            else f"{args.concurrency} workers")
+    print(f"Replaying {len(rows)} rows against {target} ({mode})")
+    try:
+        test = LoadTest(args, rows, host, port)
+        elapsed = asyncio.run(test.run())
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    results = test.results(elapsed, target)
+    print_summary(results)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(json.load(f), results)
+    output = args.output or f"load_test_{datetime.now():%Y%m%d_%H%M%S}.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Done! Results saved to {output}")
+    return 1 if args.max_error_rate is not None and results["totals"]["error_rate"] > args.max_error_rate else 0
+
+
+def serve(args):
+    if args.reset:
+        for path in (args.db, f"{args.db}-wal", f"{args.db}-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+    if args.problemas:
+        conn = local_db.connect(args.db)
+        local_db.insert_layout(conn, *local_db.read_layout(args.problemas))
+        conn.commit()
+        conn.close()
+    backend = MockBackend(args.db, require_auth=not args.no_auth, full_recompute=args.full_recompute,
+                          query_update=args.query_update)
+    ready = lambda: print(f"Listening on http://{args.host}:{args.port} (db: {args.db})", flush=True)  # noqa: E731
+    try:
+        asyncio.run(backend.serve(args.host, args.port, ready))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the avaliacao routes with replayed CSV traffic.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Replay a CSV against a backend")
+    run_parser.add_argument("csv_path", help="CSV in the generate_all_notas.py format")
+    target = run_parser.add_mutually_exclusive_group()
+    target.add_argument("--url", default="http://localhost:5919", help="Backend URL (default: http://localhost:5919)")
+    target.add_argument("--mock-backend", action="store_true", help="Start the SQLite stand-in and test it")
+    run_parser.add_argument("--token", default=os.environ.get("LOAD_TEST_TOKEN"),
+                            help="Bearer token for the backend (default: $LOAD_TEST_TOKEN)")
+    run_parser.add_argument("--db", default=DEFAULT_DB,
+                            help=f"Stand-in database, recreated on every run (default: {DEFAULT_DB})")
+    run_parser.add_argument("--problemas", help="Problemas JSON to load into the stand-in database")
+    run_parser.add_argument("--full-recompute", action="store_true",
+                            help="Stand-in recomputes media_geral from the whole problem on every write")
+    run_parser.add_argument("--query-update", action="store_true",
+                            help="Stand-in reads the update id from the query string instead of answering 400 "
+                                 "like the controller")
+    run_parser.add_argument("--concurrency", type=int, default=20, help="Connections / closed-loop workers (default: 20)")
+    run_parser.add_argument("--rate", type=float, help="Open loop: arrivals per second")
+    run_parser.add_argument("--ramp", type=parse_ramp, help="Open loop rate profile as time:rate points, e.g. 0:0,1m:300")
+    run_parser.add_argument("--poisson", action="store_true", help="Poisson arrivals instead of evenly spaced ones")
+    run_parser.add_argument("--duration", type=parse_duration, default=30.0, help="Run time, e.g. 30s or 2m (default: 30s)")
+    run_parser.add_argument("--requests", type=int, help="Closed loop: stop after this many requests")
+    run_parser.add_argument("--mix", type=parse_mix, default=parse_mix("create=70,update=20,delete=10"),
+                            help="Route weights (default: create=70,update=20,delete=10)")
+    run_parser.add_argument("--max-in-flight", type=int, default=1_000,
+                            help="Open loop: drop arrivals beyond this many pending requests (default: 1000)")
+    run_parser.add_argument("--timeout", type=float, default=30.0, help="Per request timeout in seconds (default: 30)")
+    run_parser.add_argument("--limit", type=int, default=100_000, help="Rows to read from the CSV (default: 100000)")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--output", help="Results JSON (default: load_test_<timestamp>.json)")
+    run_parser.add_argument("--compare", help="Previous results JSON to compare against")
+    run_parser.add_argument("--max-error-rate", type=float, help="Exit with status 1 above this error rate")
+
+    serve_parser = subparsers.add_parser("serve", help="Run only the SQLite stand-in backend")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=5919)
+    serve_parser.add_argument("--db", default=DEFAULT_DB, help=f"Database file (default: {DEFAULT_DB})")
+    serve_parser.add_argument("--problemas", help="Problemas JSON to load into the database")
+    serve_parser.add_argument("--reset", action="store_true", help="Start from an empty database")
+    serve_parser.add_argument("--no-auth", action="store_true", help="Do not require an Authorization header")
+    serve_parser.add_argument("--full-recompute", action="store_true",
+                              help="Recompute media_geral from the whole problem on every write")
+    serve_parser.add_argument("--query-update", action="store_true",
+                              help="Read the update id from the query string instead of answering 400 like the "
+                                   "controller")
+
+    args = parser.parse_args(argv)
+    return run(args) if args.command == "run" else serve(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())